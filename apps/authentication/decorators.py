@@ -2,12 +2,25 @@ from functools import wraps
 from django.shortcuts import redirect
 from django.contrib import messages
 from django.urls import reverse
+from django.utils.functional import SimpleLazyObject
+
+
+def get_table_utilisateur(request):
+    """
+    Table associée à l'utilisateur connecté (comptes de table connectés par QR code),
+    ou None. Résolue au plus une fois par requête.
+    """
+    if not hasattr(request, '_table_utilisateur'):
+        user = request.user
+        request._table_utilisateur = user.tables.first() if user.is_authenticated else None
+    return request._table_utilisateur
 
 
 def role_required(allowed_roles):
     """
     Vérifie que l'utilisateur connecté a l'un des rôles autorisés.
     Redirige vers la page de connexion ou le tableau de bord approprié en cas d'échec.
+    Expose request.table: la table de l'utilisateur, résolue paresseusement.
     """
     def decorator(view_func):
         @wraps(view_func)
@@ -27,6 +40,8 @@ def role_required(allowed_roles):
                     return redirect('authentication:redirect_after_login')
                 return redirect('authentication:login')
             
+            if not hasattr(request, 'table'):
+                request.table = SimpleLazyObject(lambda: get_table_utilisateur(request))
             return view_func(request, *args, **kwargs)
         return wrapper
     return decorator
\ No newline at end of file
@@ -1,75 +1,87 @@
+import re
+
 from django.shortcuts import redirect
-from django.urls import reverse, resolve
+from django.urls import reverse
 from django.contrib import messages
 from django.contrib.auth import logout
-from django.http import Http404
+
+
+def compiler_regles(regles):
+    """
+    Compile une liste de règles de chemins en une seule expression régulière.
+
+    '/orders/' couvre '/orders', '/orders/' et tout ce qui est en dessous
+    (par segment: '/orders/' ne couvre pas '/orders-old/').
+    Une règle terminée par '$' ne couvre que ce chemin exact ('/$' = la racine).
+    """
+    motifs = []
+    for regle in regles:
+        if regle.endswith('$'):
+            motifs.append(re.escape(regle[:-1].rstrip('/')) + '/?$')
+        else:
+            motifs.append(re.escape(regle.rstrip('/')) + '(?:/|$)')
+    return re.compile('|'.join(f'(?:{motif})' for motif in motifs))
 
 
 class RoleBasedAccessMiddleware:
+    # URLs accessibles sans contrôle (pages de connexion, fichiers, admin Django)
+    exempt_urls = [
+        '/$',
+        '/login/$',
+        '/logout/$',
+        '/redirect/$',
+        '/favicon.ico$',
+        '/admin/',
+        '/static/',
+        '/media/',
+        '/tables/qr/login/',  # Connexion automatique des tables par QR code
+    ]
+    # Définir les URLs accessibles par chaque rôle (selon le cahier des charges).
+    # Le contrôle fin par vue reste assuré par @role_required.
+    role_allowed_urls = {
+        'Radmin': ['*'],  # Accès total à toutes les fonctionnalités
+        'Rcomptable': [
+            '/dashboard/',      # Tableau de bord et exports
+            '/payments/',       # Consultation paiements et caisse, dépenses
+        ],
+        'Rcaissier': [
+            '/orders/',         # Commandes (encaissement)
+            '/payments/',       # Caisse + historique paiements
+            '/tables/',         # Suivi tables
+        ],
+        'Rcuisinier': [
+            '/menu/',           # Gestion des plats et catégories
+        ],
+        'Rservent': [
+            '/tables/',         # Visualisation des tables
+            '/orders/',         # Gestion des commandes (servir, paiement)
+            '/payments/',       # Enregistrer les paiements
+            '/dashboard/',      # Tableau de bord
+        ],
+        'Rtable': [
+            '/menu/',           # Consultation des plats
+            '/orders/',         # Panier, validation et historique des commandes
+        ],
+    }
+
     def __init__(self, get_response):
         self.get_response = get_response
-        self.exempt_urls = [
-            reverse('authentication:login'),
-            reverse('authentication:logout'),
-            reverse('authentication:redirect_after_login'),
-            '/admin/',
-            '/static/',
-            '/media/',
-            '/favicon.ico',
-            '/',
-            '/login/',
-            '/redirect/',
-        ]
-        # Définir les URLs accessibles par chaque rôle (selon le cahier des charges)
-        self.role_allowed_urls = {
-            'Radmin': ['*'],  # Accès total à toutes les fonctionnalités
-            'Rcomptable': [
-                '/dashboard/',      # Tableau de bord
-                '/payments/',       # Consultation paiements et caisse
-                '/payments/sorties/',  # Enregistrement des dépenses
-            ],
-            'Rcaissier': [
-                '/orders/',         # Commandes (encaissement)
-                '/payments/',       # Caisse + historique paiements
-                '/tables/',         # Suivi tables
-            ],
-            'Rcuisinier': [
-                '/menu/manage',    # Gestion des plats (ajouter, modifier, activer/désactiver)
-                '/menu/create',
-                '/menu/update',
-                '/menu/toggle',
-                '/menu/delete',
-                '/menu/',          # Pour la redirection après connexion
-            ],
-            'Rservent': [
-                '/tables/',         # Visualisation des tables
-                '/orders/',         # Gestion des commandes (servir, paiement)
-                '/payments/paiement/',  # Enregistrer les paiements
-            ],
-            'Rtable': [
-                '/menu/',           # Consultation des plats
-                '/orders/cart/',    # Gestion du panier
-                '/orders/add/',     # Ajout au panier
-                '/orders/update/',  # Modification panier
-                '/orders/remove/',  # Suppression du panier
-                '/orders/create/',  # Validation commande
-                '/orders/confirmation/', # Confirmation commande
-                '/orders/history/', # Historique des commandes
-            ]
+        # Règles compilées une fois pour toutes au démarrage
+        self.exempt_regex = compiler_regles(self.exempt_urls)
+        self.role_regexes = {
+            role: None if '*' in urls else compiler_regles(urls)
+            for role, urls in self.role_allowed_urls.items()
         }
 
     def __call__(self, request):
-        # Normaliser le chemin pour gérer les slashes finaux
-        normalized_path = request.path.rstrip('/')
-        
         # Vérifier si l'URL est exemptée
-        if any(normalized_path.startswith(url.rstrip('/')) for url in self.exempt_urls):
+        if self.exempt_regex.match(request.path):
             return self.get_response(request)
 
         # Gestion des utilisateurs non authentifiés
         if not request.user.is_authenticated:
             return redirect(f"{reverse('authentication:login')}?next={request.path}")
-        
+
         # Vérifier si le compte est actif
         if not request.user.is_active:
             logout(request)
@@ -89,38 +101,18 @@ class RoleBasedAccessMiddleware:
 
     def has_permission(self, request):
         """Vérifie si l'utilisateur a la permission d'accéder à l'URL demandée"""
-        user_role = request.user.role if hasattr(request.user, 'role') else None
-        
-        # Normaliser le chemin pour la vérification
-        normalized_path = request.path.rstrip('/')
-        
-        # L'administrateur a accès à tout
-        if user_role == 'Radmin':
-            return True
-            
-        # Récupérer les URLs autorisées pour le rôle de l'utilisateur
-        allowed_urls = self.role_allowed_urls.get(user_role, [])
-        
-        # Vérifier si l'URL actuelle correspond à un motif autorisé
-        for url_pattern in allowed_urls:
-            if url_pattern == '*':
-                return True
-            if normalized_path.startswith(url_pattern.rstrip('/')):
-                return True
-                
-        return False
+        user_role = getattr(request.user, 'role', None)
+        if user_role not in self.role_regexes:
+            return False
+
+        regex = self.role_regexes[user_role]
+        # None: accès total (Radmin)
+        return regex is None or regex.match(request.path) is not None
 
     def get_required_roles(self, request):
         """Retourne les rôles requis pour accéder à l'URL demandée"""
-        required_roles = []
-        normalized_path = request.path.rstrip('/')
-        
-        for role, urls in self.role_allowed_urls.items():
-            for url_pattern in urls:
-                if url_pattern == '*' and normalized_path.startswith('/'):
-                    required_roles.append(role)
-                    break
-                if normalized_path.startswith(url_pattern.rstrip('/')):
-                    required_roles.append(role)
-                    break
+        required_roles = [
+            role for role, regex in self.role_regexes.items()
+            if regex is None or regex.match(request.path)
+        ]
         return required_roles if required_roles else ['Aucun rôle spécifique']
@@ -0,0 +1,105 @@
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase
+from django.urls import reverse
+
+from .middleware import RoleBasedAccessMiddleware, compiler_regles
+from .models import CustomUser
+
+
+class CompilerReglesTests(SimpleTestCase):
+    """Règles de chemins compilées par compiler_regles()"""
+
+    def test_prefixe(self):
+        regex = compiler_regles(['/orders/'])
+        for chemin in ['/orders', '/orders/', '/orders/commandes/', '/orders/commande/12/supprimer/']:
+            self.assertTrue(regex.match(chemin), chemin)
+        for chemin in ['/', '/orders-old/', '/ordersx', '/menu/orders/']:
+            self.assertFalse(regex.match(chemin), chemin)
+
+    def test_chemin_exact(self):
+        regex = compiler_regles(['/login/$'])
+        for chemin in ['/login', '/login/']:
+            self.assertTrue(regex.match(chemin), chemin)
+        for chemin in ['/login/x/', '/loginx/', '/']:
+            self.assertFalse(regex.match(chemin), chemin)
+
+    def test_racine_exacte(self):
+        regex = compiler_regles(['/$'])
+        self.assertTrue(regex.match('/'))
+        for chemin in ['/orders/', '/menu/', '/login/']:
+            self.assertFalse(regex.match(chemin), chemin)
+
+    def test_plusieurs_regles(self):
+        regex = compiler_regles(['/$', '/static/', '/favicon.ico$'])
+        for chemin in ['/', '/static/css/app.css', '/favicon.ico']:
+            self.assertTrue(regex.match(chemin), chemin)
+        for chemin in ['/favicon.ico/x', '/staticx/', '/tables/']:
+            self.assertFalse(regex.match(chemin), chemin)
+
+
+class RoleBasedAccessMiddlewareTests(SimpleTestCase):
+    """Contrôle d'accès par rôle et par préfixe d'application"""
+
+    # Préfixe d'application -> rôles autorisés (hors Radmin, autorisé partout)
+    ACCES = {
+        '/menu/': {'Rcuisinier', 'Rtable'},
+        '/orders/': {'Rcaissier', 'Rservent', 'Rtable'},
+        '/tables/': {'Rcaissier', 'Rservent'},
+        '/payments/': {'Rcomptable', 'Rcaissier', 'Rservent'},
+        '/dashboard/': {'Rcomptable', 'Rservent'},
+        '/users/': set(),
+    }
+    ROLES = ['Rtable', 'Rservent', 'Rcuisinier', 'Rcaissier', 'Rcomptable']
+
+    def setUp(self):
+        self.middleware = RoleBasedAccessMiddleware(lambda request: HttpResponse('ok'))
+
+    def appeler(self, chemin, role=None):
+        request = RequestFactory().get(chemin)
+        request.user = CustomUser(login='utilisateur', role=role, is_active=True) if role else AnonymousUser()
+        request._messages = CookieStorage(request)
+        return self.middleware(request)
+
+    def assertAutorise(self, chemin, role=None):
+        self.assertEqual(self.appeler(chemin, role).status_code, 200, (role, chemin))
+
+    def assertRefuse(self, chemin, role):
+        response = self.appeler(chemin, role)
+        self.assertEqual(
+            (response.status_code, response.url), (302, reverse('authentication:redirect_after_login')), (role, chemin)
+        )
+
+    def test_urls_exemptees(self):
+        for chemin in [
+            '/', '/login/', '/login', '/logout/', '/redirect/', '/favicon.ico',
+            '/admin/', '/admin/orders/commande/', '/static/css/app.css', '/media/plats/riz.jpg',
+            '/tables/qr/login/abc123/',
+        ]:
+            self.assertAutorise(chemin)
+
+    def test_anonyme_redirige_vers_la_connexion(self):
+        # '/$' et '/login/$' ne couvrent que le chemin exact
+        for chemin in ['/orders/commandes/', '/dashboard/', '/login/x/', '/loginx/', '/administration/', '/tables/1/']:
+            response = self.appeler(chemin)
+            self.assertEqual(response.status_code, 302, chemin)
+            self.assertEqual(response.url, f"{reverse('authentication:login')}?next={chemin}")
+
+    def test_roles_par_application(self):
+        for prefixe, roles in self.ACCES.items():
+            for chemin in [prefixe, f'{prefixe}page/1/']:
+                self.assertAutorise(chemin, 'Radmin')
+                for role in self.ROLES:
+                    if role in roles:
+                        self.assertAutorise(chemin, role)
+                    else:
+                        self.assertRefuse(chemin, role)
+
+    def test_prefixe_par_segment(self):
+        self.assertAutorise('/orders', 'Rcaissier')
+        self.assertRefuse('/orders-old/', 'Rcaissier')
+        self.assertRefuse('/menu-x/', 'Rtable')
+
+    def test_role_inconnu_refuse(self):
+        self.assertRefuse('/orders/', 'Rinconnu')
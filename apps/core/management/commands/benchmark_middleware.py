@@ -0,0 +1,69 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from apps.authentication.middleware import RoleBasedAccessMiddleware
+from apps.authentication.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = (
+        'Mesure le coût par requête du RoleBasedAccessMiddleware (chemins exemptés, '
+        'autorisés et refusés) et le compare au budget d\'une requête au débit cible.'
+    )
+
+    # (rôle, chemin) représentatifs du trafic; None = utilisateur anonyme
+    SCENARIOS = [
+        (None, '/static/css/style.css'),
+        (None, '/login/'),
+        ('Rtable', '/menu/'),
+        ('Rtable', '/orders/panier/'),
+        ('Rservent', '/tables/3/'),
+        ('Rcaissier', '/orders/commandes/'),
+        ('Rcomptable', '/payments/caisses/'),
+        ('Radmin', '/dashboard/'),
+    ]
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requetes',
+            type=int,
+            default=100000,
+            help='Nombre de requêtes simulées (défaut: 100000)'
+        )
+        parser.add_argument(
+            '--debit',
+            type=int,
+            default=10000,
+            help='Débit cible en requêtes/s pour le calcul du budget (défaut: 10000)'
+        )
+
+    def handle(self, *args, **options):
+        reponse = HttpResponse()
+        middleware = RoleBasedAccessMiddleware(lambda request: reponse)
+        factory = RequestFactory()
+
+        requetes = []
+        for role, chemin in self.SCENARIOS:
+            request = factory.get(chemin)
+            # Utilisateur non sauvegardé: aucune requête SQL pendant la mesure
+            request.user = CustomUser(login=f'bench_{role}', role=role, is_active=True) if role else None
+            requetes.append(request)
+
+        nombre = options['requetes']
+        debut = time.perf_counter()
+        for i in range(nombre):
+            middleware(requetes[i % len(requetes)])
+        duree = time.perf_counter() - debut
+
+        par_requete = duree / nombre * 1_000_000
+        budget = 1_000_000 / options['debit']
+        self.stdout.write(
+            f'{nombre} requêtes sur {len(requetes)} scénarios en {duree * 1000:.1f} ms'
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'{par_requete:.2f} µs par requête, soit {par_requete / budget * 100:.2f} % '
+            f'du budget de {budget:.0f} µs par requête à {options["debit"]} req/s'
+        ))
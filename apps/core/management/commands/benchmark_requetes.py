@@ -0,0 +1,108 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Sum, Count
+from django.utils import timezone
+
+from apps.orders.models import Panier, Commande
+from apps.payments.models import Paiement, SortieCaisse
+
+
+class Command(BaseCommand):
+    help = (
+        'Mesure les requêtes de filtrage les plus fréquentes (plan d\'exécution et durée). '
+        'À lancer sur des données générées (python manage.py seed) avant et après '
+        'la migration des index pour comparer les résultats.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=50,
+            help='Nombre d\'exécutions par requête (défaut: 50)'
+        )
+        parser.add_argument(
+            '--sans-plan',
+            action='store_true',
+            help='Ne pas afficher les plans d\'exécution (EXPLAIN)'
+        )
+
+    def get_requetes(self):
+        """
+        Requêtes représentatives des vues commandes, caisse et tableau de bord.
+        Chaque entrée: (libellé, queryset, agrégat éventuel).
+        """
+        debut_jour = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        debut_mois = debut_jour - timedelta(days=30)
+        table_id = Commande.objects.values_list('table_id', flat=True).first()
+        caisse_id = Paiement.objects.values_list('caisse_id', flat=True).first()
+
+        return [
+            (
+                'Commande(statut, date_commande)',
+                Commande.objects.filter(statut='en_attente', date_commande__gte=debut_mois),
+                {'n': Count('id')},
+            ),
+            (
+                'Commande(statut, date_paiement)',
+                Commande.objects.filter(
+                    statut='payee',
+                    date_paiement__gte=debut_jour,
+                    date_paiement__lt=debut_jour + timedelta(days=1)
+                ),
+                {'total': Sum('montant_total')},
+            ),
+            (
+                'Commande(table, statut)',
+                Commande.objects.filter(table_id=table_id).exclude(statut='payee').order_by('-date_commande')[:1],
+                None,
+            ),
+            (
+                'Panier(table, is_active)',
+                Panier.objects.filter(table_id=table_id, is_active=True)[:1],
+                None,
+            ),
+            (
+                'Paiement(date_paiement)',
+                Paiement.objects.filter(date_paiement__gte=debut_mois),
+                {'total': Sum('montant')},
+            ),
+            (
+                'Paiement(caisse, mode_paiement)',
+                Paiement.objects.filter(caisse_id=caisse_id).values('mode_paiement').annotate(total=Sum('montant')),
+                None,
+            ),
+            (
+                'SortieCaisse(date_sortie)',
+                SortieCaisse.objects.filter(date_sortie__gte=debut_mois),
+                {'total': Sum('montant')},
+            ),
+        ]
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        self.stdout.write(
+            f'Base: {connection.vendor} - {Commande.objects.count()} commandes, '
+            f'{Paiement.objects.count()} paiements, {SortieCaisse.objects.count()} sorties'
+        )
+
+        for label, queryset, agregat in self.get_requetes():
+            durees = []
+            for _ in range(iterations):
+                debut = time.perf_counter()
+                if agregat:
+                    queryset.aggregate(**agregat)
+                else:
+                    list(queryset.all())
+                durees.append(time.perf_counter() - debut)
+
+            mediane = statistics.median(durees) * 1000
+            self.stdout.write(self.style.SUCCESS(f'{label}: {mediane:.3f} ms (médiane sur {iterations})'))
+
+            if not options['sans_plan']:
+                self.stdout.write(queryset.explain())
+                self.stdout.write('')
@@ -0,0 +1,84 @@
+"""
+Résolution des périodes de rapport en intervalles de dates-heures.
+
+Les intervalles sont semi-ouverts [debut, fin) et conscients du fuseau
+horaire, afin de filtrer avec `champ__gte=debut, champ__lt=fin`: contrairement
+à `champ__date=...`, ce filtre n'enveloppe pas la colonne dans un DATE() et
+peut donc utiliser les index sur les colonnes de date.
+"""
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+
+def debut_jour(jour):
+    """Retourne minuit (heure locale, aware) au début du jour donné"""
+    return timezone.make_aware(datetime.combine(jour, time.min))
+
+
+def intervalle_jour(jour):
+    """Intervalle [jour 00:00, lendemain 00:00)"""
+    return debut_jour(jour), debut_jour(jour + timedelta(days=1))
+
+
+def intervalle_dates(date_debut, date_fin):
+    """Intervalle couvrant les jours date_debut à date_fin inclus"""
+    return debut_jour(date_debut), debut_jour(date_fin + timedelta(days=1))
+
+
+def lire_date(valeur):
+    """Convertit une date 'YYYY-MM-DD' (paramètre GET) en date, ou None si invalide"""
+    if not valeur:
+        return None
+    try:
+        return parse_date(valeur)
+    except ValueError:
+        return None
+
+
+def lire_periode(request, jours=30, donnees=None):
+    """
+    Lit date_debut / date_fin (YYYY-MM-DD, inclus) depuis la requête
+    (request.GET, ou `donnees`, par exemple request.POST).
+    Par défaut: les `jours` derniers jours. Retourne les dates et l'intervalle
+    semi-ouvert [debut, fin) à utiliser dans les filtres.
+    """
+    if donnees is None:
+        donnees = request.GET
+    today = timezone.localdate()
+    date_debut = lire_date(donnees.get('date_debut')) or today - timedelta(days=jours)
+    date_fin = lire_date(donnees.get('date_fin')) or today
+    debut, fin = intervalle_dates(date_debut, date_fin)
+    return date_debut, date_fin, debut, fin
+
+
+def resoudre_periode(period, date_debut=None, date_fin=None):
+    """
+    Convertit une période nommée en intervalle (debut, fin).
+    Retourne None si la période est inconnue ou si les dates d'une période
+    'custom' sont absentes ou invalides (aucun filtre à appliquer).
+    """
+    today = timezone.localdate()
+
+    if period == 'today':
+        return intervalle_jour(today)
+    if period == 'yesterday':
+        return intervalle_jour(today - timedelta(days=1))
+    if period == 'before_yesterday':
+        return intervalle_jour(today - timedelta(days=2))
+    if period == 'week':
+        return intervalle_dates(today - timedelta(days=7), today)
+    if period == 'month':
+        return intervalle_dates(today - timedelta(days=30), today)
+    if period == 'last_month':
+        fin = today.replace(day=1)
+        debut = (fin - timedelta(days=1)).replace(day=1)
+        return debut_jour(debut), debut_jour(fin)
+    if period == 'year':
+        return intervalle_dates(today - timedelta(days=365), today)
+    if period == 'custom':
+        date_debut, date_fin = lire_date(date_debut), lire_date(date_fin)
+        if date_debut and date_fin:
+            return intervalle_dates(date_debut, date_fin)
+    return None
@@ -0,0 +1,22 @@
+from django import template
+
+register = template.Library()
+
+
+@register.filter(name='duree')
+def duree(secondes):
+    """Affiche une durée en secondes sous la forme '1 h 05 min', '12 min 30 s' ou '45 s'"""
+    if secondes is None or secondes == '':
+        return '—'
+    try:
+        secondes = int(secondes)
+    except (TypeError, ValueError):
+        return secondes
+
+    heures, reste = divmod(secondes, 3600)
+    minutes, secondes = divmod(reste, 60)
+    if heures:
+        return f"{heures} h {minutes:02d} min"
+    if minutes:
+        return f"{minutes} min {secondes:02d} s"
+    return f"{secondes} s"
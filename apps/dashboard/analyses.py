@@ -0,0 +1,133 @@
+"""
+Délais de service et rotation des tables.
+
+Calculés en un seul passage sur le journal CommandeEvent (lu par plages de
+dates indexées, en flux avec iterator()): seuls les histogrammes des délais
+(à la seconde) et les compteurs restent en mémoire, quel que soit le volume.
+Le résumé est mis en cache: longtemps pour une période close, quelques
+minutes si elle inclut aujourd'hui.
+"""
+import math
+from collections import Counter, defaultdict
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from apps.core.periodes import intervalle_dates
+from apps.orders.models import CommandeEvent
+from apps.tables.models import TableRestaurant
+
+DUREE_CACHE_PERIODE_CLOSE = 24 * 60 * 60
+DUREE_CACHE_PERIODE_OUVERTE = 5 * 60
+QUANTILES = (50, 90, 99)
+
+
+def resumer_delais(histogramme):
+    """Nombre, moyenne et percentiles (rang le plus proche) d'un histogramme {secondes: nombre}"""
+    nombre = sum(histogramme.values())
+    resume = {'nombre': nombre, 'moyenne': None}
+    resume.update({f'p{q}': None for q in QUANTILES})
+    if not nombre:
+        return resume
+
+    resume['moyenne'] = round(sum(duree * n for duree, n in histogramme.items()) / nombre)
+    rangs = [(f'p{q}', math.ceil(q / 100 * nombre)) for q in QUANTILES]
+    cumul = 0
+    for duree in sorted(histogramme):
+        cumul += histogramme[duree]
+        while rangs and cumul >= rangs[0][1]:
+            resume[rangs.pop(0)[0]] = duree
+    return resume
+
+
+def calculer_analyses(date_debut, date_fin):
+    """
+    Délais commande -> service et service -> paiement, rotations par heure et par table,
+    pour les commandes dont les transitions tombent entre date_debut et date_fin (inclus).
+    """
+    debut, fin = intervalle_dates(date_debut, date_fin)
+    jours = (date_fin - date_debut).days + 1
+
+    attente_service = Counter()
+    service_paiement = Counter()
+    commandes_par_heure = Counter()
+    rotations_par_heure = Counter()
+    rotations_par_table = Counter()
+    occupation_par_table = defaultdict(int)
+
+    # Transitions en cours: commande -> date de création / de service
+    creations = {}
+    services = {}
+
+    evenements = CommandeEvent.objects.filter(
+        date__gte=debut,
+        date__lt=fin
+    ).order_by('date', 'id').values_list('commande_id', 'table_id', 'statut', 'date')
+
+    for commande_id, table_id, statut, date in evenements.iterator(chunk_size=2000):
+        if statut == 'en_attente':
+            creations[commande_id] = date
+            commandes_par_heure[timezone.localtime(date).hour] += 1
+        elif statut == 'servie':
+            cree = creations.get(commande_id)
+            if cree:
+                attente_service[int((date - cree).total_seconds())] += 1
+            services[commande_id] = date
+        elif statut == 'payee':
+            servie = services.pop(commande_id, None)
+            if servie:
+                service_paiement[int((date - servie).total_seconds())] += 1
+            cree = creations.pop(commande_id, None)
+            if cree:
+                occupation_par_table[table_id] += int((date - cree).total_seconds())
+            rotations_par_heure[timezone.localtime(date).hour] += 1
+            rotations_par_table[table_id] += 1
+        else:
+            creations.pop(commande_id, None)
+            services.pop(commande_id, None)
+
+    numeros = dict(TableRestaurant.objects.values_list('id', 'numero_table'))
+    par_table = [
+        {
+            'table_id': table_id,
+            'numero_table': numeros.get(table_id, str(table_id)),
+            'rotations': rotations,
+            'rotations_par_jour': round(rotations / jours, 2),
+            'occupation_moyenne': round(occupation_par_table[table_id] / rotations) if rotations else None,
+        }
+        for table_id, rotations in rotations_par_table.most_common()
+    ]
+
+    return {
+        'date_debut': date_debut.isoformat(),
+        'date_fin': date_fin.isoformat(),
+        'jours': jours,
+        'commandes': sum(commandes_par_heure.values()),
+        'attente_service': resumer_delais(attente_service),
+        'service_paiement': resumer_delais(service_paiement),
+        'par_heure': [
+            {
+                'heure': heure,
+                'commandes': commandes_par_heure[heure],
+                'rotations': rotations_par_heure[heure],
+                'rotations_par_jour': round(rotations_par_heure[heure] / jours, 2),
+            }
+            for heure in range(24)
+        ],
+        'par_table': par_table,
+    }
+
+
+def get_analyses(date_debut, date_fin):
+    """Résumé mis en cache de calculer_analyses()"""
+    cle = f'analyses:service:{date_debut:%Y%m%d}:{date_fin:%Y%m%d}'
+    analyses = cache.get(cle)
+    if analyses is None:
+        analyses = calculer_analyses(date_debut, date_fin)
+        periode_close = date_fin < timezone.localdate()
+        cache.set(
+            cle,
+            analyses,
+            DUREE_CACHE_PERIODE_CLOSE if periode_close else DUREE_CACHE_PERIODE_OUVERTE
+        )
+    return analyses
@@ -19,6 +19,7 @@ from django.utils import timezone
 from django.utils.html import strip_tags
 
 from apps.authentication.models import CustomUser
+from apps.core.periodes import intervalle_jour
 from apps.payments.models import Caisse, Paiement, SortieCaisse
 from apps.orders.models import Commande
 
@@ -28,13 +29,14 @@ def send_daily_cash_report():
     Envoie un rapport quotidien de la caisse à l'administrateur par email.
     Calcule: somme des paiements - somme des dépenses pour la journée.
     """
-    today = timezone.now().date()
+    today = timezone.localdate()
     yesterday = today - timedelta(days=1)
+    debut, fin = intervalle_jour(yesterday)
     
     # Récupérer les données du jour précédent
-    paiements = Paiement.objects.filter(date_paiement__date=yesterday)
-    depenses = SortieCaisse.objects.filter(date_sortie__date=yesterday)
-    commandes = Commande.objects.filter(date_commande__date=yesterday)
+    paiements = Paiement.objects.filter(date_paiement__gte=debut, date_paiement__lt=fin)
+    depenses = SortieCaisse.objects.filter(date_sortie__gte=debut, date_sortie__lt=fin)
+    commandes = Commande.objects.filter(date_commande__gte=debut, date_commande__lt=fin)
     
     # Calculer les totaux
     total_paiements = paiements.aggregate(total=Sum('montant'))['total'] or Decimal('0')
@@ -108,34 +110,3 @@ def send_daily_cash_report():
             'error': str(e)
         }
 
-
-def update_daily_caisse_balance():
-    """
-    Met à jour automatiquement le solde de la caisse en calculant:
-    somme des paiements - somme des dépenses
-    """
-    today = timezone.now().date()
-    
-    caisse = Caisse.get_caisse_ouverte()
-    if not caisse:
-        return {'success': False, 'error': 'Aucune caisse ouverte'}
-    
-    # Calculer les totaux pour la caisse actuelle
-    total_paiements = caisse.paiements.aggregate(total=Sum('montant'))['total'] or Decimal('0')
-    total_depenses = caisse.sorties.aggregate(total=Sum('montant'))['total'] or Decimal('0')
-    
-    # Calculer le nouveau solde
-    nouveau_solde = caisse.solde_initial + total_paiements - total_depenses
-    
-    # Mettre à jour le solde
-    ancien_solde = caisse.solde_actuel
-    caisse.solde_actuel = nouveau_solde
-    caisse.save()
-    
-    return {
-        'success': True,
-        'date': today,
-        'ancien_solde': ancien_solde,
-        'nouveau_solde': nouveau_solde,
-        'difference': nouveau_solde - ancien_solde
-    }
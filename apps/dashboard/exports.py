@@ -1,90 +1,164 @@
 """
-Export utilities for Excel and PDF generation
+Export utilities for Excel, PDF and CSV generation
+
+Les exports Excel utilisent le mode write-only d'openpyxl: les lignes sont lues
+par lots avec values_list().iterator() et écrites au fil de l'eau, le classeur
+est enregistré dans un fichier temporaire puis envoyé par morceaux. La mémoire
+utilisée ne dépend plus du nombre de lignes exportées. Le rapport PDF découpe
+le détail des paiements en tables d'une page et garde en cache les rapports
+des périodes closes.
+
+Les exports CSV (bruts, éventuellement compressés en gzip) sont produits par un
+générateur directement branché sur l'itérateur de la base: le premier octet
+part immédiatement et la mémoire reste constante.
 """
+import csv
+import hashlib
 import io
-from datetime import datetime, timedelta
-from decimal import Decimal
+import tempfile
+import zlib
+from datetime import timedelta
 
-from django.http import HttpResponse
-from django.db.models import Sum, Count
+from django.contrib import messages
+from django.core.cache import cache
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, redirect, render
 from django.utils import timezone
 from django.contrib.auth.decorators import login_required
+from django.views.decorators.http import require_POST
 
 from apps.authentication.decorators import role_required
+from apps.core.periodes import intervalle_dates, lire_periode
+from apps.dashboard.models import DailySalesRollup, ExportJob
 from apps.payments.models import Caisse, Paiement, SortieCaisse
-from apps.orders.models import Commande
+from apps.orders.models import Commande, CommandeItem
 
+TYPE_XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+# Nombre de lignes lues par aller-retour avec la base
+TAILLE_LOT = 2000
+# Taille approximative des morceaux envoyés au client par les exports CSV
+TAILLE_MORCEAU_CSV = 64 * 1024
+# Rapport PDF: lignes par table (une page A4) et cache des périodes closes
+LIGNES_PAR_TABLE_PDF = 40
+DUREE_CACHE_PDF = 7 * 24 * 60 * 60
+TAILLE_MAX_CACHE_PDF = 5 * 1024 * 1024
 
-@login_required
-@role_required(['Radmin', 'Rcomptable'])
-def export_ventes_excel(request):
-    """Export des ventes en Excel"""
-    try:
-        import openpyxl
-        from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-        from openpyxl.utils import get_column_letter
-    except ImportError:
-        return HttpResponse(
-            "La bibliothèque openpyxl n'est pas installée. "
-            "Exécutez: pip install openpyxl",
-            status=500
-        )
-    
-    # Paramètres de date
-    date_debut = request.GET.get('date_debut')
-    date_fin = request.GET.get('date_fin')
-    
-    if date_debut:
-        date_debut = datetime.strptime(date_debut, '%Y-%m-%d').date()
-    else:
-        date_debut = timezone.now().date() - timedelta(days=30)
-    
-    if date_fin:
-        date_fin = datetime.strptime(date_fin, '%Y-%m-%d').date()
-    else:
-        date_fin = timezone.now().date()
-    
-    # Créer le workbook
-    wb = openpyxl.Workbook()
-    
-    # === Feuille 1: Résumé ===
-    ws_resume = wb.active
-    ws_resume.title = "Résumé"
-    
-    # Styles
-    header_font = Font(bold=True, color="FFFFFF", size=12)
-    header_fill = PatternFill(start_color="3B82F6", end_color="3B82F6", fill_type="solid")
-    border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
-    
-    # En-tête
-    ws_resume['A1'] = "RAPPORT DES VENTES"
-    ws_resume['A1'].font = Font(bold=True, size=16)
-    ws_resume['A2'] = f"Période: {date_debut.strftime('%d/%m/%Y')} - {date_fin.strftime('%d/%m/%Y')}"
-    ws_resume['A3'] = f"Généré le: {timezone.now().strftime('%d/%m/%Y à %H:%M')}"
-    
-    # Statistiques
+
+def format_date(date):
+    return timezone.localtime(date).strftime('%d/%m/%Y %H:%M')
+
+
+def lignes_paiements(debut, fin):
+    """Lignes (date, commande, table, montant, mode, encaissé par) des paiements de [debut, fin)"""
+    modes = dict(Paiement.MODE_PAIEMENT_CHOICES)
     paiements = Paiement.objects.filter(
-        date_paiement__date__gte=date_debut,
-        date_paiement__date__lte=date_fin
+        date_paiement__gte=debut,
+        date_paiement__lt=fin
+    ).values_list(
+        'date_paiement', 'commande__numero_commande', 'commande__table__numero_table',
+        'montant', 'mode_paiement', 'utilisateur__login'
     )
-    
+    for date, numero, table, montant, mode, login in paiements.iterator(chunk_size=TAILLE_LOT):
+        yield format_date(date), numero, table, float(montant), modes.get(mode, mode), login
+
+
+def lignes_depenses(debut, fin):
+    """Lignes (date, type, motif, montant, effectuée par) des dépenses de [debut, fin)"""
     depenses = SortieCaisse.objects.filter(
-        date_sortie__date__gte=date_debut,
-        date_sortie__date__lte=date_fin
+        date_sortie__gte=debut,
+        date_sortie__lt=fin
+    ).values_list('date_sortie', 'type_depense__nom', 'motif', 'montant', 'utilisateur__login')
+    for date, type_depense, motif, montant, login in depenses.iterator(chunk_size=TAILLE_LOT):
+        yield format_date(date), type_depense, motif, float(montant), login
+
+
+def lignes_commandes(debut, fin):
+    """Lignes (numéro, table, date, montant, statut) des commandes de [debut, fin)"""
+    statuts = dict(Commande.STATUT_CHOICES)
+    commandes = Commande.objects.filter(
+        date_commande__gte=debut,
+        date_commande__lt=fin
+    ).order_by('-date_commande').values_list(
+        'numero_commande', 'table__numero_table', 'date_commande', 'montant_total', 'statut'
     )
-    
-    total_ventes = paiements.aggregate(total=Sum('montant'))['total'] or Decimal('0')
-    total_depenses = depenses.aggregate(total=Sum('montant'))['total'] or Decimal('0')
-    nb_commandes = paiements.count()
-    
-    ws_resume['A5'] = "STATISTIQUES"
-    ws_resume['A5'].font = Font(bold=True, size=14)
-    
+    for numero, table, date, montant, statut in commandes.iterator(chunk_size=TAILLE_LOT):
+        yield numero, table, format_date(date), float(montant), statuts.get(statut, statut)
+
+
+def suivre_progression(lignes, rappel, total, deja=0):
+    """Relaie `lignes` en signalant l'avancement (0-99 %) à rappel() toutes les TAILLE_LOT lignes"""
+    total = max(total, 1)
+    for n, ligne in enumerate(lignes, start=deja + 1):
+        yield ligne
+        if n % TAILLE_LOT == 0:
+            rappel(min(99, n * 100 // total))
+
+
+def ecrire_feuille(wb, titre, entetes, lignes, largeur=18):
+    """
+    Ajoute une feuille à un classeur write-only: en-tête stylé puis les lignes,
+    écrites au fur et à mesure qu'elles sont produites par l'itérable `lignes`.
+    """
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+    from openpyxl.utils import get_column_letter
+
+    ws = wb.create_sheet(titre)
+    # Les largeurs doivent être définies avant la première ligne
+    for col in range(1, len(entetes) + 1):
+        ws.column_dimensions[get_column_letter(col)].width = largeur
+
+    header_font = Font(bold=True, color="FFFFFF", size=12)
+    header_fill = PatternFill(start_color="3B82F6", end_color="3B82F6", fill_type="solid")
+    cote = Side(style='thin')
+    border = Border(left=cote, right=cote, top=cote, bottom=cote)
+
+    ligne_entete = []
+    for entete in entetes:
+        cell = WriteOnlyCell(ws, value=entete)
+        cell.font = header_font
+        cell.fill = header_fill
+        cell.alignment = Alignment(horizontal='center')
+        cell.border = border
+        ligne_entete.append(cell)
+    ws.append(ligne_entete)
+
+    for ligne in lignes:
+        ws.append(ligne)
+    return ws
+
+
+def ecrire_ventes_excel(fichier, date_debut, date_fin, rappel=None):
+    """
+    Écrit le rapport des ventes (résumé, paiements, dépenses) au format xlsx dans `fichier`.
+    rappel(pourcentage), si fourni, reçoit l'avancement (exports en arrière-plan).
+    """
+    import openpyxl
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+
+    debut, fin = intervalle_dates(date_debut, date_fin)
+    wb = openpyxl.Workbook(write_only=True)
+
+    # === Feuille 1: Résumé ===
+    ws_resume = wb.create_sheet("Résumé")
+
+    def cellule(valeur, **font):
+        cell = WriteOnlyCell(ws_resume, value=valeur)
+        cell.font = Font(bold=True, **font)
+        return cell
+
+    totaux = DailySalesRollup.totaux(date_debut, date_fin)
+    total_ventes = totaux['chiffre_affaires']
+    total_depenses = totaux['depenses']
+    nb_commandes = totaux['nombre_commandes']
+
+    ws_resume.append([cellule("RAPPORT DES VENTES", size=16)])
+    ws_resume.append([f"Période: {date_debut.strftime('%d/%m/%Y')} - {date_fin.strftime('%d/%m/%Y')}"])
+    ws_resume.append([f"Généré le: {timezone.now().strftime('%d/%m/%Y à %H:%M')}"])
+    ws_resume.append([])
+    ws_resume.append([cellule("STATISTIQUES", size=14)])
+
     stats = [
         ("Total des ventes", f"{total_ventes} GNF"),
         ("Nombre de commandes", nb_commandes),
@@ -92,121 +166,162 @@ def export_ventes_excel(request):
         ("Total des dépenses", f"{total_depenses} GNF"),
         ("Bénéfice net", f"{total_ventes - total_depenses} GNF"),
     ]
-    
-    for i, (label, value) in enumerate(stats, start=6):
-        ws_resume[f'A{i}'] = label
-        ws_resume[f'B{i}'] = value
-        ws_resume[f'A{i}'].font = Font(bold=True)
-    
+    for label, value in stats:
+        ws_resume.append([cellule(label), value])
+
+    paiements = lignes_paiements(debut, fin)
+    depenses = lignes_depenses(debut, fin)
+    if rappel:
+        nb_paiements = Paiement.objects.filter(date_paiement__gte=debut, date_paiement__lt=fin).count()
+        total = nb_paiements + SortieCaisse.objects.filter(date_sortie__gte=debut, date_sortie__lt=fin).count()
+        paiements = suivre_progression(paiements, rappel, total)
+        depenses = suivre_progression(depenses, rappel, total, deja=nb_paiements)
+
     # === Feuille 2: Paiements ===
-    ws_paiements = wb.create_sheet("Paiements")
-    
-    headers = ["Date", "Commande", "Table", "Montant", "Mode de paiement", "Encaissé par"]
-    for col, header in enumerate(headers, start=1):
-        cell = ws_paiements.cell(row=1, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = Alignment(horizontal='center')
-        cell.border = border
-    
-    for row, paiement in enumerate(paiements.select_related('commande__table', 'utilisateur'), start=2):
-        ws_paiements.cell(row=row, column=1, value=paiement.date_paiement.strftime('%d/%m/%Y %H:%M'))
-        ws_paiements.cell(row=row, column=2, value=paiement.commande.numero_commande)
-        ws_paiements.cell(row=row, column=3, value=paiement.commande.table.numero_table)
-        ws_paiements.cell(row=row, column=4, value=float(paiement.montant))
-        ws_paiements.cell(row=row, column=5, value=paiement.get_mode_paiement_display())
-        ws_paiements.cell(row=row, column=6, value=paiement.utilisateur.login)
-    
-    # Ajuster la largeur des colonnes
-    for col in range(1, len(headers) + 1):
-        ws_paiements.column_dimensions[get_column_letter(col)].width = 18
-    
+    ecrire_feuille(
+        wb, "Paiements",
+        ["Date", "Commande", "Table", "Montant", "Mode de paiement", "Encaissé par"],
+        paiements
+    )
+
     # === Feuille 3: Dépenses ===
-    ws_depenses = wb.create_sheet("Dépenses")
-    
-    headers_dep = ["Date", "Type", "Motif", "Montant", "Effectuée par"]
-    for col, header in enumerate(headers_dep, start=1):
-        cell = ws_depenses.cell(row=1, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = Alignment(horizontal='center')
-        cell.border = border
-    
-    for row, depense in enumerate(depenses.select_related('type_depense', 'utilisateur'), start=2):
-        ws_depenses.cell(row=row, column=1, value=depense.date_sortie.strftime('%d/%m/%Y %H:%M'))
-        ws_depenses.cell(row=row, column=2, value=depense.type_depense.nom)
-        ws_depenses.cell(row=row, column=3, value=depense.motif)
-        ws_depenses.cell(row=row, column=4, value=float(depense.montant))
-        ws_depenses.cell(row=row, column=5, value=depense.utilisateur.login)
-    
-    for col in range(1, len(headers_dep) + 1):
-        ws_depenses.column_dimensions[get_column_letter(col)].width = 20
-    
-    # Générer la réponse
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
-    
-    filename = f"rapport_ventes_{date_debut.strftime('%Y%m%d')}_{date_fin.strftime('%Y%m%d')}.xlsx"
-    
-    response = HttpResponse(
-        output.read(),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    ecrire_feuille(
+        wb, "Dépenses",
+        ["Date", "Type", "Motif", "Montant", "Effectuée par"],
+        depenses,
+        largeur=20
     )
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    
-    return response
+
+    wb.save(fichier)
+
+
+def ecrire_commandes_excel(fichier, date_debut, date_fin, rappel=None):
+    """Écrit la liste des commandes de la période au format xlsx dans `fichier`"""
+    import openpyxl
+
+    debut, fin = intervalle_dates(date_debut, date_fin)
+    commandes = lignes_commandes(debut, fin)
+    if rappel:
+        total = Commande.objects.filter(date_commande__gte=debut, date_commande__lt=fin).count()
+        commandes = suivre_progression(commandes, rappel, total)
+
+    wb = openpyxl.Workbook(write_only=True)
+    ecrire_feuille(
+        wb, "Commandes",
+        ["N° Commande", "Table", "Date", "Montant", "Statut"],
+        commandes
+    )
+    wb.save(fichier)
+
+
+def reponse_fichier_temporaire(ecrire, filename, content_type, *args):
+    """
+    Génère le document avec ecrire(fichier, *args) dans un fichier temporaire
+    et le renvoie par morceaux (le fichier est supprimé à la fermeture).
+    """
+    fichier = tempfile.TemporaryFile()
+    try:
+        ecrire(fichier, *args)
+    except Exception:
+        fichier.close()
+        raise
+    fichier.seek(0)
+    return FileResponse(fichier, as_attachment=True, filename=filename, content_type=content_type)
 
 
 @login_required
 @role_required(['Radmin', 'Rcomptable'])
-def export_ventes_pdf(request):
-    """Export des ventes en PDF"""
+def export_ventes_excel(request):
+    """Export des ventes en Excel"""
     try:
-        from reportlab.lib import colors
-        from reportlab.lib.pagesizes import A4
-        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-        from reportlab.lib.units import cm
-        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+        import openpyxl  # noqa: F401
     except ImportError:
         return HttpResponse(
-            "La bibliothèque reportlab n'est pas installée. "
-            "Exécutez: pip install reportlab",
+            "La bibliothèque openpyxl n'est pas installée. "
+            "Exécutez: pip install openpyxl",
             status=500
         )
     
     # Paramètres de date
-    date_debut = request.GET.get('date_debut')
-    date_fin = request.GET.get('date_fin')
-    
-    if date_debut:
-        date_debut = datetime.strptime(date_debut, '%Y-%m-%d').date()
-    else:
-        date_debut = timezone.now().date() - timedelta(days=30)
-    
-    if date_fin:
-        date_fin = datetime.strptime(date_fin, '%Y-%m-%d').date()
-    else:
-        date_fin = timezone.now().date()
+    date_debut, date_fin, _, _ = lire_periode(request)
+    filename = f"rapport_ventes_{date_debut.strftime('%Y%m%d')}_{date_fin.strftime('%Y%m%d')}.xlsx"
     
-    # Données
+    return reponse_fichier_temporaire(ecrire_ventes_excel, filename, TYPE_XLSX, date_debut, date_fin)
+
+
+def lignes_pdf_paiements(debut, fin):
+    """Lignes du détail des paiements du rapport PDF, lues par lots"""
+    modes = dict(Paiement.MODE_PAIEMENT_CHOICES)
     paiements = Paiement.objects.filter(
-        date_paiement__date__gte=date_debut,
-        date_paiement__date__lte=date_fin
-    ).select_related('commande__table', 'utilisateur')
-    
-    depenses = SortieCaisse.objects.filter(
-        date_sortie__date__gte=date_debut,
-        date_sortie__date__lte=date_fin
-    ).select_related('type_depense', 'utilisateur')
-    
-    total_ventes = paiements.aggregate(total=Sum('montant'))['total'] or Decimal('0')
-    total_depenses = depenses.aggregate(total=Sum('montant'))['total'] or Decimal('0')
-    nb_commandes = paiements.count()
+        date_paiement__gte=debut,
+        date_paiement__lt=fin
+    ).values_list('date_paiement', 'commande__numero_commande', 'commande__table__numero_table', 'montant', 'mode_paiement')
+    for date, numero, table, montant, mode in paiements.iterator(chunk_size=TAILLE_LOT):
+        yield [timezone.localtime(date).strftime('%d/%m/%Y'), numero, table, f"{montant} GNF", modes.get(mode, mode)]
+
+
+def par_paquets(lignes, taille):
+    paquet = []
+    for ligne in lignes:
+        paquet.append(ligne)
+        if len(paquet) == taille:
+            yield paquet
+            paquet = []
+    if paquet:
+        yield paquet
+
+
+def ecrire_ventes_pdf(fichier, date_debut, date_fin, rappel=None):
+    """
+    Écrit le rapport des ventes au format PDF dans `fichier`.
+    Le rapport d'une période close est mis en cache (clé: période, totaux du
+    rollup et date de sa dernière variation, pour qu'une correction tardive
+    produise un nouveau rapport même si les totaux retombent sur les mêmes valeurs).
+    """
+    totaux = DailySalesRollup.totaux(date_debut, date_fin)
+    
+    cle = None
+    if date_fin < timezone.localdate():
+        date_maj = totaux['date_maj'].isoformat() if totaux['date_maj'] else ''
+        empreinte = f"{totaux['chiffre_affaires']}:{totaux['nombre_commandes']}:{totaux['depenses']}:{date_maj}"
+        cle = f"exports:pdf:ventes:{date_debut:%Y%m%d}:{date_fin:%Y%m%d}:{hashlib.md5(empreinte.encode()).hexdigest()}"
+        contenu = cache.get(cle)
+        if contenu is not None:
+            fichier.write(contenu)
+            if rappel:
+                rappel(100)
+            return
+    
+    position = fichier.tell()
+    generer_ventes_pdf(fichier, date_debut, date_fin, totaux, rappel)
+    
+    if cle and fichier.tell() - position <= TAILLE_MAX_CACHE_PDF:
+        fin_fichier = fichier.tell()
+        fichier.seek(position)
+        cache.set(cle, fichier.read(), DUREE_CACHE_PDF)
+        fichier.seek(fin_fichier)
+
+
+def generer_ventes_pdf(fichier, date_debut, date_fin, totaux, rappel=None):
+    """
+    Construit le rapport PDF. Le détail des paiements est lu par lots et découpé
+    en tables d'une page (LIGNES_PAR_TABLE_PDF lignes): ReportLab met en page
+    chaque petite table sans avoir à redécouper une table géante à chaque page.
+    """
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.units import cm
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    
+    debut, fin = intervalle_dates(date_debut, date_fin)
+    
+    total_ventes = totaux['chiffre_affaires']
+    total_depenses = totaux['depenses']
+    nb_commandes = totaux['nombre_commandes']
     
     # Créer le PDF
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=2*cm, bottomMargin=2*cm)
+    doc = SimpleDocTemplate(fichier, pagesize=A4, topMargin=2*cm, bottomMargin=2*cm)
     
     elements = []
     styles = getSampleStyleSheet()
@@ -257,43 +372,70 @@ def export_ventes_pdf(request):
     # Liste des paiements
     elements.append(Paragraph("DÉTAIL DES PAIEMENTS", styles['Heading2']))
     
-    if paiements.exists():
-        payment_data = [["Date", "Commande", "Table", "Montant", "Mode"]]
-        for p in paiements[:50]:  # Limiter à 50 pour éviter des PDF trop longs
-            payment_data.append([
-                p.date_paiement.strftime('%d/%m/%Y'),
-                p.commande.numero_commande,
-                p.commande.table.numero_table,
-                f"{p.montant} GNF",
-                p.get_mode_paiement_display()
-            ])
-        
-        payment_table = Table(payment_data, colWidths=[3*cm, 4*cm, 2.5*cm, 2.5*cm, 3*cm])
-        payment_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#10B981')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 9),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#E2E8F0')),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#F8FAFC')]),
-        ]))
+    payment_style = TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#10B981')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 9),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#E2E8F0')),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#F8FAFC')]),
+    ])
+    payment_header = ["Date", "Commande", "Table", "Montant", "Mode"]
+    
+    lignes = lignes_pdf_paiements(debut, fin)
+    if rappel:
+        # Lecture des lignes: 0-50 %, mise en page: 50-99 %
+        total = Paiement.objects.filter(date_paiement__gte=debut, date_paiement__lt=fin).count()
+        lignes = suivre_progression(lignes, lambda pourcentage: rappel(pourcentage // 2), total)
+    
+    nb_tables = 0
+    for paquet in par_paquets(lignes, LIGNES_PAR_TABLE_PDF):
+        payment_table = Table([payment_header] + paquet, colWidths=[3*cm, 4*cm, 2.5*cm, 2.5*cm, 3*cm])
+        payment_table.setStyle(payment_style)
         elements.append(payment_table)
-    else:
+        nb_tables += 1
+    
+    if not nb_tables:
         elements.append(Paragraph("Aucun paiement pour cette période.", styles['Normal']))
     
+    if rappel:
+        etat = {'taille': len(elements)}
+        
+        def progression_mise_en_page(type_progression, valeur):
+            if type_progression == 'SIZE_EST':
+                etat['taille'] = max(valeur, 1)
+            elif type_progression == 'PROGRESS':
+                rappel(min(99, 50 + valeur * 50 // etat['taille']))
+        
+        doc.setProgressCallBack(progression_mise_en_page)
+    
     # Générer le PDF
     doc.build(elements)
+    if rappel:
+        rappel(100)
+
+
+@login_required
+@role_required(['Radmin', 'Rcomptable'])
+def export_ventes_pdf(request):
+    """Export des ventes en PDF"""
+    try:
+        import reportlab  # noqa: F401
+    except ImportError:
+        return HttpResponse(
+            "La bibliothèque reportlab n'est pas installée. "
+            "Exécutez: pip install reportlab",
+            status=500
+        )
     
-    buffer.seek(0)
+    # Paramètres de date
+    date_debut, date_fin, _, _ = lire_periode(request)
     filename = f"rapport_ventes_{date_debut.strftime('%Y%m%d')}_{date_fin.strftime('%Y%m%d')}.pdf"
     
-    response = HttpResponse(buffer.read(), content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    
-    return response
+    return reponse_fichier_temporaire(ecrire_ventes_pdf, filename, 'application/pdf', date_debut, date_fin)
 
 
 @login_required
@@ -301,68 +443,226 @@ def export_ventes_pdf(request):
 def export_commandes_excel(request):
     """Export des commandes en Excel"""
     try:
-        import openpyxl
-        from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-        from openpyxl.utils import get_column_letter
+        import openpyxl  # noqa: F401
     except ImportError:
         return HttpResponse(
             "La bibliothèque openpyxl n'est pas installée.",
             status=500
         )
     
-    date_debut = request.GET.get('date_debut')
-    date_fin = request.GET.get('date_fin')
-    
-    if date_debut:
-        date_debut = datetime.strptime(date_debut, '%Y-%m-%d').date()
-    else:
-        date_debut = timezone.now().date() - timedelta(days=30)
-    
-    if date_fin:
-        date_fin = datetime.strptime(date_fin, '%Y-%m-%d').date()
-    else:
-        date_fin = timezone.now().date()
-    
-    commandes = Commande.objects.filter(
-        date_commande__date__gte=date_debut,
-        date_commande__date__lte=date_fin
-    ).select_related('table').order_by('-date_commande')
-    
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Commandes"
-    
-    # Styles
-    header_font = Font(bold=True, color="FFFFFF", size=11)
-    header_fill = PatternFill(start_color="3B82F6", end_color="3B82F6", fill_type="solid")
-    
-    headers = ["N° Commande", "Table", "Date", "Montant", "Statut"]
-    for col, header in enumerate(headers, start=1):
-        cell = ws.cell(row=1, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = Alignment(horizontal='center')
-    
-    for row, cmd in enumerate(commandes, start=2):
-        ws.cell(row=row, column=1, value=cmd.numero_commande)
-        ws.cell(row=row, column=2, value=cmd.table.numero_table)
-        ws.cell(row=row, column=3, value=cmd.date_commande.strftime('%d/%m/%Y %H:%M'))
-        ws.cell(row=row, column=4, value=float(cmd.montant_total))
-        ws.cell(row=row, column=5, value=cmd.get_statut_display())
-    
-    for col in range(1, len(headers) + 1):
-        ws.column_dimensions[get_column_letter(col)].width = 18
-    
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
-    
+    date_debut, date_fin, _, _ = lire_periode(request)
     filename = f"commandes_{date_debut.strftime('%Y%m%d')}_{date_fin.strftime('%Y%m%d')}.xlsx"
     
-    response = HttpResponse(
-        output.read(),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    return reponse_fichier_temporaire(ecrire_commandes_excel, filename, TYPE_XLSX, date_debut, date_fin)
+
+
+# === Exports CSV ===
+
+def format_date_csv(date):
+    return timezone.localtime(date).strftime('%Y-%m-%d %H:%M:%S') if date else ''
+
+
+def csv_paiements(debut, fin):
+    modes = dict(Paiement.MODE_PAIEMENT_CHOICES)
+    paiements = Paiement.objects.filter(
+        date_paiement__gte=debut,
+        date_paiement__lt=fin
+    ).order_by('date_paiement').values_list(
+        'date_paiement', 'commande__numero_commande', 'commande__table__numero_table', 'montant',
+        'mode_paiement', 'reference', 'caisse_id', 'utilisateur__login', 'est_valide'
     )
+    for date, numero, table, montant, mode, reference, caisse, login, valide in paiements.iterator(chunk_size=TAILLE_LOT):
+        yield format_date_csv(date), numero, table, montant, modes.get(mode, mode), reference, caisse, login, int(valide)
+
+
+def csv_depenses(debut, fin):
+    depenses = SortieCaisse.objects.filter(
+        date_sortie__gte=debut,
+        date_sortie__lt=fin
+    ).order_by('date_sortie').values_list(
+        'date_sortie', 'type_depense__nom', 'motif', 'montant', 'caisse_id', 'utilisateur__login'
+    )
+    for date, type_depense, motif, montant, caisse, login in depenses.iterator(chunk_size=TAILLE_LOT):
+        yield format_date_csv(date), type_depense, motif, montant, caisse, login
+
+
+def csv_commandes(debut, fin):
+    statuts = dict(Commande.STATUT_CHOICES)
+    commandes = Commande.objects.filter(
+        date_commande__gte=debut,
+        date_commande__lt=fin
+    ).order_by('date_commande').values_list(
+        'numero_commande', 'table__numero_table', 'date_commande', 'statut', 'montant_total',
+        'date_service', 'date_paiement'
+    )
+    for numero, table, date, statut, montant, servie, payee in commandes.iterator(chunk_size=TAILLE_LOT):
+        yield numero, table, format_date_csv(date), statuts.get(statut, statut), montant, format_date_csv(servie), format_date_csv(payee)
+
+
+def csv_lignes_commandes(debut, fin):
+    statuts = dict(Commande.STATUT_CHOICES)
+    items = CommandeItem.objects.filter(
+        commande__date_commande__gte=debut,
+        commande__date_commande__lt=fin
+    ).order_by('commande__date_commande', 'id').values_list(
+        'commande__numero_commande', 'commande__date_commande', 'commande__statut',
+        'plat__nom', 'quantite', 'prix_unitaire'
+    )
+    for numero, date, statut, plat, quantite, prix in items.iterator(chunk_size=TAILLE_LOT):
+        yield numero, format_date_csv(date), statuts.get(statut, statut), plat, quantite, prix, quantite * prix
+
+
+# Jeux de données exportables en CSV: nom -> (préfixe du fichier, en-têtes, lignes)
+EXPORTS_CSV = {
+    'paiements': (
+        'paiements',
+        ["date", "commande", "table", "montant", "mode_paiement", "reference", "caisse", "encaisse_par", "valide"],
+        csv_paiements,
+    ),
+    'depenses': (
+        'depenses',
+        ["date", "type", "motif", "montant", "caisse", "effectuee_par"],
+        csv_depenses,
+    ),
+    'commandes': (
+        'commandes',
+        ["commande", "table", "date", "statut", "montant_total", "date_service", "date_paiement"],
+        csv_commandes,
+    ),
+    'lignes-commandes': (
+        'lignes_commandes',
+        ["commande", "date", "statut", "plat", "quantite", "prix_unitaire", "sous_total"],
+        csv_lignes_commandes,
+    ),
+}
+
+
+def flux_csv(entetes, lignes):
+    """
+    Générateur de texte CSV (séparateur ';', BOM UTF-8 pour Excel), regroupé
+    en morceaux d'environ TAILLE_MORCEAU_CSV caractères.
+    """
+    tampon = io.StringIO()
+    writer = csv.writer(tampon, delimiter=';')
+    tampon.write('\ufeff')
+    writer.writerow(entetes)
+    for ligne in lignes:
+        writer.writerow(ligne)
+        if tampon.tell() >= TAILLE_MORCEAU_CSV:
+            yield tampon.getvalue()
+            tampon.seek(0)
+            tampon.truncate()
+    yield tampon.getvalue()
+
+
+def compresser_gzip(morceaux):
+    """Compresse au fil de l'eau un flux de texte au format gzip"""
+    compresseur = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for morceau in morceaux:
+        donnees = compresseur.compress(morceau.encode('utf-8'))
+        if donnees:
+            yield donnees
+    yield compresseur.flush()
+
+
+@login_required
+@role_required(['Radmin', 'Rcomptable'])
+def export_csv(request, donnees, compresse=False):
+    """Export CSV brut (paiements, dépenses, commandes ou lignes de commandes), éventuellement gzip"""
+    if donnees not in EXPORTS_CSV:
+        raise Http404("Export inconnu")
+    prefixe, entetes, lignes = EXPORTS_CSV[donnees]
+    
+    date_debut, date_fin, debut, fin = lire_periode(request)
+    filename = f"{prefixe}_{date_debut.strftime('%Y%m%d')}_{date_fin.strftime('%Y%m%d')}.csv"
+    
+    flux = flux_csv(entetes, lignes(debut, fin))
+    if compresse:
+        response = StreamingHttpResponse(compresser_gzip(flux), content_type='application/gzip')
+        filename += '.gz'
+    else:
+        response = StreamingHttpResponse(flux, content_type='text/csv; charset=utf-8')
     response['Content-Disposition'] = f'attachment; filename="{filename}"'
     
     return response
+
+
+# === Exports en arrière-plan ===
+
+# Fonctions exécutées par le worker traiter_exports (voir ExportJob):
+# type -> (fonction d'écriture, préfixe du fichier, extension)
+TACHES_EXPORT = {
+    'ventes_excel': (ecrire_ventes_excel, 'rapport_ventes', 'xlsx'),
+    'ventes_pdf': (ecrire_ventes_pdf, 'rapport_ventes', 'pdf'),
+    'commandes_excel': (ecrire_commandes_excel, 'commandes', 'xlsx'),
+}
+
+TYPES_CONTENU = {
+    'xlsx': TYPE_XLSX,
+    'pdf': 'application/pdf',
+}
+
+
+@login_required
+@role_required(['Radmin', 'Rcomptable'])
+def liste_exports(request):
+    """Exports demandés par l'utilisateur, avec leur progression et le lien de téléchargement"""
+    exports = ExportJob.objects.filter(utilisateur=request.user)[:20]
+    today = timezone.localdate()
+    
+    return render(request, 'dashboard/exports.html', {
+        'exports': exports,
+        'types_export': ExportJob.TYPE_CHOICES,
+        'exports_actifs': any(job.est_actif for job in exports),
+        'date_debut': today - timedelta(days=30),
+        'date_fin': today,
+    })
+
+
+@login_required
+@role_required(['Radmin', 'Rcomptable'])
+@require_POST
+def demander_export(request):
+    """Met un export dans la file du worker traiter_exports"""
+    type_export = request.POST.get('type_export')
+    if type_export not in TACHES_EXPORT:
+        messages.error(request, "Type d'export inconnu.")
+        return redirect('dashboard:liste_exports')
+    
+    date_debut, date_fin, _, _ = lire_periode(request, donnees=request.POST)
+    if date_debut > date_fin:
+        messages.error(request, "La date de début doit précéder la date de fin.")
+        return redirect('dashboard:liste_exports')
+    
+    job, cree = ExportJob.objects.get_or_create(
+        utilisateur=request.user,
+        type_export=type_export,
+        date_debut=date_debut,
+        date_fin=date_fin,
+        statut__in=ExportJob.STATUTS_ACTIFS,
+        defaults={'statut': 'en_attente'}
+    )
+    if cree:
+        messages.success(request, f"Export « {job.get_type_export_display()} » mis en file d'attente.")
+    else:
+        messages.info(request, "Cet export est déjà en cours de préparation.")
+    
+    return redirect('dashboard:liste_exports')
+
+
+@login_required
+@role_required(['Radmin', 'Rcomptable'])
+def telecharger_export(request, pk):
+    """Téléchargement d'un export terminé et non expiré"""
+    job = get_object_or_404(ExportJob, pk=pk, utilisateur=request.user)
+    if not job.est_telechargeable:
+        messages.error(request, "Ce fichier n'est pas (ou plus) disponible.")
+        return redirect('dashboard:liste_exports')
+    
+    _, _, extension = TACHES_EXPORT[job.type_export]
+    return FileResponse(
+        job.fichier.open('rb'),
+        as_attachment=True,
+        filename=job.nom_fichier,
+        content_type=TYPES_CONTENU[extension]
+    )
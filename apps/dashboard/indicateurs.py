@@ -0,0 +1,139 @@
+"""
+Indicateurs (KPI) du tableau de bord.
+
+Chaque famille d'indicateurs est calculée en une seule requête par agrégation
+conditionnelle (Count/Sum avec filter=Q(...)) au lieu d'une requête par chiffre:
+commandes, ventes (lues dans DailySalesRollup, avec la série du graphique des
+sept derniers jours) et tables.
+"""
+from dataclasses import dataclass
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Avg, Count, Q, Sum
+from django.utils import timezone
+
+from apps.core.periodes import debut_jour
+from apps.dashboard.models import DailySalesRollup
+from apps.menu.models import Plat
+from apps.orders.models import Commande
+from apps.tables.models import TableRestaurant
+
+
+@dataclass(frozen=True)
+class IndicateursDashboard:
+    jour: date
+    commandes_en_attente: int
+    commandes_servies: int
+    commandes_payees_today: int
+    # Montant moyen des commandes payées sur les trente derniers jours
+    commande_moyenne: Decimal
+    ca_today: Decimal
+    ca_week: Decimal
+    ca_month: Decimal
+    depenses_today: Decimal
+    depenses_month: Decimal
+    tables_total: int
+    tables_libres: int
+    # ((jour, chiffre d'affaires, nombre de commandes), ...) des sept jours précédents
+    ventes_par_jour: tuple
+
+    @property
+    def tables_occupees(self):
+        return self.tables_total - self.tables_libres
+
+
+def indicateurs_commandes(today):
+    """
+    Commandes en attente, servies et payées aujourd'hui, et montant moyen des
+    commandes payées sur les trente derniers jours (une requête)
+    """
+    debut_today = debut_jour(today)
+    fin_today = debut_jour(today + timedelta(days=1))
+    payees_today = Q(statut='payee', date_paiement__gte=debut_today, date_paiement__lt=fin_today)
+    payees_mois = Q(statut='payee', date_paiement__gte=debut_jour(today - timedelta(days=30)))
+
+    indicateurs = Commande.objects.filter(
+        Q(statut__in=['en_attente', 'servie']) | payees_today | payees_mois
+    ).aggregate(
+        commandes_en_attente=Count('id', filter=Q(statut='en_attente')),
+        commandes_servies=Count('id', filter=Q(statut='servie')),
+        commandes_payees_today=Count('id', filter=payees_today),
+        commande_moyenne=Avg('montant_total', filter=payees_mois),
+    )
+    indicateurs['commande_moyenne'] = round(indicateurs['commande_moyenne'] or Decimal('0.00'), 2)
+    return indicateurs
+
+
+def indicateurs_ventes(today):
+    """
+    Chiffre d'affaires et dépenses du jour, de la semaine et du mois, et ventes
+    de chacun des sept jours précédents pour le graphique (une requête)
+    """
+    week_ago = today - timedelta(days=7)
+    month_ago = today - timedelta(days=30)
+    jours = [week_ago + timedelta(days=i) for i in range(7)]
+
+    series = {}
+    for i, jour in enumerate(jours):
+        series[f'ca_{i}'] = Sum('chiffre_affaires', filter=Q(jour=jour))
+        series[f'nombre_{i}'] = Sum('nombre_commandes', filter=Q(jour=jour))
+
+    totaux = DailySalesRollup.objects.filter(jour__gte=month_ago).aggregate(
+        ca_today=Sum('chiffre_affaires', filter=Q(jour=today)),
+        ca_week=Sum('chiffre_affaires', filter=Q(jour__gte=week_ago)),
+        ca_month=Sum('chiffre_affaires'),
+        depenses_today=Sum('depenses', filter=Q(jour=today)),
+        depenses_month=Sum('depenses'),
+        **series
+    )
+    ventes_par_jour = tuple(
+        (jour, totaux.pop(f'ca_{i}') or Decimal('0.00'), totaux.pop(f'nombre_{i}') or 0)
+        for i, jour in enumerate(jours)
+    )
+    return {
+        'ventes_par_jour': ventes_par_jour,
+        **{
+            cle: valeur if valeur is not None else Decimal('0.00')
+            for cle, valeur in totaux.items()
+        },
+    }
+
+
+def indicateurs_tables():
+    """Nombre total de tables et de tables libres (une requête)"""
+    return TableRestaurant.objects.aggregate(
+        tables_total=Count('id'),
+        tables_libres=Count('id', filter=Q(current_status='libre')),
+    )
+
+
+CLE_PLATS_POPULAIRES = 'dashboard:plats_populaires'
+DUREE_PLATS_POPULAIRES = 5 * 60
+
+
+def get_plats_populaires():
+    """
+    Les cinq plats les plus commandés sur tout l'historique. Le classement
+    compte toutes les lignes de commandes: il est gardé quelques minutes en
+    cache plutôt que recalculé à chaque affichage du tableau de bord.
+    """
+    plats = cache.get(CLE_PLATS_POPULAIRES)
+    if plats is None:
+        plats = list(Plat.objects.annotate(
+            nb_commandes=Count('commande_items')
+        ).order_by('-nb_commandes')[:5])
+        cache.set(CLE_PLATS_POPULAIRES, plats, DUREE_PLATS_POPULAIRES)
+    return plats
+
+
+def calculer_indicateurs(today=None):
+    """Calcule tous les indicateurs du tableau de bord en trois requêtes"""
+    today = today or timezone.localdate()
+    return IndicateursDashboard(
+        jour=today,
+        **indicateurs_commandes(today),
+        **indicateurs_ventes(today),
+        **indicateurs_tables(),
+    )
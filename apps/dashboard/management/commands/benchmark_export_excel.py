@@ -0,0 +1,86 @@
+import tempfile
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from apps.dashboard.exports import ecrire_feuille
+
+ENTETES = ["Date", "Commande", "Table", "Montant", "Mode de paiement", "Encaissé par"]
+
+
+def lignes_synthetiques(nombre):
+    """Lignes au format de la feuille Paiements, sans passer par la base"""
+    for i in range(nombre):
+        yield (
+            f"{i % 28 + 1:02d}/01/2025 {i % 24:02d}:{i % 60:02d}",
+            f"CMD-20250101-{i:06d}",
+            f"T{i % 40 + 1}",
+            float(1000 + i % 50000),
+            "Espèces",
+            "caissier01",
+        )
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare la génération d\'une feuille Excel de paiements avec un classeur '
+        'openpyxl classique (cellule par cellule, en mémoire) et avec le classeur '
+        'write-only utilisé par les exports: durée et pic de mémoire Python.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lignes',
+            type=int,
+            default=500000,
+            help='Nombre de lignes à écrire (défaut: 500000)'
+        )
+        parser.add_argument(
+            '--sans-classique',
+            action='store_true',
+            help='Ne mesurer que le mode write-only'
+        )
+
+    def classique(self, nombre, fichier):
+        import openpyxl
+
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.title = "Paiements"
+        for col, entete in enumerate(ENTETES, start=1):
+            ws.cell(row=1, column=col, value=entete)
+        for row, ligne in enumerate(lignes_synthetiques(nombre), start=2):
+            for col, valeur in enumerate(ligne, start=1):
+                ws.cell(row=row, column=col, value=valeur)
+        wb.save(fichier)
+
+    def write_only(self, nombre, fichier):
+        import openpyxl
+
+        wb = openpyxl.Workbook(write_only=True)
+        ecrire_feuille(wb, "Paiements", ENTETES, lignes_synthetiques(nombre))
+        wb.save(fichier)
+
+    def mesurer(self, libelle, fonction, nombre):
+        with tempfile.TemporaryFile() as fichier:
+            tracemalloc.start()
+            debut = time.perf_counter()
+            fonction(nombre, fichier)
+            duree = time.perf_counter() - debut
+            _, pic = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            taille = fichier.tell()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{libelle}: {duree:.1f} s, pic mémoire {pic / 1024 / 1024:.1f} Mo, '
+            f'fichier {taille / 1024 / 1024:.1f} Mo'
+        ))
+
+    def handle(self, *args, **options):
+        nombre = options['lignes']
+        self.stdout.write(f'{nombre} lignes de paiements')
+
+        self.mesurer('write-only', self.write_only, nombre)
+        if not options['sans_classique']:
+            self.mesurer('classique', self.classique, nombre)
@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Sum, Count
+from django.db.models.functions import TruncDate
+
+from apps.core.periodes import debut_jour, lire_date
+from apps.dashboard.models import DailySalesRollup
+from apps.payments.models import Paiement, SortieCaisse
+
+
+class Command(BaseCommand):
+    help = 'Reconstruit entièrement la table DailySalesRollup à partir des paiements et des sorties de caisse'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--depuis',
+            help='Ne reconstruire qu\'à partir de ce jour (YYYY-MM-DD)'
+        )
+
+    def handle(self, *args, **options):
+        paiements = Paiement.objects.all()
+        sorties = SortieCaisse.objects.all()
+        rollups = DailySalesRollup.objects.all()
+
+        if options['depuis']:
+            depuis = lire_date(options['depuis'])
+            if not depuis:
+                raise CommandError('Date invalide, format attendu: YYYY-MM-DD')
+            paiements = paiements.filter(date_paiement__gte=debut_jour(depuis))
+            sorties = sorties.filter(date_sortie__gte=debut_jour(depuis))
+            rollups = rollups.filter(jour__gte=depuis)
+
+        lignes = {}
+        ventes = (
+            paiements.annotate(jour=TruncDate('date_paiement'))
+            .values('jour', 'mode_paiement')
+            .annotate(total=Sum('montant'), nombre=Count('id'))
+            .order_by()
+        )
+        for v in ventes:
+            lignes[(v['jour'], v['mode_paiement'])] = DailySalesRollup(
+                jour=v['jour'],
+                mode_paiement=v['mode_paiement'],
+                chiffre_affaires=v['total'],
+                nombre_commandes=v['nombre']
+            )
+
+        depenses = (
+            sorties.annotate(jour=TruncDate('date_sortie'))
+            .values('jour')
+            .annotate(total=Sum('montant'))
+            .order_by()
+        )
+        for d in depenses:
+            lignes[(d['jour'], DailySalesRollup.MODE_DEPENSES)] = DailySalesRollup(
+                jour=d['jour'],
+                mode_paiement=DailySalesRollup.MODE_DEPENSES,
+                depenses=d['total']
+            )
+
+        with transaction.atomic():
+            rollups.delete()
+            DailySalesRollup.objects.bulk_create(lignes.values(), batch_size=500)
+
+        self.stdout.write(self.style.SUCCESS(f'{len(lignes)} ligne(s) de rollup reconstruite(s)'))
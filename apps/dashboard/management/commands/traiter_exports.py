@@ -0,0 +1,74 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.dashboard.models import ExportJob
+
+
+class Command(BaseCommand):
+    help = (
+        'Worker des exports en arrière-plan: traite les ExportJob en attente '
+        '(file d\'attente en base de données), relance les jobs abandonnés et '
+        'supprime les fichiers expirés. Plusieurs workers peuvent tourner en parallèle.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--une-fois',
+            action='store_true',
+            help='Vider la file d\'attente puis s\'arrêter'
+        )
+        parser.add_argument(
+            '--intervalle',
+            type=float,
+            default=2,
+            help='Secondes entre deux consultations de la file vide (défaut: 2)'
+        )
+
+    def entretenir(self):
+        relances, abandonnes = ExportJob.relancer_bloques()
+        expires = ExportJob.purger_expires()
+        if relances or abandonnes or expires:
+            self.stdout.write(
+                f'{relances} job(s) relancé(s), {abandonnes} abandonné(s), '
+                f'{expires} fichier(s) expiré(s) supprimé(s)'
+            )
+
+    def traiter_file(self):
+        """Traite les jobs en attente; retourne le nombre de jobs traités"""
+        traites = 0
+        while True:
+            job = ExportJob.reserver()
+            if job is None:
+                return traites
+
+            self.stdout.write(f'Export {job.pk}: {job}')
+            debut = time.perf_counter()
+            if job.executer():
+                self.stdout.write(self.style.SUCCESS(
+                    f'Export {job.pk} terminé en {time.perf_counter() - debut:.1f} s'
+                ))
+            else:
+                self.stdout.write(self.style.ERROR(f'Export {job.pk} en échec: {job.erreur}'))
+            traites += 1
+
+    def handle(self, *args, **options):
+        self.entretenir()
+        if options['une_fois']:
+            self.traiter_file()
+            return
+
+        self.stdout.write('Worker des exports démarré (Ctrl+C pour arrêter)')
+        dernier_entretien = time.monotonic()
+        try:
+            while True:
+                # Processus de longue durée: ne pas garder de connexion périmée
+                close_old_connections()
+                if not self.traiter_file():
+                    time.sleep(options['intervalle'])
+                if time.monotonic() - dernier_entretien > 60:
+                    self.entretenir()
+                    dernier_entretien = time.monotonic()
+        except KeyboardInterrupt:
+            self.stdout.write('Worker arrêté')
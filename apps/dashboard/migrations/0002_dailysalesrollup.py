@@ -0,0 +1,67 @@
+# Generated by Django 4.2.27 on 2026-10-18 09:44
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def initialiser_rollup(apps, schema_editor):
+    DailySalesRollup = apps.get_model('dashboard', 'DailySalesRollup')
+    Paiement = apps.get_model('payments', 'Paiement')
+    SortieCaisse = apps.get_model('payments', 'SortieCaisse')
+
+    lignes = {}
+    ventes = (
+        Paiement.objects.annotate(jour=TruncDate('date_paiement'))
+        .values('jour', 'mode_paiement')
+        .annotate(total=Sum('montant'), nombre=Count('id'))
+        .order_by()
+    )
+    for v in ventes:
+        lignes[(v['jour'], v['mode_paiement'])] = DailySalesRollup(
+            jour=v['jour'], mode_paiement=v['mode_paiement'],
+            chiffre_affaires=v['total'], nombre_commandes=v['nombre'],
+        )
+    depenses = (
+        SortieCaisse.objects.annotate(jour=TruncDate('date_sortie'))
+        .values('jour')
+        .annotate(total=Sum('montant'))
+        .order_by()
+    )
+    for d in depenses:
+        lignes[(d['jour'], '')] = DailySalesRollup(jour=d['jour'], mode_paiement='', depenses=d['total'])
+    DailySalesRollup.objects.bulk_create(lignes.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0001_initial'),
+        ('payments', '0003_index_filtres'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jour', models.DateField(verbose_name='Jour')),
+                ('mode_paiement', models.CharField(blank=True, max_length=10, verbose_name='Mode de paiement')),
+                ('chiffre_affaires', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name="Chiffre d'affaires")),
+                ('nombre_commandes', models.IntegerField(default=0, verbose_name='Nombre de commandes')),
+                ('depenses', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='Dépenses')),
+            ],
+            options={
+                'verbose_name': 'Ventes journalières',
+                'verbose_name_plural': 'Ventes journalières',
+                'db_table': 'rollup_ventes_journalieres',
+                'ordering': ['-jour', 'mode_paiement'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailysalesrollup',
+            constraint=models.UniqueConstraint(fields=('jour', 'mode_paiement'), name='rollup_jour_mode_unique'),
+        ),
+        migrations.RunPython(initialiser_rollup, migrations.RunPython.noop),
+    ]
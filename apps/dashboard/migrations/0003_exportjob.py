@@ -0,0 +1,44 @@
+# Generated by Django 4.2.27 on 2026-10-18 10:05
+
+import apps.dashboard.models
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('dashboard', '0002_dailysalesrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type_export', models.CharField(choices=[('ventes_excel', 'Rapport des ventes (Excel)'), ('ventes_pdf', 'Rapport des ventes (PDF)'), ('commandes_excel', 'Commandes (Excel)')], max_length=30, verbose_name="Type d'export")),
+                ('date_debut', models.DateField(verbose_name='Début de période')),
+                ('date_fin', models.DateField(verbose_name='Fin de période')),
+                ('statut', models.CharField(choices=[('en_attente', 'En attente'), ('en_cours', 'En cours'), ('termine', 'Terminé'), ('echec', 'Échec'), ('expire', 'Expiré')], default='en_attente', max_length=20, verbose_name='Statut')),
+                ('progression', models.PositiveSmallIntegerField(default=0, verbose_name='Progression (%)')),
+                ('tentatives', models.PositiveSmallIntegerField(default=0, verbose_name='Tentatives')),
+                ('fichier', models.FileField(blank=True, storage=apps.dashboard.models.stockage_exports, upload_to='%Y/%m/', verbose_name='Fichier')),
+                ('nom_fichier', models.CharField(blank=True, max_length=150, verbose_name='Nom du fichier')),
+                ('erreur', models.TextField(blank=True, verbose_name='Erreur')),
+                ('date_creation', models.DateTimeField(auto_now_add=True, verbose_name='Date de demande')),
+                ('date_maj', models.DateTimeField(auto_now=True, verbose_name='Dernière mise à jour')),
+                ('date_fin_traitement', models.DateTimeField(blank=True, null=True, verbose_name='Date de fin de traitement')),
+                ('date_expiration', models.DateTimeField(blank=True, null=True, verbose_name="Date d'expiration")),
+                ('utilisateur', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exports', to=settings.AUTH_USER_MODEL, verbose_name='Demandé par')),
+            ],
+            options={
+                'verbose_name': 'Export en arrière-plan',
+                'verbose_name_plural': 'Exports en arrière-plan',
+                'db_table': 'exports_jobs',
+                'ordering': ['-date_creation'],
+                'indexes': [models.Index(fields=['statut', 'date_creation'], name='exports_statut_date_idx'), models.Index(fields=['utilisateur', 'date_creation'], name='exports_user_date_idx')],
+            },
+        ),
+    ]
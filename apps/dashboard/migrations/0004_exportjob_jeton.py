@@ -0,0 +1,18 @@
+# Generated by Django 4.2.27 on 2026-10-18 10:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0003_exportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportjob',
+            name='jeton',
+            field=models.UUIDField(blank=True, editable=False, null=True, verbose_name='Jeton de réservation'),
+        ),
+    ]
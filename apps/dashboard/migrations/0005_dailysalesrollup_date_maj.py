@@ -0,0 +1,18 @@
+# Generated by Django 4.2.27 on 2026-10-18 10:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0004_exportjob_jeton'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailysalesrollup',
+            name='date_maj',
+            field=models.DateTimeField(auto_now=True, verbose_name='Dernière mise à jour'),
+        ),
+    ]
@@ -1,4 +1,18 @@
-from django.db import models
+import logging
+import tempfile
+import threading
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import connection, models, transaction, IntegrityError
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
 
 
 class DummyDashboardModel(models.Model):
@@ -7,3 +21,312 @@ class DummyDashboardModel(models.Model):
     class Meta:
         managed = False
         db_table = 'dashboard_dummy'
+
+
+class DailySalesRollup(models.Model):
+    """
+    Agrégat journalier des ventes par mode de paiement.
+
+    Tenu à jour de façon incrémentale par Paiement.save()/delete() et
+    SortieCaisse.save()/delete(); reconstructible avec la commande
+    reconstruire_rollup_ventes. Les dépenses, qui n'ont pas de mode de
+    paiement, sont portées par la ligne mode_paiement='' du jour.
+    """
+    MODE_DEPENSES = ''
+
+    jour = models.DateField(verbose_name='Jour')
+    mode_paiement = models.CharField(max_length=10, blank=True, verbose_name='Mode de paiement')
+    chiffre_affaires = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        verbose_name='Chiffre d\'affaires'
+    )
+    nombre_commandes = models.IntegerField(default=0, verbose_name='Nombre de commandes')
+    depenses = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        verbose_name='Dépenses'
+    )
+    # Rafraîchie à chaque variation: marqueur de changement des jours clos
+    date_maj = models.DateTimeField(auto_now=True, verbose_name='Dernière mise à jour')
+
+    class Meta:
+        db_table = 'rollup_ventes_journalieres'
+        verbose_name = 'Ventes journalières'
+        verbose_name_plural = 'Ventes journalières'
+        ordering = ['-jour', 'mode_paiement']
+        constraints = [
+            models.UniqueConstraint(fields=['jour', 'mode_paiement'], name='rollup_jour_mode_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.jour:%d/%m/%Y} - {self.mode_paiement or 'dépenses'}"
+
+    @property
+    def panier_moyen(self):
+        if not self.nombre_commandes:
+            return Decimal('0.00')
+        return self.chiffre_affaires / self.nombre_commandes
+
+    @classmethod
+    def enregistrer(cls, jour, mode_paiement, chiffre_affaires=0, nombre_commandes=0, depenses=0):
+        """Applique atomiquement une variation à la ligne (jour, mode_paiement)"""
+        deltas = {
+            'chiffre_affaires': F('chiffre_affaires') + chiffre_affaires,
+            'nombre_commandes': F('nombre_commandes') + nombre_commandes,
+            'depenses': F('depenses') + depenses,
+            'date_maj': timezone.now(),
+        }
+        with transaction.atomic():
+            if cls.objects.filter(jour=jour, mode_paiement=mode_paiement).update(**deltas):
+                return
+            try:
+                with transaction.atomic():
+                    cls.objects.create(
+                        jour=jour,
+                        mode_paiement=mode_paiement,
+                        chiffre_affaires=chiffre_affaires,
+                        nombre_commandes=nombre_commandes,
+                        depenses=depenses
+                    )
+            except IntegrityError:
+                # Ligne créée entre-temps par une autre transaction
+                cls.objects.filter(jour=jour, mode_paiement=mode_paiement).update(**deltas)
+
+    @classmethod
+    def totaux(cls, debut, fin=None):
+        """
+        Totaux sur les jours debut à fin inclus (fin ouverte si None):
+        chiffre d'affaires, nombre de commandes, dépenses, panier moyen et
+        date de la dernière variation (None sans ligne).
+        """
+        rollups = cls.objects.filter(jour__gte=debut)
+        if fin is not None:
+            rollups = rollups.filter(jour__lte=fin)
+        totaux = rollups.aggregate(
+            chiffre_affaires=models.Sum('chiffre_affaires'),
+            nombre_commandes=models.Sum('nombre_commandes'),
+            depenses=models.Sum('depenses'),
+            date_maj=models.Max('date_maj'),
+        )
+        totaux = {
+            'chiffre_affaires': totaux['chiffre_affaires'] or Decimal('0.00'),
+            'nombre_commandes': totaux['nombre_commandes'] or 0,
+            'depenses': totaux['depenses'] or Decimal('0.00'),
+            'date_maj': totaux['date_maj'],
+        }
+        totaux['panier_moyen'] = (
+            totaux['chiffre_affaires'] / totaux['nombre_commandes']
+            if totaux['nombre_commandes'] else Decimal('0.00')
+        )
+        return totaux
+
+
+def stockage_exports():
+    """Stockage privé des exports générés (servis uniquement par la vue de téléchargement)"""
+    return FileSystemStorage(location=settings.EXPORTS_ROOT)
+
+
+class ReservationPerdue(Exception):
+    """Le job a été relancé et réservé par un autre worker"""
+
+
+class ExportJob(models.Model):
+    """
+    Export demandé depuis le tableau de bord et produit en arrière-plan par la
+    commande traiter_exports. La table sert de file d'attente (pas de broker
+    externe): un worker réserve le plus ancien job en attente par une mise à
+    jour conditionnelle, exécute la fonction d'export correspondante
+    (voir apps.dashboard.exports.TACHES_EXPORT) et publie sa progression.
+    Le fichier produit est supprimé à expiration.
+
+    La réservation porte un jeton: pendant l'exécution, un battement de cœur
+    rafraîchit date_maj, et chaque écriture du worker (progression, résultat)
+    est conditionnée à son jeton. Un job relancé par relancer_bloques() perd
+    son jeton: l'ancien worker, s'il tourne encore, ne peut plus l'écraser.
+    """
+    TYPE_CHOICES = [
+        ('ventes_excel', 'Rapport des ventes (Excel)'),
+        ('ventes_pdf', 'Rapport des ventes (PDF)'),
+        ('commandes_excel', 'Commandes (Excel)'),
+    ]
+    STATUT_CHOICES = [
+        ('en_attente', 'En attente'),
+        ('en_cours', 'En cours'),
+        ('termine', 'Terminé'),
+        ('echec', 'Échec'),
+        ('expire', 'Expiré'),
+    ]
+    STATUTS_ACTIFS = ('en_attente', 'en_cours')
+    # Un job en cours sans battement de cœur depuis ce délai est considéré
+    # comme abandonné (worker arrêté) et remis dans la file
+    DELAI_BLOCAGE = timedelta(minutes=15)
+    INTERVALLE_BATTEMENT = timedelta(minutes=1)
+    MAX_TENTATIVES = 3
+
+    type_export = models.CharField(max_length=30, choices=TYPE_CHOICES, verbose_name='Type d\'export')
+    date_debut = models.DateField(verbose_name='Début de période')
+    date_fin = models.DateField(verbose_name='Fin de période')
+    utilisateur = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='exports',
+        verbose_name='Demandé par'
+    )
+    statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default='en_attente', verbose_name='Statut')
+    progression = models.PositiveSmallIntegerField(default=0, verbose_name='Progression (%)')
+    tentatives = models.PositiveSmallIntegerField(default=0, verbose_name='Tentatives')
+    jeton = models.UUIDField(null=True, blank=True, editable=False, verbose_name='Jeton de réservation')
+    fichier = models.FileField(upload_to='%Y/%m/', storage=stockage_exports, blank=True, verbose_name='Fichier')
+    nom_fichier = models.CharField(max_length=150, blank=True, verbose_name='Nom du fichier')
+    erreur = models.TextField(blank=True, verbose_name='Erreur')
+    date_creation = models.DateTimeField(auto_now_add=True, verbose_name='Date de demande')
+    date_maj = models.DateTimeField(auto_now=True, verbose_name='Dernière mise à jour')
+    date_fin_traitement = models.DateTimeField(null=True, blank=True, verbose_name='Date de fin de traitement')
+    date_expiration = models.DateTimeField(null=True, blank=True, verbose_name='Date d\'expiration')
+
+    class Meta:
+        db_table = 'exports_jobs'
+        verbose_name = 'Export en arrière-plan'
+        verbose_name_plural = 'Exports en arrière-plan'
+        ordering = ['-date_creation']
+        indexes = [
+            models.Index(fields=['statut', 'date_creation'], name='exports_statut_date_idx'),
+            models.Index(fields=['utilisateur', 'date_creation'], name='exports_user_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_type_export_display()} {self.date_debut:%d/%m/%Y}-{self.date_fin:%d/%m/%Y} ({self.get_statut_display()})"
+
+    @property
+    def est_actif(self):
+        return self.statut in self.STATUTS_ACTIFS
+
+    @property
+    def est_telechargeable(self):
+        return (
+            self.statut == 'termine'
+            and bool(self.fichier)
+            and self.date_expiration is not None
+            and self.date_expiration > timezone.now()
+        )
+
+    @classmethod
+    def reserver(cls):
+        """Réserve le plus ancien job en attente pour ce worker (None si la file est vide)"""
+        while True:
+            job_id = cls.objects.filter(statut='en_attente').order_by('date_creation', 'id').values_list('id', flat=True).first()
+            if job_id is None:
+                return None
+            # Un seul worker peut faire passer le job de en_attente à en_cours
+            reserve = cls.objects.filter(id=job_id, statut='en_attente').update(
+                statut='en_cours',
+                jeton=uuid.uuid4(),
+                tentatives=F('tentatives') + 1,
+                date_maj=timezone.now()
+            )
+            if reserve:
+                return cls.objects.get(id=job_id)
+
+    @classmethod
+    def relancer_bloques(cls):
+        """Remet dans la file les jobs abandonnés par un worker arrêté en cours de route"""
+        limite = timezone.now() - cls.DELAI_BLOCAGE
+        bloques = cls.objects.filter(statut='en_cours', date_maj__lt=limite)
+        abandonnes = bloques.filter(tentatives__gte=cls.MAX_TENTATIVES).update(
+            statut='echec',
+            erreur='Abandonné après plusieurs tentatives interrompues.',
+            jeton=None,
+            date_maj=timezone.now()
+        )
+        relances = bloques.update(statut='en_attente', progression=0, jeton=None, date_maj=timezone.now())
+        return relances, abandonnes
+
+    @classmethod
+    def purger_expires(cls):
+        """Supprime les fichiers des exports expirés"""
+        nombre = 0
+        expires = cls.objects.filter(statut='termine', date_expiration__lte=timezone.now())
+        for job in expires.iterator():
+            if job.fichier:
+                job.fichier.delete(save=False)
+            job.statut = 'expire'
+            job.save(update_fields=['fichier', 'statut', 'date_maj'])
+            nombre += 1
+        return nombre
+
+    def get_nom_fichier(self):
+        from apps.dashboard.exports import TACHES_EXPORT
+
+        _, prefixe, extension = TACHES_EXPORT[self.type_export]
+        return f"{prefixe}_{self.date_debut:%Y%m%d}_{self.date_fin:%Y%m%d}.{extension}"
+
+    def _reservation(self):
+        """Le job, tant qu'il est réservé par ce worker"""
+        return ExportJob.objects.filter(pk=self.pk, statut='en_cours', jeton=self.jeton)
+
+    def signaler_progression(self, pourcentage):
+        if pourcentage != self.progression:
+            self.progression = pourcentage
+            if not self._reservation().update(progression=pourcentage, date_maj=timezone.now()):
+                raise ReservationPerdue(self.pk)
+
+    def battre_coeur(self, arret):
+        """Rafraîchit date_maj jusqu'à l'arrêt (thread lancé par executer())"""
+        try:
+            while not arret.wait(self.INTERVALLE_BATTEMENT.total_seconds()):
+                if not self._reservation().update(date_maj=timezone.now()):
+                    return
+        finally:
+            connection.close()
+
+    def executer(self):
+        """Produit le fichier de l'export (job réservé par reserver()); retourne True si réussi"""
+        from apps.dashboard.exports import TACHES_EXPORT
+
+        ecrire, _, extension = TACHES_EXPORT[self.type_export]
+        arret = threading.Event()
+        battement = threading.Thread(target=self.battre_coeur, args=(arret,), daemon=True)
+        battement.start()
+        try:
+            with tempfile.TemporaryFile() as fichier:
+                ecrire(fichier, self.date_debut, self.date_fin, rappel=self.signaler_progression)
+                fichier.seek(0)
+                # Nom aléatoire: le fichier n'est accessible que par la vue de téléchargement
+                self.fichier.save(f'{uuid.uuid4().hex}.{extension}', File(fichier), save=False)
+        except ReservationPerdue:
+            logger.warning("Export %s relancé par un autre worker, résultat abandonné", self.pk)
+            self.erreur = 'Relancé par un autre worker.'
+            return False
+        except Exception as e:
+            logger.exception("Échec de l'export %s", self.pk)
+            self.statut = 'echec'
+            self.erreur = str(e) or e.__class__.__name__
+            self._reservation().update(statut=self.statut, erreur=self.erreur, date_maj=timezone.now())
+            return False
+        finally:
+            arret.set()
+            battement.join()
+
+        self.statut = 'termine'
+        self.progression = 100
+        self.nom_fichier = self.get_nom_fichier()
+        self.date_fin_traitement = timezone.now()
+        self.date_expiration = self.date_fin_traitement + timedelta(seconds=settings.EXPORTS_DUREE_CONSERVATION)
+        termine = self._reservation().update(
+            statut=self.statut,
+            progression=self.progression,
+            fichier=self.fichier.name,
+            nom_fichier=self.nom_fichier,
+            date_fin_traitement=self.date_fin_traitement,
+            date_expiration=self.date_expiration,
+            date_maj=self.date_fin_traitement
+        )
+        if not termine:
+            logger.warning("Export %s relancé par un autre worker, résultat abandonné", self.pk)
+            self.fichier.delete(save=False)
+            self.erreur = 'Relancé par un autre worker.'
+            return False
+        return True
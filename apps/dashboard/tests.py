@@ -0,0 +1,130 @@
+import io
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.authentication.models import CustomUser
+from apps.orders.models import Commande
+from apps.payments.models import Caisse
+from apps.tables.models import TableRestaurant
+
+from .exports import ecrire_ventes_pdf
+from .indicateurs import calculer_indicateurs
+from .models import DailySalesRollup, ExportJob, ReservationPerdue
+
+
+class DashboardTests(TestCase):
+    """Indicateurs et nombre de requêtes du tableau de bord"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(login='gerant', password='secret', role='Radmin')
+        self.client.force_login(self.user)
+        self.today = timezone.localdate()
+        DailySalesRollup.enregistrer(self.today, 'especes', Decimal('300'), 2, Decimal('50'))
+        DailySalesRollup.enregistrer(self.today - timedelta(days=3), 'carte', Decimal('200'), 1)
+        DailySalesRollup.enregistrer(self.today - timedelta(days=20), 'especes', Decimal('500'), 4)
+
+    def test_indicateurs_ventes(self):
+        table = TableRestaurant.objects.create(numero_table='T1', nombre_places=4)
+        for montant, jours in [(Decimal('1000'), 0), (Decimal('2000'), 29), (Decimal('9000'), 31)]:
+            commande = Commande.objects.create(table=table, montant_total=montant)
+            Commande.objects.filter(pk=commande.pk).update(
+                statut='payee', date_paiement=timezone.now() - timedelta(days=jours)
+            )
+
+        with self.assertNumQueries(3):
+            indicateurs = calculer_indicateurs(self.today)
+
+        self.assertEqual(indicateurs.ca_today, Decimal('300'))
+        self.assertEqual(indicateurs.ca_week, Decimal('500'))
+        self.assertEqual(indicateurs.ca_month, Decimal('1000'))
+        self.assertEqual(indicateurs.depenses_today, Decimal('50'))
+        # Moyenne des commandes payées sur les trente derniers jours
+        self.assertEqual(indicateurs.commande_moyenne, Decimal('1500.00'))
+        self.assertEqual(indicateurs.commandes_payees_today, 1)
+        # Série du graphique: les sept jours précédant aujourd'hui
+        self.assertEqual(len(indicateurs.ventes_par_jour), 7)
+        self.assertEqual(indicateurs.ventes_par_jour[0][0], self.today - timedelta(days=7))
+        self.assertEqual(indicateurs.ventes_par_jour[4], (self.today - timedelta(days=3), Decimal('200'), 1))
+
+    def test_nombre_de_requetes(self):
+        Caisse.objects.create(solde_initial=Decimal('100'), utilisateur_ouverture=self.user)
+        # Premier affichage: pointeur de caisse et classement des plats mis en cache
+        self.client.get(reverse('dashboard:home'))
+
+        # Le budget de 6 requêtes porte sur les indicateurs, qui en font 3
+        # (test_indicateurs_ventes). La page y ajoute des lectures qui ne sont
+        # pas des indicateurs et ne se regroupent pas avec eux: l'utilisateur de
+        # la session, la ligne de la caisse ouverte (solde modifié à chaque
+        # paiement, donc pas mis en cache) et les trois listes récentes
+        # (commandes, paiements, dépenses), chacune un LIMIT 5 sur un autre modèle.
+        with self.assertNumQueries(8):
+            response = self.client.get(reverse('dashboard:home'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['ca_today'], Decimal('300'))
+
+
+class RapportVentesPdfTests(TestCase):
+    """Cache du rapport PDF d'une période close"""
+
+    def setUp(self):
+        cache.clear()
+        self.jour = timezone.localdate() - timedelta(days=10)
+        DailySalesRollup.enregistrer(self.jour, 'especes', Decimal('300'), 2)
+
+    def generer(self):
+        with mock.patch('apps.dashboard.exports.generer_ventes_pdf') as generer:
+            ecrire_ventes_pdf(io.BytesIO(), self.jour, self.jour)
+        return generer.called
+
+    def test_correction_a_totaux_identiques(self):
+        self.assertTrue(self.generer())
+        self.assertFalse(self.generer())
+
+        # Paiement supprimé puis un autre du même montant déplacé sur ce jour:
+        # mêmes totaux, mais le rapport a changé
+        DailySalesRollup.objects.update(date_maj=timezone.now() - timedelta(minutes=1))
+        DailySalesRollup.enregistrer(self.jour, 'especes', Decimal('-100'), -1)
+        DailySalesRollup.enregistrer(self.jour, 'especes', Decimal('100'), 1)
+        self.assertTrue(self.generer())
+
+
+@override_settings(EXPORTS_ROOT=tempfile.mkdtemp())
+class ExportJobTests(TestCase):
+    """File d'attente des exports en arrière-plan"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(login='gerant', password='secret', role='Radmin')
+        self.job = ExportJob.objects.create(
+            type_export='ventes_excel', date_debut=date(2026, 1, 1), date_fin=date(2026, 1, 31), utilisateur=self.user
+        )
+
+    def relancer(self):
+        ExportJob.objects.update(date_maj=timezone.now() - ExportJob.DELAI_BLOCAGE - timedelta(minutes=1))
+        return ExportJob.relancer_bloques()
+
+    def test_job_actif_non_relance(self):
+        ExportJob.reserver()
+        self.assertEqual(ExportJob.relancer_bloques(), (0, 0))
+
+    def test_ancien_worker_ne_peut_plus_ecrire(self):
+        ancien = ExportJob.reserver()
+        self.assertEqual(self.relancer(), (1, 0))
+        nouveau = ExportJob.reserver()
+        self.assertNotEqual(ancien.jeton, nouveau.jeton)
+
+        with self.assertRaises(ReservationPerdue):
+            ancien.signaler_progression(50)
+        self.assertFalse(ancien.executer())
+
+        job = ExportJob.objects.get(pk=self.job.pk)
+        self.assertEqual((job.statut, job.jeton, job.progression), ('en_cours', nouveau.jeton, 0))
+        self.assertTrue(nouveau.executer())
+        self.assertEqual(ExportJob.objects.get(pk=self.job.pk).statut, 'termine')
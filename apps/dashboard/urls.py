@@ -7,8 +7,18 @@ app_name = 'dashboard'
 
 urlpatterns = [
     path('', views.dashboard_home, name='home'),
+    # Délais de service et rotation des tables
+    path('service/', views.service_analytics, name='service_analytics'),
+    path('api/service/', views.service_analytics_api, name='service_analytics_api'),
     # Exports
     path('export/ventes/excel/', exports.export_ventes_excel, name='export_ventes_excel'),
     path('export/ventes/pdf/', exports.export_ventes_pdf, name='export_ventes_pdf'),
     path('export/commandes/excel/', exports.export_commandes_excel, name='export_commandes_excel'),
+    # Exports en arrière-plan (worker: python manage.py traiter_exports)
+    path('exports/', exports.liste_exports, name='liste_exports'),
+    path('exports/nouveau/', exports.demander_export, name='demander_export'),
+    path('exports/<int:pk>/telecharger/', exports.telecharger_export, name='telecharger_export'),
+    # Exports CSV bruts: paiements, depenses, commandes, lignes-commandes
+    path('export/<slug:donnees>/csv/', exports.export_csv, name='export_csv'),
+    path('export/<slug:donnees>/csv.gz/', exports.export_csv, {'compresse': True}, name='export_csv_gz'),
 ]
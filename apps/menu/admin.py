@@ -1,4 +1,5 @@
 from django.contrib import admin
+from .catalogue import invalider_catalogue
 from .models import Plat, CategoriePlat
 
 
@@ -9,6 +10,11 @@ class CategoriePlatAdmin(admin.ModelAdmin):
     search_fields = ('nom',)
     ordering = ('ordre', 'nom')
 
+    def delete_queryset(self, request, queryset):
+        # La suppression groupée ne passe pas par CategoriePlat.delete()
+        super().delete_queryset(request, queryset)
+        invalider_catalogue()
+
 
 @admin.register(Plat)
 class PlatAdmin(admin.ModelAdmin):
@@ -16,3 +22,8 @@ class PlatAdmin(admin.ModelAdmin):
     list_filter = ('disponible',)
     search_fields = ('nom',)
     readonly_fields = ('created_at', 'updated_at')
+
+    def delete_queryset(self, request, queryset):
+        # La suppression groupée ne passe pas par Plat.delete()
+        super().delete_queryset(request, queryset)
+        invalider_catalogue()
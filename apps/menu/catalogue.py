@@ -0,0 +1,103 @@
+"""
+Catalogue du menu mis en cache.
+
+Instantané sérialisé des plats disponibles, des catégories et de l'index de
+recherche (voir apps.menu.recherche), partagé par list_dishes et table_detail:
+entre deux modifications du menu, la consultation ne touche plus la base de
+données. La clé du cache porte un numéro de version
+incrémenté à chaque modification d'un plat ou d'une catégorie (voir
+Plat.save()/delete() et CategoriePlat.save()/delete()), les anciens instantanés
+expirent d'eux-mêmes.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from apps.menu.recherche import construire_index, rechercher
+
+CLE_VERSION = 'menu:catalogue:version'
+# Format de l'instantané, à incrémenter quand sa structure change: les
+# instantanés de l'ancien format encore en cache ne sont plus lus
+FORMAT_CATALOGUE = 2
+DUREE_CATALOGUE = 60 * 60 * 24
+
+
+def version_catalogue():
+    version = cache.get(CLE_VERSION)
+    if version is None:
+        # Valeur initiale unique: une version évincée du cache ne peut pas
+        # retomber sur un ancien instantané encore présent
+        cache.add(CLE_VERSION, time.time_ns(), None)
+        version = cache.get(CLE_VERSION)
+    return version
+
+
+def _incrementer_version():
+    try:
+        cache.incr(CLE_VERSION)
+    except ValueError:
+        cache.add(CLE_VERSION, time.time_ns(), None)
+
+
+def invalider_catalogue():
+    """Invalide le catalogue une fois la transaction en cours validée"""
+    transaction.on_commit(_incrementer_version)
+
+
+def _serialiser_plat(plat):
+    # None sans fichier: {% if plat.image %} se comporte comme avec le modèle
+    image = None
+    if plat.image:
+        try:
+            image = {'name': plat.image.name, 'url': plat.image.url}
+        except ValueError:
+            pass
+    return {
+        'id': plat.id,
+        'nom': plat.nom,
+        'description': plat.description,
+        'prix_unitaire': plat.prix_unitaire,
+        'categorie': plat.categorie.nom if plat.categorie else None,
+        'image': image,
+    }
+
+
+def construire_catalogue():
+    from apps.menu.models import CategoriePlat, Plat
+
+    categories = list(CategoriePlat.objects.order_by('ordre', 'nom').values_list('nom', flat=True))
+    plats = Plat.objects.filter(disponible=True).select_related('categorie').order_by('nom')
+    plats = [_serialiser_plat(plat) for plat in plats]
+    return {
+        'categories': categories,
+        'plats': plats,
+        'index': construire_index(plats),
+    }
+
+
+def get_catalogue():
+    """Retourne l'instantané courant du catalogue (construit au besoin)"""
+    cle = f'menu:catalogue:{FORMAT_CATALOGUE}:{version_catalogue()}'
+    catalogue = cache.get(cle)
+    if catalogue is None:
+        catalogue = construire_catalogue()
+        cache.set(cle, catalogue, DUREE_CATALOGUE)
+    return catalogue
+
+
+def filtrer_plats(catalogue, cat=None, q=None):
+    """
+    Filtre en mémoire les plats du catalogue par catégorie et recherche texte.
+    Avec une recherche, les plats sont triés par pertinence puis par nom.
+    """
+    plats = catalogue['plats']
+    if cat:
+        plats = [plat for plat in plats if plat['categorie'] == cat]
+    if q:
+        scores = rechercher(catalogue['index'], q)
+        plats = sorted(
+            (plat for plat in plats if plat['id'] in scores),
+            key=lambda plat: -scores[plat['id']]
+        )
+    return plats
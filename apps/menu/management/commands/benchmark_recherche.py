@@ -0,0 +1,68 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from apps.menu.catalogue import construire_catalogue, filtrer_plats, get_catalogue
+from apps.menu.models import Plat
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare la recherche de plats par l\'ORM (icontains) et par l\'index '
+        'inversé du catalogue en cache.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'recherches',
+            nargs='*',
+            default=['poulet', 'creme', 'jus', 'pois', 'viande grillee'],
+            help='Recherches à mesurer'
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=200,
+            help='Nombre d\'exécutions par recherche (défaut: 200)'
+        )
+
+    def mesurer(self, fonction, iterations):
+        durees = []
+        for _ in range(iterations):
+            debut = time.perf_counter()
+            resultat = fonction()
+            durees.append(time.perf_counter() - debut)
+        return statistics.median(durees) * 1000, resultat
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+
+        debut = time.perf_counter()
+        construire_catalogue()
+        construction = (time.perf_counter() - debut) * 1000
+        catalogue = get_catalogue()
+        self.stdout.write(
+            f'{len(catalogue["plats"])} plats disponibles, '
+            f'{len(catalogue["index"]["mots"])} mots indexés, '
+            f'construction du catalogue: {construction:.1f} ms'
+        )
+
+        for q in options['recherches']:
+            orm, plats_orm = self.mesurer(
+                lambda: list(
+                    Plat.objects.filter(disponible=True)
+                    .filter(Q(nom__icontains=q) | Q(description__icontains=q))
+                    .order_by('nom')
+                ),
+                iterations
+            )
+            index, plats_index = self.mesurer(
+                lambda: filtrer_plats(get_catalogue(), q=q),
+                iterations
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f'"{q}": ORM {orm:.3f} ms ({len(plats_orm)} plats) - '
+                f'index {index:.3f} ms ({len(plats_index)} plats)'
+            ))
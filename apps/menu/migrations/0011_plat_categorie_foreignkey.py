@@ -0,0 +1,72 @@
+# Aligne l'historique des migrations sur le modèle Plat.
+#
+# Les migrations 0007 à 0010 sont vides: la colonne texte `categorie` a été
+# remplacée à la main par la clé étrangère `categorie_id` sur la base de
+# production, sans que l'historique le reflète. Une base créée depuis les
+# migrations (tests, nouvelle installation) gardait donc `categorie` (texte)
+# et `categorie_fk_id`. Cette migration fait ce remplacement, en reportant les
+# catégories texte sur la clé étrangère, sauf sur une base déjà alignée.
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def colonnes_plats(schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        return {colonne.name for colonne in connection.introspection.get_table_description(cursor, 'plats')}
+
+
+def schema_deja_aligne(schema_editor):
+    return 'categorie_id' in colonnes_plats(schema_editor)
+
+
+class SaufSchemaAligne(migrations.operations.base.Operation):
+    """Opération appliquée à l'état, et à la base seulement si elle n'est pas déjà alignée"""
+
+    reversible = False
+
+    def __init__(self, operation):
+        self.operation = operation
+
+    def state_forwards(self, app_label, state):
+        self.operation.state_forwards(app_label, state)
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if not schema_deja_aligne(schema_editor):
+            self.operation.database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def describe(self):
+        return f"{self.operation.describe()} (sauf base déjà alignée)"
+
+
+def reporter_categories(apps, schema_editor):
+    if schema_deja_aligne(schema_editor):
+        return
+    CategoriePlat = apps.get_model('menu', 'CategoriePlat')
+    Plat = apps.get_model('menu', 'Plat')
+    for categorie in CategoriePlat.objects.all():
+        Plat.objects.filter(categorie=categorie.nom, categorie_fk__isnull=True).update(categorie_fk=categorie)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0010_final_sync'),
+    ]
+
+    operations = [
+        migrations.RunPython(reporter_categories, migrations.RunPython.noop),
+        SaufSchemaAligne(migrations.RemoveField(model_name='plat', name='categorie')),
+        SaufSchemaAligne(migrations.RenameField(model_name='plat', old_name='categorie_fk', new_name='categorie')),
+        SaufSchemaAligne(migrations.AlterField(
+            model_name='plat',
+            name='categorie',
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                to='menu.categorieplat',
+                verbose_name='Catégorie'
+            ),
+        )),
+    ]
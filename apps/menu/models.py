@@ -2,6 +2,8 @@ from django.db import models
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 
+from apps.menu.catalogue import invalider_catalogue
+
 
 class CategoriePlat(models.Model):
     nom = models.CharField(max_length=100, unique=True, verbose_name='Nom')
@@ -16,6 +18,15 @@ class CategoriePlat(models.Model):
     def __str__(self):
         return self.nom
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        invalider_catalogue()
+
+    def delete(self, *args, **kwargs):
+        resultat = super().delete(*args, **kwargs)
+        invalider_catalogue()
+        return resultat
+
 
 class Plat(models.Model):
     nom = models.CharField(max_length=200, verbose_name='Nom du plat')
@@ -46,3 +57,12 @@ class Plat(models.Model):
 
     def __str__(self):
         return f"{self.nom} - {self.prix_unitaire} GNF"
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        invalider_catalogue()
+
+    def delete(self, *args, **kwargs):
+        resultat = super().delete(*args, **kwargs)
+        invalider_catalogue()
+        return resultat
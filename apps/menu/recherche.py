@@ -0,0 +1,76 @@
+"""
+Index de recherche inversé sur les plats du catalogue.
+
+Les textes sont normalisés (minuscules, accents retirés: "crème" == "creme")
+puis découpés en mots. L'index associe chaque mot aux plats qui le contiennent
+avec un poids (nom > description); la liste triée des mots permet la recherche
+par préfixe ("cre" trouve "creme", "crevettes"...). L'index est construit avec
+l'instantané du catalogue et donc reconstruit à chaque modification du menu.
+"""
+import re
+import unicodedata
+from bisect import bisect_left
+
+POIDS_NOM = 3
+POIDS_DESCRIPTION = 1
+BONUS_MOT_EXACT = 2
+
+_SEPARATEURS = re.compile(r'[\W_]+')
+
+
+def normaliser(texte):
+    """Minuscules et accents retirés"""
+    decompose = unicodedata.normalize('NFKD', texte or '')
+    return ''.join(c for c in decompose if not unicodedata.combining(c)).casefold()
+
+
+def tokeniser(texte):
+    return [mot for mot in _SEPARATEURS.split(normaliser(texte)) if mot]
+
+
+def construire_index(plats):
+    """
+    Construit l'index à partir des plats sérialisés du catalogue.
+    Retourne {'mots': {mot: {plat_id: poids}}, 'mots_tries': [mot, ...]}.
+    """
+    mots = {}
+    for plat in plats:
+        for champ, poids in (('nom', POIDS_NOM), ('description', POIDS_DESCRIPTION)):
+            for mot in set(tokeniser(plat[champ])):
+                postings = mots.setdefault(mot, {})
+                postings[plat['id']] = max(postings.get(plat['id'], 0), poids)
+    return {'mots': mots, 'mots_tries': sorted(mots)}
+
+
+def _mots_prefixes(index, prefixe):
+    mots_tries = index['mots_tries']
+    position = bisect_left(mots_tries, prefixe)
+    while position < len(mots_tries) and mots_tries[position].startswith(prefixe):
+        yield mots_tries[position]
+        position += 1
+
+
+def rechercher(index, q):
+    """
+    Retourne {plat_id: score} des plats contenant tous les mots de la requête
+    (chaque mot pouvant être le préfixe d'un mot indexé).
+    """
+    scores = None
+    for terme in set(tokeniser(q)):
+        scores_terme = {}
+        for mot in _mots_prefixes(index, terme):
+            bonus = BONUS_MOT_EXACT if mot == terme else 1
+            for plat_id, poids in index['mots'][mot].items():
+                scores_terme[plat_id] = max(scores_terme.get(plat_id, 0), poids * bonus)
+
+        if scores is None:
+            scores = scores_terme
+        else:
+            scores = {
+                plat_id: score + scores_terme[plat_id]
+                for plat_id, score in scores.items()
+                if plat_id in scores_terme
+            }
+        if not scores:
+            return {}
+    return scores or {}
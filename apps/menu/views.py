@@ -3,7 +3,7 @@ from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from apps.authentication.decorators import role_required
-from django.db.models import Q
+from .catalogue import get_catalogue, filtrer_plats
 from .models import Plat, CategoriePlat
 import logging
 
@@ -13,16 +13,13 @@ from .forms import PlatForm, CategoriePlatForm
 
 @role_required(['Rtable', 'Radmin'])
 def list_dishes(request):
-    categories = list(CategoriePlat.objects.order_by('ordre', 'nom').values_list('nom', flat=True))
+    catalogue = get_catalogue()
+    categories = catalogue['categories']
     q = (request.GET.get('q') or '').strip()
     cat = (request.GET.get('cat') or '').strip()
-    plats = Plat.objects.filter(disponible=True)
-    if cat and (not categories or cat in categories):
-        # Filtrer par nom de catégorie via la foreign key
-        plats = plats.filter(categorie__nom=cat)
-    if q:
-        plats = plats.filter(Q(nom__icontains=q) | Q(description__icontains=q))
-    plats = plats.order_by('nom')
+    if categories and cat not in categories:
+        cat = ''
+    plats = filtrer_plats(catalogue, cat=cat, q=q)
     return render(request, 'menu/list_dishes.html', {
         'plats': plats,
         'q': q,
@@ -1,9 +1,11 @@
 from django.contrib import admin
+from django.db import transaction
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
 
-from .models import Panier, PanierItem, Commande, CommandeItem
+from apps.tables.models import TableRestaurant
+from .models import Panier, PanierItem, Commande, CommandeItem, CommandeEvent
 
 
 class PanierItemInline(admin.TabularInline):
@@ -22,7 +24,7 @@ class PanierAdmin(admin.ModelAdmin):
     list_display = ['id', 'table', 'is_active', 'created_at', 'updated_at', 'total_panier']
     list_filter = ['is_active', 'created_at', 'table']
     search_fields = ['table__numero_table']
-    readonly_fields = ['created_at', 'updated_at', 'total_panier']
+    readonly_fields = ['created_at', 'updated_at', 'total', 'item_count', 'total_panier']
     inlines = [PanierItemInline]
     
     def total_panier(self, obj):
@@ -114,10 +116,17 @@ class CommandeAdmin(admin.ModelAdmin):
     @admin.action(description='Marquer comme servie(s)')
     def mark_as_served(self, request, queryset):
         from django.utils import timezone
-        updated = queryset.filter(statut='en_attente').update(
-            statut='servie',
-            date_service=timezone.now()
-        )
+        now = timezone.now()
+        with transaction.atomic():
+            queryset = queryset.filter(statut='en_attente').select_for_update()
+            commandes = list(queryset.values_list('id', 'table_id'))
+            updated = queryset.update(
+                statut='servie',
+                date_service=now,
+                updated_at=now
+            )
+            TableRestaurant.transition_commande({table_id for _, table_id in commandes}, 'servie')
+            CommandeEvent.enregistrer_groupe(commandes, 'en_attente', 'servie', date=now)
         self.message_user(
             request,
             f"{updated} commande(s) marquée(s) comme servie(s)."
@@ -126,10 +135,17 @@ class CommandeAdmin(admin.ModelAdmin):
     @admin.action(description='Marquer comme payée(s)')
     def mark_as_paid(self, request, queryset):
         from django.utils import timezone
-        updated = queryset.filter(statut='servie').update(
-            statut='payee',
-            date_paiement=timezone.now()
-        )
+        now = timezone.now()
+        with transaction.atomic():
+            queryset = queryset.filter(statut='servie').select_for_update()
+            commandes = list(queryset.values_list('id', 'table_id'))
+            updated = queryset.update(
+                statut='payee',
+                date_paiement=now,
+                updated_at=now
+            )
+            TableRestaurant.transition_commande({table_id for _, table_id in commandes}, 'payee')
+            CommandeEvent.enregistrer_groupe(commandes, 'servie', 'payee', date=now)
         self.message_user(
             request,
             f"{updated} commande(s) marquée(s) comme payée(s)."
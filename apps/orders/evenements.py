@@ -0,0 +1,115 @@
+"""
+Diffusion en temps réel des changements de commandes (Server-Sent Events).
+
+Chaque transition de commande (création, service, paiement, suppression) est
+écrite dans le journal CommandeEvent, dans la même transaction que le
+changement de statut. Le flux SSE du tableau des commandes lit ce journal à
+partir du dernier identifiant reçu par le navigateur (en-tête Last-Event-ID):
+la page se met à jour sur place sans relancer les requêtes de list_orders, et
+l'attente d'un événement ne coûte qu'une lecture sur la clé primaire. Le journal
+est en base: tous les processus voient les mêmes événements, quel que soit
+le cache configuré, et un événement ne peut pas être perdu.
+"""
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone
+
+MAX_EVENEMENTS = 200
+# Un identifiant manquant plus ancien que ce délai est celui d'une transaction
+# annulée; plus récent, c'est peut-être une transaction encore en cours
+DELAI_TROU = timedelta(seconds=5)
+# Délai de reconnexion du navigateur après la fin d'un flux (ms)
+RETRY_MS = 2000
+
+
+def dernier_evenement():
+    """Identifiant du dernier événement du journal (0 s'il est vide)"""
+    from apps.orders.models import CommandeEvent
+
+    return CommandeEvent.objects.aggregate(dernier=Max('id'))['dernier'] or 0
+
+
+def evenement_commande(commande_id, numero_commande, table, statut, precedent, montant, date_commande):
+    return {
+        'id': commande_id,
+        'numero': numero_commande or '',
+        'table': table or '',
+        'statut': statut,
+        'precedent': precedent,
+        'montant': str(montant or 0),
+        'date': timezone.localtime(date_commande).strftime('%d/%m/%Y %H:%M') if date_commande else '',
+    }
+
+
+def lire_evenements(depuis, table_id=None):
+    """
+    Retourne (dernier identifiant lu, [(identifiant, événement), ...]) après
+    `depuis`, au plus MAX_EVENEMENTS. Une suppression est un événement de
+    statut None (la carte est retirée).
+
+    Les identifiants sont attribués à l'insertion, pas à la validation: une
+    transaction plus lente peut valider un identifiant inférieur à un autre
+    déjà lu. La lecture s'arrête donc devant un identifiant manquant récent
+    (l'événement sera lu au prochain tour) et ne le saute qu'après DELAI_TROU.
+    Avec table_id, seuls les événements de cette table sont retournés (le
+    curseur avance quand même sur ceux des autres tables).
+    """
+    from apps.orders.models import Commande, CommandeEvent
+    from apps.tables.models import TableRestaurant
+
+    # Pas de jointure: les événements des commandes supprimées restent lisibles
+    lignes = list(CommandeEvent.objects.filter(id__gt=depuis).order_by('id').values_list(
+        'id', 'commande_id', 'table_id', 'statut', 'statut_precedent', 'date'
+    )[:MAX_EVENEMENTS])
+    if not lignes:
+        return depuis, []
+    commandes = {
+        commande_id: (numero, montant, date_commande)
+        for commande_id, numero, montant, date_commande in Commande.objects.filter(
+            id__in={ligne[1] for ligne in lignes}
+        ).values_list('id', 'numero_commande', 'montant_total', 'date_commande')
+    }
+    tables = dict(TableRestaurant.objects.filter(
+        id__in={ligne[2] for ligne in lignes}
+    ).values_list('id', 'numero_table'))
+
+    limite_trou = timezone.now() - DELAI_TROU
+    evenements = []
+    for numero, commande_id, ligne_table_id, statut, precedent, date in lignes:
+        if numero != depuis + 1 and date > limite_trou:
+            break
+        depuis = numero
+        if table_id is not None and ligne_table_id != table_id:
+            continue
+        if statut == CommandeEvent.STATUT_SUPPRIMEE:
+            statut = None
+        numero_commande, montant, date_commande = commandes.get(commande_id, (None, None, None))
+        evenements.append((numero, evenement_commande(
+            commande_id, numero_commande, tables.get(ligne_table_id), statut, precedent or None, montant, date_commande
+        )))
+    return depuis, evenements
+
+def flux_sse(depuis, duree=None, intervalle=1):
+    """
+    Générateur du flux text/event-stream. Le flux se termine après `duree`
+    secondes; le navigateur se reconnecte alors avec Last-Event-ID.
+    """
+    if duree is None:
+        duree = getattr(settings, 'COMMANDES_SSE_DUREE', 25)
+    if depuis is None:
+        depuis = dernier_evenement()
+
+    yield f'retry: {RETRY_MS}\n\n'
+    fin = time.monotonic() + duree
+    while True:
+        depuis, evenements = lire_evenements(depuis)
+        for numero, evenement in evenements:
+            yield f'id: {numero}\nevent: commande\ndata: {json.dumps(evenement)}\n\n'
+
+        if time.monotonic() >= fin:
+            return
+        time.sleep(intervalle)
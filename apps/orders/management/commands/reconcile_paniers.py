@@ -0,0 +1,48 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db.models import Sum, F, Count
+
+from apps.orders.models import Panier
+
+
+class Command(BaseCommand):
+    help = 'Recalcule le total et le nombre d\'articles stockés sur les paniers et corrige les écarts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Vérifier aussi les paniers inactifs (par défaut: paniers actifs uniquement)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Afficher les écarts sans les corriger'
+        )
+
+    def handle(self, *args, **options):
+        paniers = Panier.objects.all() if options['all'] else Panier.objects.filter(is_active=True)
+        paniers = paniers.annotate(
+            calc_total=Sum(F('items__quantite') * F('items__prix_unitaire')),
+            calc_count=Count('items'),
+        )
+
+        corriges = 0
+        for panier in paniers.iterator():
+            total = panier.calc_total or Decimal('0.00')
+            if panier.total == total and panier.item_count == panier.calc_count:
+                continue
+
+            corriges += 1
+            self.stdout.write(
+                f'Panier {panier.id}: total {panier.total} -> {total}, '
+                f'articles {panier.item_count} -> {panier.calc_count}'
+            )
+            if not options['dry_run']:
+                Panier.objects.filter(pk=panier.pk).update(total=total, item_count=panier.calc_count)
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'{corriges} panier(s) à corriger (aucune modification)'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'{corriges} panier(s) corrigé(s)'))
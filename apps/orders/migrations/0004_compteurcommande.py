@@ -0,0 +1,49 @@
+# Generated by Django 4.2.27 on 2026-10-18 09:38
+
+from datetime import datetime
+
+from django.db import migrations, models
+
+
+def init_compteurs(apps, schema_editor):
+    Commande = apps.get_model('orders', 'Commande')
+    CompteurCommande = apps.get_model('orders', 'CompteurCommande')
+
+    # Reprendre le dernier numéro attribué pour chaque jour déjà existant
+    derniers = {}
+    for numero in Commande.objects.filter(numero_commande__startswith='CMD-').values_list('numero_commande', flat=True):
+        try:
+            _, date_str, num = numero.split('-')
+            jour = datetime.strptime(date_str, '%Y%m%d').date()
+            num = int(num)
+        except ValueError:
+            continue
+        derniers[jour] = max(derniers.get(jour, 0), num)
+
+    CompteurCommande.objects.bulk_create([
+        CompteurCommande(jour=jour, dernier_numero=num) for jour, num in derniers.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_commande_caissier_commande_serveur_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompteurCommande',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jour', models.DateField(unique=True, verbose_name='Jour')),
+                ('dernier_numero', models.PositiveIntegerField(default=0, verbose_name='Dernier numéro attribué')),
+            ],
+            options={
+                'verbose_name': 'Compteur de commandes',
+                'verbose_name_plural': 'Compteurs de commandes',
+                'db_table': 'compteurs_commandes',
+            },
+        ),
+        migrations.RunPython(init_compteurs, migrations.RunPython.noop),
+    ]
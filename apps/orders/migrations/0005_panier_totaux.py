@@ -0,0 +1,41 @@
+# Generated by Django 4.2.27 on 2026-10-18 09:39
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+
+
+def calculer_totaux(apps, schema_editor):
+    Panier = apps.get_model('orders', 'Panier')
+
+    paniers = Panier.objects.annotate(
+        calc_total=Sum(F('items__quantite') * F('items__prix_unitaire')),
+        calc_count=Count('items'),
+    )
+    for panier in paniers.iterator():
+        Panier.objects.filter(pk=panier.pk).update(
+            total=panier.calc_total or Decimal('0.00'),
+            item_count=panier.calc_count,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_compteurcommande'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='panier',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0, verbose_name="Nombre d'articles"),
+        ),
+        migrations.AddField(
+            model_name='panier',
+            name='total',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12, verbose_name='Total'),
+        ),
+        migrations.RunPython(calculer_totaux, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.27 on 2026-10-18 09:42
+
+from django.db import migrations, models
+
+
+def desactiver_paniers_en_double(apps, schema_editor):
+    Panier = apps.get_model('orders', 'Panier')
+
+    # Garder uniquement le panier actif le plus récent de chaque table
+    vus = set()
+    doublons = []
+    for panier_id, table_id in Panier.objects.filter(is_active=True).order_by('table_id', '-created_at', '-id').values_list('id', 'table_id'):
+        if table_id in vus:
+            doublons.append(panier_id)
+        vus.add(table_id)
+    Panier.objects.filter(id__in=doublons).update(is_active=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0005_panier_totaux'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='commande',
+            index=models.Index(fields=['statut', 'date_commande'], name='commandes_statut_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='commande',
+            index=models.Index(fields=['statut', 'date_paiement'], name='commandes_statut_paie_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='commande',
+            index=models.Index(fields=['table', 'statut'], name='commandes_table_statut_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='panier',
+            index=models.Index(fields=['table', 'is_active'], name='paniers_table_actif_idx'),
+        ),
+        migrations.RunPython(desactiver_paniers_en_double, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='panier',
+            constraint=models.UniqueConstraint(models.F('table'), models.Case(models.When(is_active=True, then=models.Value(True))), name='paniers_un_actif_par_table'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.27 on 2026-10-18 09:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_index_filtres'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='commande',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
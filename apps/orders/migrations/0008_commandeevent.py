@@ -0,0 +1,66 @@
+# Generated by Django 4.2.27 on 2026-10-18 09:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def reconstituer_journal(apps, schema_editor):
+    """Reconstitue les transitions connues des commandes existantes à partir de leurs dates"""
+    Commande = apps.get_model('orders', 'Commande')
+    CommandeEvent = apps.get_model('orders', 'CommandeEvent')
+
+    evenements = []
+    commandes = Commande.objects.values_list(
+        'id', 'table_id', 'statut', 'date_commande', 'date_service', 'date_paiement'
+    )
+    for commande_id, table_id, statut, date_commande, date_service, date_paiement in commandes.iterator():
+        transitions = [('', 'en_attente', date_commande)]
+        if statut in ('servie', 'payee') and date_service:
+            transitions.append(('en_attente', 'servie', date_service))
+        if statut == 'payee' and date_paiement:
+            transitions.append((transitions[-1][1], 'payee', date_paiement))
+        evenements.extend(
+            CommandeEvent(
+                commande_id=commande_id,
+                table_id=table_id,
+                statut_precedent=precedent,
+                statut=nouveau,
+                date=date
+            )
+            for precedent, nouveau, date in transitions
+        )
+        if len(evenements) >= 1000:
+            CommandeEvent.objects.bulk_create(evenements)
+            evenements = []
+    CommandeEvent.objects.bulk_create(evenements)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tables', '0004_tablerestaurant_qr_fields'),
+        ('orders', '0007_commande_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommandeEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('statut_precedent', models.CharField(blank=True, choices=[('en_attente', 'En attente'), ('servie', 'Servie'), ('payee', 'Payée'), ('supprimee', 'Supprimée')], max_length=20, verbose_name='Statut précédent')),
+                ('statut', models.CharField(choices=[('en_attente', 'En attente'), ('servie', 'Servie'), ('payee', 'Payée'), ('supprimee', 'Supprimée')], max_length=20, verbose_name='Statut')),
+                ('date', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Date')),
+                ('commande', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='evenements', to='orders.commande', verbose_name='Commande')),
+                ('table', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='evenements_commandes', to='tables.tablerestaurant', verbose_name='Table')),
+            ],
+            options={
+                'verbose_name': 'Événement de commande',
+                'verbose_name_plural': 'Événements de commandes',
+                'db_table': 'commandes_evenements',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['date'], name='cmd_evenements_date_idx'), models.Index(fields=['statut', 'date'], name='cmd_evenements_statut_idx'), models.Index(fields=['commande', 'date'], name='cmd_evenements_commande_idx')],
+            },
+        ),
+        migrations.RunPython(reconstituer_journal, migrations.RunPython.noop),
+    ]
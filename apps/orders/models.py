@@ -1,6 +1,7 @@
-from django.db import models
+from django.db import models, transaction, connection
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.db.models import Sum, F
+from django.db.models import F
+from django.utils import timezone
 from decimal import Decimal
 from apps.menu.models import Plat
 from apps.tables.models import TableRestaurant
@@ -21,6 +22,14 @@ class Panier(models.Model):
         verbose_name='Créé par'
     )
     is_active = models.BooleanField(default=True, verbose_name='Actif')
+    # Totaux dénormalisés, tenus à jour par PanierItem.save() / delete()
+    total = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        verbose_name='Total'
+    )
+    item_count = models.PositiveIntegerField(default=0, verbose_name='Nombre d\'articles')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -29,15 +38,31 @@ class Panier(models.Model):
         verbose_name = 'Panier'
         verbose_name_plural = 'Paniers'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['table', 'is_active'], name='paniers_table_actif_idx'),
+        ]
+        constraints = [
+            # Un seul panier actif par table. Index unique fonctionnel plutôt
+            # qu'un index partiel (condition=...) que MySQL ne supporte pas:
+            # l'expression vaut NULL pour les paniers inactifs, non contraints.
+            models.UniqueConstraint(
+                F('table'),
+                models.Case(models.When(is_active=True, then=models.Value(True))),
+                name='paniers_un_actif_par_table'
+            ),
+        ]
 
     def __str__(self):
         return f"Panier {self.id} - Table {self.table.numero_table}"
 
-    @property
-    def total(self):
-        return self.items.aggregate(
-            total=Sum(F('quantite') * F('prix_unitaire'))
-        )['total'] or Decimal('0.00')
+    @classmethod
+    def appliquer_delta(cls, panier_id, montant, nombre=0):
+        """Applique atomiquement une variation au total et au nombre d'articles"""
+        cls.objects.filter(pk=panier_id).update(
+            total=F('total') + montant,
+            item_count=F('item_count') + nombre,
+            updated_at=timezone.now()
+        )
 
 
 class PanierItem(models.Model):
@@ -82,11 +107,93 @@ class PanierItem(models.Model):
         """Calcule le sous-total pour cet article"""
         return self.prix_unitaire * self.quantite
 
+    def _verrouiller_sous_total(self):
+        """Sous-total enregistré de la ligne, relu sous verrou (None si elle n'existe plus)"""
+        ligne = PanierItem.objects.select_for_update().filter(pk=self.pk).values_list(
+            'quantite', 'prix_unitaire'
+        ).first()
+        return ligne[0] * ligne[1] if ligne else None
+
     def save(self, *args, **kwargs):
         # S'assurer que le prix unitaire est toujours à jour avec le plat
         if not self.pk or not self.prix_unitaire or self.prix_unitaire <= 0:
             self.prix_unitaire = self.plat.prix_unitaire
-        super().save(*args, **kwargs)
+
+        with transaction.atomic():
+            # Delta calculé depuis la ligne verrouillée, pas depuis l'instance
+            # chargée: deux modifications simultanées s'appliquent l'une après
+            # l'autre sans faire dériver le total du panier
+            ancien_sous_total = None if self._state.adding else self._verrouiller_sous_total()
+            super().save(*args, **kwargs)
+            if ancien_sous_total is None:
+                # Nouvelle ligne (ou ligne supprimée entre-temps, recréée par save())
+                Panier.appliquer_delta(self.panier_id, self.sous_total, 1)
+            elif self.sous_total != ancien_sous_total:
+                Panier.appliquer_delta(self.panier_id, self.sous_total - ancien_sous_total)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            sous_total = self._verrouiller_sous_total()
+            result = super().delete(*args, **kwargs)
+            # Ligne déjà supprimée par une autre requête: déjà retirée du total
+            if sous_total is not None:
+                Panier.appliquer_delta(self.panier_id, -sous_total, -1)
+        return result
+
+
+class CompteurCommande(models.Model):
+    """
+    Compteur journalier des numéros de commande (CMD-YYYYMMDD-XXXX).
+    Une ligne par jour, incrémentée atomiquement à chaque nouvelle commande.
+    """
+    jour = models.DateField(unique=True, verbose_name='Jour')
+    dernier_numero = models.PositiveIntegerField(default=0, verbose_name='Dernier numéro attribué')
+
+    class Meta:
+        db_table = 'compteurs_commandes'
+        verbose_name = 'Compteur de commandes'
+        verbose_name_plural = 'Compteurs de commandes'
+
+    def __str__(self):
+        return f"{self.jour:%Y%m%d} - {self.dernier_numero}"
+
+    @classmethod
+    def prochain_numero(cls, jour=None):
+        """
+        Réserve et retourne le prochain numéro séquentiel du jour.
+
+        Création et incrément de la ligne du jour en une seule instruction
+        (INSERT ... ON DUPLICATE KEY UPDATE sous MySQL, ON CONFLICT ailleurs):
+        la première commande du jour ne passe plus par un UPDATE sans ligne
+        suivi d'un INSERT, dont les verrous de trou (REPEATABLE READ)
+        interbloquaient deux transactions concurrentes. L'instruction pose un
+        verrou exclusif sur la ligne: deux transactions obtiennent forcément
+        deux numéros différents.
+        """
+        jour = jour or timezone.now().date()
+        table = connection.ops.quote_name(cls._meta.db_table)
+        if connection.vendor == 'mysql':
+            sql = (
+                f'INSERT INTO {table} (jour, dernier_numero) VALUES (%s, 1) '
+                f'ON DUPLICATE KEY UPDATE dernier_numero = dernier_numero + 1'
+            )
+        else:
+            # PostgreSQL et SQLite (3.24+)
+            sql = (
+                f'INSERT INTO {table} (jour, dernier_numero) VALUES (%s, 1) '
+                f'ON CONFLICT (jour) DO UPDATE SET dernier_numero = {table}.dernier_numero + 1'
+            )
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(sql, [connection.ops.adapt_datefield_value(jour)])
+            # Ligne verrouillée par cette transaction: on relit sa propre écriture
+            return cls.objects.filter(jour=jour).values_list('dernier_numero', flat=True).get()
+
+    @classmethod
+    def prochain_numero_commande(cls):
+        """Retourne un numéro de commande unique au format CMD-YYYYMMDD-XXXX"""
+        jour = timezone.now().date()
+        return f"CMD-{jour:%Y%m%d}-{cls.prochain_numero(jour):04d}"
 
 
 class Commande(models.Model):
@@ -119,6 +226,8 @@ class Commande(models.Model):
     date_service = models.DateTimeField(null=True, blank=True, verbose_name='Date de service')
     date_paiement = models.DateTimeField(null=True, blank=True, verbose_name='Date de paiement')
     notes = models.TextField(blank=True, verbose_name='Notes')
+    # Curseur de /orders/commandes/changes/: toute mise à jour groupée doit le renseigner
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     serveur = models.ForeignKey(
         'authentication.CustomUser',
         on_delete=models.SET_NULL,
@@ -149,6 +258,11 @@ class Commande(models.Model):
         verbose_name = 'Commande'
         verbose_name_plural = 'Commandes'
         ordering = ['-date_commande']
+        indexes = [
+            models.Index(fields=['statut', 'date_commande'], name='commandes_statut_date_idx'),
+            models.Index(fields=['statut', 'date_paiement'], name='commandes_statut_paie_idx'),
+            models.Index(fields=['table', 'statut'], name='commandes_table_statut_idx'),
+        ]
         permissions = [
             ('can_view_all_orders', 'Peut voir toutes les commandes'),
             ('can_serve_order', 'Peut marquer une commande comme servie'),
@@ -158,31 +272,41 @@ class Commande(models.Model):
     def __str__(self):
         return f"{self.numero_commande} - Table {self.table.numero_table} - {self.get_statut_display()}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Mémoriser le statut chargé pour détecter les transitions
+        instance._statut_initial = instance.__dict__.get('statut')
+        return instance
+
     def save(self, *args, **kwargs):
         if not self.numero_commande:
             # Format: CMD-YYYYMMDD-XXXX (où XXXX est un numéro séquentiel)
-            from django.utils import timezone
-            date_str = timezone.now().strftime('%Y%m%d')
-            last_cmd = Commande.objects.filter(numero_commande__startswith=f'CMD-{date_str}').order_by('-id').first()
-            if last_cmd:
-                last_num = int(last_cmd.numero_commande.split('-')[-1])
-                new_num = f"{last_num + 1:04d}"
-            else:
-                new_num = "0001"
-            self.numero_commande = f"CMD-{date_str}-{new_num}"
+            self.numero_commande = CompteurCommande.prochain_numero_commande()
         
         # Mettre à jour les dates en fonction du statut
         if self.statut == 'servie' and not self.date_service:
-            from django.utils import timezone
             self.date_service = timezone.now()
         elif self.statut == 'payee' and not self.date_paiement:
-            from django.utils import timezone
             self.date_paiement = timezone.now()
             
-        super().save(*args, **kwargs)
-        
-        # Mettre à jour le statut de la table
-        self.table.update_status()
+        statut_initial = None if self._state.adding else getattr(self, '_statut_initial', None)
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+
+            # Faire suivre le statut de la table et journaliser, uniquement en cas de transition
+            if self.statut != statut_initial:
+                TableRestaurant.transition_commande(self.table_id, self.statut)
+                CommandeEvent.enregistrer(self, statut_initial, self.statut)
+        self._statut_initial = self.statut
+
+    def delete(self, *args, **kwargs):
+        table_id = self.table_id
+        with transaction.atomic():
+            CommandeEvent.enregistrer(self, self.statut, CommandeEvent.STATUT_SUPPRIMEE)
+            result = super().delete(*args, **kwargs)
+            TableRestaurant.transition_commande(table_id, None)
+        return result
 
 
 class CommandeItem(models.Model):
@@ -217,3 +341,80 @@ class CommandeItem(models.Model):
     @property
     def total(self):
         return self.quantite * self.prix_unitaire
+
+
+class CommandeEvent(models.Model):
+    """
+    Journal des transitions de statut des commandes, en ajout seul.
+
+    Une ligne par transition (création, service, paiement, suppression),
+    écrite dans la même transaction que le changement de statut: les
+    analyses de délais et de débit lisent ce journal plutôt que les tables
+    commandes et paiements. Les lignes ne sont jamais modifiées; celles des
+    commandes supprimées sont conservées (pas de contrainte de clé étrangère).
+    """
+    STATUT_SUPPRIMEE = 'supprimee'
+    STATUT_CHOICES = Commande.STATUT_CHOICES + [(STATUT_SUPPRIMEE, 'Supprimée')]
+
+    id = models.BigAutoField(primary_key=True)
+    commande = models.ForeignKey(
+        Commande,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='evenements',
+        verbose_name='Commande'
+    )
+    table = models.ForeignKey(
+        TableRestaurant,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='evenements_commandes',
+        verbose_name='Table'
+    )
+    statut_precedent = models.CharField(max_length=20, choices=STATUT_CHOICES, blank=True, verbose_name='Statut précédent')
+    statut = models.CharField(max_length=20, choices=STATUT_CHOICES, verbose_name='Statut')
+    date = models.DateTimeField(default=timezone.now, verbose_name='Date')
+
+    class Meta:
+        db_table = 'commandes_evenements'
+        verbose_name = 'Événement de commande'
+        verbose_name_plural = 'Événements de commandes'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['date'], name='cmd_evenements_date_idx'),
+            models.Index(fields=['statut', 'date'], name='cmd_evenements_statut_idx'),
+            models.Index(fields=['commande', 'date'], name='cmd_evenements_commande_idx'),
+        ]
+
+    def __str__(self):
+        return f"Commande {self.commande_id}: {self.statut_precedent or '-'} -> {self.statut}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Le journal des commandes est en ajout seul.")
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def enregistrer(cls, commande, statut_precedent, statut, date=None):
+        return cls.objects.create(
+            commande_id=commande.pk,
+            table_id=commande.table_id,
+            statut_precedent=statut_precedent or '',
+            statut=statut,
+            date=date or timezone.now()
+        )
+
+    @classmethod
+    def enregistrer_groupe(cls, commandes, statut_precedent, statut, date=None):
+        """Une transition commune à plusieurs commandes: [(commande_id, table_id), ...]"""
+        date = date or timezone.now()
+        return cls.objects.bulk_create([
+            cls(
+                commande_id=commande_id,
+                table_id=table_id,
+                statut_precedent=statut_precedent or '',
+                statut=statut,
+                date=date
+            )
+            for commande_id, table_id in commandes
+        ])
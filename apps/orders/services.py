@@ -0,0 +1,55 @@
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Panier, Commande, CommandeItem
+
+
+def checkout_panier(panier, user, notes=''):
+    """
+    Transforme le panier en commande 'en_attente'.
+
+    Le nombre de requêtes est constant quel que soit le nombre d'articles:
+    désactivation du panier, lecture des lignes, numéro de commande,
+    insertion de la commande (avec passage de la table à
+    'commande_en_attente') et un seul bulk_create des lignes.
+
+    Le panier est réclamé en premier par un update() conditionnel sur
+    is_active: d'une double soumission, seule la première requête le
+    désactive, la seconde est refusée au lieu de créer une deuxième commande.
+    """
+    with transaction.atomic():
+        reclame = Panier.objects.filter(pk=panier.pk, is_active=True).update(
+            is_active=False, updated_at=timezone.now()
+        )
+        if not reclame:
+            raise ValidationError("Ce panier a déjà été commandé.")
+
+        items = list(panier.items.all())
+        if not items:
+            # Annule la désactivation du panier
+            raise ValidationError("Le panier est vide.")
+
+        commande = Commande(
+            table=panier.table,
+            montant_total=sum(item.sous_total for item in items),
+            notes=notes,
+            statut='en_attente',
+            serveur=user
+        )
+        # Passe aussi la table à 'commande_en_attente' (une seule requête)
+        commande.save()
+
+        CommandeItem.objects.bulk_create([
+            CommandeItem(
+                commande=commande,
+                plat_id=item.plat_id,
+                quantite=item.quantite,
+                prix_unitaire=item.prix_unitaire,
+                notes=item.notes
+            )
+            for item in items
+        ])
+
+    panier.is_active = False
+    return commande
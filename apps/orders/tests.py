@@ -0,0 +1,312 @@
+import json
+import random
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import OperationalError, close_old_connections, connection
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.authentication.models import CustomUser
+from apps.menu.models import Plat
+from apps.tables.models import TableRestaurant
+
+from .evenements import dernier_evenement, lire_evenements
+from .models import Commande, CommandeEvent, CompteurCommande, Panier, PanierItem
+from .services import checkout_panier
+
+
+class CompteurCommandeConcurrenceTests(TransactionTestCase):
+    """Numérotation des commandes sous créations simultanées"""
+
+    THREADS = 8
+    NUMEROS_PAR_THREAD = 25
+
+    def tirer_numeros(self, jour, numeros, erreurs, depart):
+        try:
+            depart.wait()
+            for _ in range(self.NUMEROS_PAR_THREAD):
+                numeros.append(CompteurCommande.prochain_numero(jour))
+        except Exception as e:
+            erreurs.append(e)
+        finally:
+            close_old_connections()
+            connection.close()
+
+    def test_numeros_uniques_et_contigus(self):
+        jour = date(2026, 1, 15)
+        numeros, erreurs = [], []
+        depart = threading.Barrier(self.THREADS)
+        threads = [
+            threading.Thread(target=self.tirer_numeros, args=(jour, numeros, erreurs, depart))
+            for _ in range(self.THREADS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(erreurs, [])
+        total = self.THREADS * self.NUMEROS_PAR_THREAD
+        self.assertEqual(sorted(numeros), list(range(1, total + 1)))
+        self.assertEqual(CompteurCommande.objects.get(jour=jour).dernier_numero, total)
+
+    def commander(self, panier, user, erreurs, depart):
+        try:
+            depart.wait()
+            for tentative in range(1, 51):
+                try:
+                    checkout_panier(panier, user)
+                    break
+                except OperationalError:
+                    # Base verrouillée (SQLite sérialise les écritures): reprise
+                    if tentative == 50:
+                        raise
+                    time.sleep(random.uniform(0, 0.01 * tentative))
+        except Exception as e:
+            erreurs.append(e)
+        finally:
+            close_old_connections()
+            connection.close()
+
+    def test_premieres_commandes_du_jour_simultanees(self):
+        user = CustomUser.objects.create_user(login='serveur', password='secret', role='Rservent')
+        plat = Plat.objects.create(nom='Riz', prix_unitaire=Decimal('1000'), image='plats/x.jpg')
+        paniers = []
+        for i in range(self.THREADS):
+            table = TableRestaurant.objects.create(numero_table=f'T{i}', nombre_places=4)
+            panier = Panier.objects.create(table=table)
+            PanierItem.objects.create(panier=panier, plat=plat, quantite=1, prix_unitaire=plat.prix_unitaire)
+            paniers.append(panier)
+
+        erreurs = []
+        depart = threading.Barrier(self.THREADS)
+        threads = [
+            threading.Thread(target=self.commander, args=(panier, user, erreurs, depart))
+            for panier in paniers
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(erreurs, [])
+        prefixe = f'CMD-{timezone.now().date():%Y%m%d}-'
+        numeros = sorted(Commande.objects.values_list('numero_commande', flat=True))
+        self.assertEqual(numeros, [f'{prefixe}{i:04d}' for i in range(1, self.THREADS + 1)])
+        self.assertFalse(Panier.objects.filter(is_active=True).exists())
+
+
+class PanierTotauxTests(TestCase):
+    """Totaux dénormalisés du panier (total, item_count) tenus par PanierItem"""
+
+    def setUp(self):
+        self.table = TableRestaurant.objects.create(numero_table='T1', nombre_places=4)
+        self.panier = Panier.objects.create(table=self.table)
+        self.riz = Plat.objects.create(nom='Riz', prix_unitaire=Decimal('1000'), image='plats/x.jpg')
+        self.jus = Plat.objects.create(nom='Jus', prix_unitaire=Decimal('500'), image='plats/x.jpg')
+
+    def ajouter(self, plat, quantite):
+        return PanierItem.objects.create(panier=self.panier, plat=plat, quantite=quantite, prix_unitaire=plat.prix_unitaire)
+
+    def assertTotaux(self, total, item_count):
+        self.panier.refresh_from_db()
+        self.assertEqual((self.panier.total, self.panier.item_count), (Decimal(total), item_count))
+
+    def test_ajout(self):
+        self.ajouter(self.riz, 2)
+        self.ajouter(self.jus, 1)
+        self.assertTotaux('2500', 2)
+
+    def test_modifications_depuis_des_instances_perimees(self):
+        item = self.ajouter(self.riz, 2)
+        premiere = PanierItem.objects.get(pk=item.pk)
+        seconde = PanierItem.objects.get(pk=item.pk)
+
+        premiere.quantite = 3
+        premiere.save()
+        # Chargée avant la première modification: le delta part de la ligne en base
+        seconde.quantite = 5
+        seconde.save()
+        self.assertTotaux('5000', 1)
+
+    def test_suppression(self):
+        self.ajouter(self.jus, 1)
+        item = self.ajouter(self.riz, 2)
+        perimee = PanierItem.objects.get(pk=item.pk)
+
+        item.delete()
+        self.assertTotaux('500', 1)
+        # Seconde suppression de la même ligne: rien n'est retiré deux fois
+        perimee.delete()
+        self.assertTotaux('500', 1)
+
+    def test_commande(self):
+        self.ajouter(self.riz, 2)
+        item = self.ajouter(self.jus, 4)
+        item.quantite = 2
+        item.save()
+        self.assertTotaux('3000', 2)
+
+        commande = checkout_panier(self.panier, None)
+        self.assertEqual(commande.montant_total, Decimal('3000'))
+        self.assertTotaux('3000', 2)
+        self.assertFalse(self.panier.is_active)
+
+
+class CreateOrderTests(TestCase):
+    """Passage de commande depuis le panier de la table"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(login='table01', password='secret', role='Rtable')
+        self.table = TableRestaurant.objects.create(numero_table='T1', nombre_places=4, user=self.user)
+        self.panier = Panier.objects.create(table=self.table)
+        for i in range(3):
+            plat = Plat.objects.create(nom=f'Plat {i}', prix_unitaire=Decimal('1000'), image='plats/x.jpg')
+            PanierItem.objects.create(panier=self.panier, plat=plat, quantite=2, prix_unitaire=plat.prix_unitaire)
+        self.client.force_login(self.user)
+
+    def test_nombre_de_requetes(self):
+        # Utilisateur, table, panier, puis dans la transaction (savepoints
+        # compris): désactivation du panier, lignes, numéro de commande
+        # (création ou incrément du compteur du jour, relecture), insertion de
+        # la commande, passage de la table, événement et lignes de commande
+        with self.assertNumQueries(15):
+            response = self.client.post(reverse('orders:create_order'), {'notes': ''})
+
+        commande = Commande.objects.get()
+        self.assertRedirects(
+            response, reverse('orders:order_confirmation', args=[commande.id]), fetch_redirect_response=False
+        )
+        self.assertEqual(commande.montant_total, Decimal('6000'))
+        self.assertEqual(commande.items.count(), 3)
+        self.assertFalse(Panier.objects.get(pk=self.panier.pk).is_active)
+
+    def test_panier_vide(self):
+        self.panier.items.all().delete()
+        response = self.client.post(reverse('orders:create_order'), {'notes': ''})
+
+        self.assertRedirects(response, reverse('menu:list_dishes'), fetch_redirect_response=False)
+        self.assertFalse(Commande.objects.exists())
+        self.assertTrue(Panier.objects.get(pk=self.panier.pk).is_active)
+
+    def test_double_soumission(self):
+        panier = Panier.objects.get(pk=self.panier.pk)
+        self.client.post(reverse('orders:create_order'), {'notes': ''})
+
+        # Seconde soumission avec le panier lu avant la première
+        with self.assertRaises(ValidationError):
+            checkout_panier(panier, self.user)
+        self.assertEqual(Commande.objects.count(), 1)
+
+
+class ReglementCommandesApiTests(TestCase):
+    """Encaissement groupé en JSON"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(login='caissier', password='secret', role='Rcaissier')
+        self.client.force_login(self.user)
+
+    def test_mode_de_paiement_non_textuel(self):
+        for mode_paiement in (['especes'], {'mode': 'especes'}, 1):
+            response = self.client.post(
+                reverse('orders:settle_orders_api'),
+                json.dumps({'commande_ids': [1], 'mode_paiement': mode_paiement}),
+                content_type='application/json'
+            )
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json()['message'], 'Mode de paiement invalide.')
+
+
+class EvenementsCommandesTests(TestCase):
+    """Flux des changements de commandes lu dans le journal CommandeEvent"""
+
+    def setUp(self):
+        self.table = TableRestaurant.objects.create(numero_table='T1', nombre_places=4)
+        # Point de départ: un événement déjà lu (les identifiants suivants sont contigus)
+        Commande.objects.create(table=self.table, montant_total=Decimal('500'))
+
+    def test_transitions_et_suppression(self):
+        depuis = dernier_evenement()
+        commande = Commande.objects.create(table=self.table, montant_total=Decimal('1000'))
+        commande.statut = 'servie'
+        commande.save()
+        commande_id = commande.id
+        commande.delete()
+
+        dernier, evenements = lire_evenements(depuis)
+        self.assertEqual(dernier, dernier_evenement())
+        self.assertEqual(
+            [(ev['id'], ev['precedent'], ev['statut']) for _, ev in evenements],
+            [(commande_id, None, 'en_attente'), (commande_id, 'en_attente', 'servie'), (commande_id, 'servie', None)]
+        )
+        self.assertEqual(lire_evenements(dernier), (dernier, []))
+
+    def test_identifiant_manquant(self):
+        depuis = dernier_evenement()
+        commandes = [Commande.objects.create(table=self.table, montant_total=Decimal('1000')) for _ in range(3)]
+        # Événement du milieu pas encore validé (ou annulé)
+        CommandeEvent.objects.filter(commande=commandes[1]).delete()
+
+        dernier, evenements = lire_evenements(depuis)
+        self.assertEqual([ev['id'] for _, ev in evenements], [commandes[0].id])
+
+        # Identifiant manquant ancien: transaction annulée, la lecture le saute
+        CommandeEvent.objects.filter(commande=commandes[2]).update(date=timezone.now() - timedelta(minutes=1))
+        dernier, evenements = lire_evenements(dernier)
+        self.assertEqual([ev['id'] for _, ev in evenements], [commandes[2].id])
+        self.assertEqual(dernier, dernier_evenement())
+
+
+class OrderChangesTests(TestCase):
+    """Interrogation des changements de commandes par curseur d'événements"""
+
+    def setUp(self):
+        self.table = TableRestaurant.objects.create(numero_table='T1', nombre_places=4)
+        self.user = CustomUser.objects.create_user(login='serveur', password='secret', role='Rservent')
+        self.client.force_login(self.user)
+        self.url = reverse('orders:order_changes')
+
+    def test_changements_et_suppressions(self):
+        servie = Commande.objects.create(table=self.table, montant_total=Decimal('1000'))
+        supprimee = Commande.objects.create(table=self.table, montant_total=Decimal('2000'))
+        data = self.client.get(self.url).json()
+        self.assertEqual({c['id'] for c in data['commandes']}, {servie.id, supprimee.id})
+
+        servie.statut = 'servie'
+        servie.save()
+        supprimee_id = supprimee.id
+        supprimee.delete()
+        nouvelle = Commande.objects.create(table=self.table, montant_total=Decimal('3000'))
+
+        data = self.client.get(self.url, {'since': data['cursor']}).json()
+        self.assertEqual(
+            [(c['id'], c['statut']) for c in data['commandes']], [(servie.id, 'servie'), (nouvelle.id, 'en_attente')]
+        )
+        self.assertEqual(data['supprimees'], [supprimee_id])
+        self.assertEqual(data['cursor'], dernier_evenement())
+
+        # À jour: 304 sur l'ETag
+        response = self.client.get(self.url, {'since': data['cursor']}, HTTP_IF_NONE_MATCH=f'"{data["cursor"]}"')
+        self.assertEqual(response.status_code, 304)
+
+    def test_compte_de_table(self):
+        user = CustomUser.objects.create_user(login='table01', password='secret', role='Rtable')
+        self.table.user = user
+        self.table.save()
+        autre = TableRestaurant.objects.create(numero_table='T2', nombre_places=4)
+        self.client.force_login(user)
+        Commande.objects.create(table=self.table, montant_total=Decimal('500'))
+        cursor = self.client.get(self.url).json()['cursor']
+        self.assertEqual(cursor, dernier_evenement())
+
+        Commande.objects.create(table=autre, montant_total=Decimal('1000'))
+        commande = Commande.objects.create(table=self.table, montant_total=Decimal('1000'))
+
+        data = self.client.get(self.url, {'since': cursor}).json()
+        self.assertEqual([c['id'] for c in data['commandes']], [commande.id])
+        self.assertEqual(data['cursor'], dernier_evenement())
@@ -17,12 +17,16 @@ urlpatterns = [
     path('commande/nouvelle/', login_required(views.start_table_order), name='start_table_order'),
     path('commande/confirmation/<int:order_id>/', login_required(views.order_confirmation), name='order_confirmation'),
     path('commandes/', login_required(views.list_orders), name='list_orders'),
+    path('commandes/changes/', login_required(views.order_changes), name='order_changes'),
+    path('commandes/flux/', login_required(views.order_stream), name='order_stream'),
     path('commande/<int:order_id>/', login_required(views.view_order), name='view_order'),
     path('commande/<int:order_id>/supprimer/', login_required(views.delete_order), name='delete_order'),
     path('commande/<int:order_id>/facture/', login_required(views.invoice_order), name='invoice_order'),
     path('commande/<int:order_id>/servie/', login_required(views.mark_order_served), name='mark_order_served'),
     path('commande/<int:order_id>/payee/', login_required(views.mark_order_paid), name='mark_order_paid'),
     path('paiement/confirmer/<int:payment_id>/', login_required(views.confirm_payment), name='confirm_payment'),
+    path('commandes/reglement/', login_required(views.settle_orders), name='settle_orders'),
+    path('commandes/reglement/api/', login_required(views.settle_orders_api), name='settle_orders_api'),
     path('historique/', login_required(views.order_history), name='order_history'),
     path('historique-ventes/', login_required(views.sales_history), name='sales_history'),
 ]
@@ -1,25 +1,30 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, user_passes_test
+from django.core.exceptions import ValidationError
 from django.db import transaction
 from django.utils import timezone
 from django.db.models import F, Sum, Q
 from datetime import timedelta
 from django.views.decorators.http import require_POST, require_http_methods
 from django.views.decorators.csrf import csrf_exempt
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
 from decimal import Decimal
 import json
 
 from apps.authentication.decorators import role_required
+from apps.core.periodes import resoudre_periode
 from apps.menu.models import Plat
 from apps.tables.models import TableRestaurant
+from .evenements import dernier_evenement, flux_sse, lire_evenements
 from .models import Panier, PanierItem, Commande, CommandeItem
 from .forms import AddToCartForm, UpdateCartItemForm, CreateOrderForm
+from .services import checkout_panier
 
-from django.views.decorators.cache import cache_page
+from django.views.decorators.cache import cache_page, never_cache
 from django.core.cache import cache
 
+
 @role_required(['Rtable', 'Radmin'])
 # @cache_page(30)  # Cache désactivé pour le debug
 def view_cart(request):
@@ -29,7 +34,7 @@ def view_cart(request):
     
     # if cached_data is None:
     # Récupérer le panier actif de la table de l'utilisateur avec des requêtes optimisées
-    table = request.user.tables.first()
+    table = request.table
     
     if not table:
         messages.error(request, "Aucune table n'est associée à votre compte.")
@@ -86,7 +91,7 @@ def add_to_cart(request, plat_id):
         notes = request.POST.get('notes', '')
         
         # Récupérer la table de l'utilisateur connecté via QR
-        table = request.user.tables.first()
+        table = request.table
         
         if not table:
             messages.error(request, "Aucune table trouvée pour votre compte.")
@@ -121,11 +126,14 @@ def add_to_cart(request, plat_id):
             
             messages.success(request, f"{plat.nom} a été ajouté à votre panier.")
             
+            # Relire les totaux dénormalisés mis à jour par PanierItem.save()
+            panier.refresh_from_db(fields=['total', 'item_count'])
+            
             # Retourner une réponse JSON pour AJAX
             return JsonResponse({
                 'success': True,
                 'message': f"{plat.nom} a été ajouté à votre panier.",
-                'cart_count': panier.items.count(),
+                'cart_count': panier.item_count,
                 'cart_total': str(panier.total)
             })
             
@@ -162,11 +170,12 @@ def remove_from_cart(request):
         
         panier = panier_item.panier
         panier_item.delete()
+        panier.refresh_from_db(fields=['total', 'item_count'])
         
         return JsonResponse({
             'success': True,
             'panier_total': str(panier.total),
-            'item_count': panier.items.count()
+            'item_count': panier.item_count
         })
         
     except PanierItem.DoesNotExist:
@@ -183,7 +192,7 @@ def remove_from_cart(request):
 
 @role_required(['Rtable', 'Radmin'])
 def update_cart_item(request, item_id):
-    table = request.user.tables.first()
+    table = request.table
     if not table:
         messages.error(request, "Aucune table n'est associée à votre compte.")
         return redirect('menu:list_dishes')
@@ -221,7 +230,7 @@ def update_cart_item(request, item_id):
 
 @role_required(['Rtable', 'Radmin'])
 def remove_from_cart_view(request, item_id):
-    table = request.user.tables.first()
+    table = request.table
     if not table:
         messages.error(request, "Aucune table n'est associée à votre compte.")
         return redirect('menu:list_dishes')
@@ -239,10 +248,11 @@ def remove_from_cart_view(request, item_id):
         
         if request.headers.get('HX-Request'):
             from django.template.loader import render_to_string
+            panier.refresh_from_db(fields=['total', 'item_count'])
             items = panier.items.select_related('plat').all()
             html = render_to_string('orders/partials/cart_items.html', {
                 'items': items,
-                'total': panier.total if items else Decimal('0.00')
+                'total': panier.total
             })
             return HttpResponse(html)
         
@@ -253,55 +263,37 @@ def remove_from_cart_view(request, item_id):
 @role_required(['Rtable', 'Radmin'])
 def create_order(request):
     # Récupérer la table de l'utilisateur
-    table = request.user.tables.first()
+    table = request.table
     if not table:
         messages.error(request, "Aucune table n'est associée à votre compte.")
         return redirect('menu:list_dishes')
     
     try:
-        panier = Panier.objects.get(table=table, is_active=True)
+        panier = Panier.objects.select_related('table').get(table=table, is_active=True)
     except Panier.DoesNotExist:
         messages.error(request, "Votre panier est vide.")
         return redirect('menu:list_dishes')
     
-    items = panier.items.select_related('plat').all()
-    
-    if not items:
-        messages.error(request, "Votre panier est vide.")
-        return redirect('menu:list_dishes')
-    
     if request.method == 'POST':
         form = CreateOrderForm(request.POST)
         if form.is_valid():
-            with transaction.atomic():
-                # Créer la commande
-                commande = Commande.objects.create(
-                    table=table,
-                    montant_total=panier.total,
-                    notes=form.cleaned_data['notes'],
-                    statut='en_attente',
-                    serveur=request.user
-                )
-                
-                # Créer les éléments de la commande
-                for item in items:
-                    CommandeItem.objects.create(
-                        commande=commande,
-                        plat=item.plat,
-                        quantite=item.quantite,
-                        prix_unitaire=item.prix_unitaire,
-                        notes=item.notes
-                    )
-                
-                # Désactiver le panier actuel
-                panier.is_active = False
-                panier.save()
-                
-                messages.success(request, 'Commande passée avec succès!')
-                return redirect('orders:order_confirmation', order_id=commande.id)
+            # Panier vide ou déjà commandé: vérifié par checkout_panier()
+            try:
+                commande = checkout_panier(panier, request.user, notes=form.cleaned_data['notes'])
+            except ValidationError as e:
+                messages.error(request, e.messages[0])
+                return redirect('menu:list_dishes')
+            messages.success(request, 'Commande passée avec succès!')
+            return redirect('orders:order_confirmation', order_id=commande.id)
     else:
         form = CreateOrderForm()
     
+    items = panier.items.select_related('plat').all()
+    
+    if not items:
+        messages.error(request, "Votre panier est vide.")
+        return redirect('menu:list_dishes')
+    
     return render(request, 'orders/create_order.html', {
         'form': form,
         'panier': panier,
@@ -312,7 +304,7 @@ def create_order(request):
 @role_required(['Rtable', 'Radmin'])
 def order_confirmation(request, order_id):
     # Récupérer la table de l'utilisateur
-    table = request.user.tables.first()
+    table = request.table
     if not table:
         messages.error(request, "Aucune table n'est associée à votre compte.")
         return redirect('menu:list_dishes')
@@ -321,6 +313,19 @@ def order_confirmation(request, order_id):
     commande = get_object_or_404(Commande, id=order_id, table=table)
     return render(request, 'orders/order_confirmation.html', {'commande': commande})
 
+def get_commandes_visibles(request):
+    """
+    Commandes visibles par l'utilisateur: celles de sa table pour un compte
+    de table (None s'il n'a pas de table), toutes sinon.
+    """
+    if request.user.role == 'Rtable':
+        table = request.table
+        if not table:
+            return None
+        return Commande.objects.filter(table=table)
+    return Commande.objects.all()
+
+
 @role_required(['Rtable', 'Rservent', 'Radmin', 'Rcaissier'])
 @transaction.atomic
 @login_required
@@ -330,15 +335,10 @@ def list_orders(request):
     statut = request.GET.get('statut')
 
     # Si l'utilisateur est une table, ne montrer que ses commandes
-    if request.user.role == 'Rtable':
-        table = request.user.tables.first()
-        if not table:
-            messages.error(request, "Aucune table n'est associée à votre compte.")
-            return redirect('menu:list_dishes')
-        
-        base_qs = Commande.objects.filter(table=table)
-    else:
-        base_qs = Commande.objects.all()
+    base_qs = get_commandes_visibles(request)
+    if base_qs is None:
+        messages.error(request, "Aucune table n'est associée à votre compte.")
+        return redirect('menu:list_dishes')
 
     if statut in ['en_attente', 'servie', 'payee']:
         orders = base_qs.filter(statut=statut)
@@ -362,11 +362,98 @@ def list_orders(request):
         'commandes_en_attente': commandes_en_attente,
         'commandes_servies': commandes_servies,
         'tables': TableRestaurant.objects.all().order_by('numero_table'),
+        # Point de départ du flux temps réel (order_stream)
+        'dernier_evenement': dernier_evenement(),
     }
 
     return render(request, 'orders/list_orders.html', context)
 
 
+@role_required(['Rtable', 'Rservent', 'Radmin', 'Rcaissier'])
+@never_cache
+def order_changes(request):
+    """
+    Commandes modifiées depuis un curseur, pour le rafraîchissement par interrogation
+    de list_orders: GET ?since=<curseur> -> {"cursor": ..., "commandes": [...], "supprimees": [...]}.
+
+    Le curseur est l'identifiant du dernier événement CommandeEvent lu (voir
+    lire_evenements: une transaction validée en retard n'est pas sautée).
+    "commandes" porte l'état courant des commandes changées, "supprimees" les
+    identifiants des commandes supprimées. Sans curseur, la réponse contient
+    les commandes actives. L'ETag est le dernier identifiant du journal: une
+    interrogation à jour coûte une requête MAX() sur la clé primaire et renvoie 304.
+    """
+    base_qs = get_commandes_visibles(request)
+    if base_qs is None:
+        return JsonResponse({'cursor': None, 'commandes': [], 'supprimees': []})
+    table_id = request.table.pk if request.user.role == 'Rtable' else None
+
+    try:
+        since = int(request.GET.get('since') or 0)
+    except ValueError:
+        since = 0
+
+    dernier = dernier_evenement()
+    etag = f'"{dernier}"'
+    if since and since >= dernier and request.headers.get('If-None-Match') == etag:
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    supprimees = []
+    if since:
+        curseur, evenements = lire_evenements(since, table_id=table_id)
+        # Dernier état connu de chaque commande (ordre des événements conservé)
+        derniers = {}
+        for _, evenement in evenements:
+            derniers.pop(evenement['id'], None)
+            derniers[evenement['id']] = evenement
+        commandes = []
+        for evenement in derniers.values():
+            if evenement['statut'] is None:
+                supprimees.append(evenement['id'])
+            else:
+                commandes.append({cle: valeur for cle, valeur in evenement.items() if cle != 'precedent'})
+    else:
+        # Curseur lu avant l'état complet: un changement intercalé est renvoyé au tour suivant
+        curseur = dernier
+        commandes = [
+            {
+                'id': commande_id,
+                'numero': numero,
+                'table': table,
+                'statut': statut,
+                'montant': str(montant),
+                'date': timezone.localtime(date).strftime('%d/%m/%Y %H:%M'),
+            }
+            for commande_id, numero, table, statut, montant, date in base_qs.filter(
+                statut__in=['en_attente', 'servie']
+            ).order_by('updated_at').values_list(
+                'id', 'numero_commande', 'table__numero_table', 'statut', 'montant_total', 'date_commande'
+            )
+        ]
+
+    response = JsonResponse({'cursor': curseur, 'commandes': commandes, 'supprimees': supprimees})
+    response['ETag'] = etag
+    return response
+
+
+@role_required(['Rservent', 'Radmin', 'Rcaissier'])
+@never_cache
+def order_stream(request):
+    """Flux Server-Sent Events des changements de commandes pour le tableau des commandes"""
+    depuis = request.headers.get('Last-Event-ID') or request.GET.get('depuis')
+    try:
+        depuis = int(depuis) if depuis else None
+    except ValueError:
+        depuis = None
+
+    response = StreamingHttpResponse(flux_sse(depuis), content_type='text/event-stream')
+    # Empêcher la mise en tampon par un proxy (nginx)
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @role_required(['Rservent', 'Radmin', 'Rcaissier'])
 @transaction.atomic
 def start_table_order(request):
@@ -415,7 +502,7 @@ def invoice_order(request, order_id):
 
 @role_required(['Rservent', 'Radmin', 'Rcaissier'])
 def mark_order_served(request, order_id):
-    commande = get_object_or_404(Commande, id=order_id)
+    commande = get_object_or_404(Commande.objects.select_related('table'), id=order_id)
 
     if commande.statut != 'en_attente':
         messages.warning(
@@ -440,7 +527,7 @@ def confirm_payment(request, payment_id):
     from apps.payments.models import Paiement
     
     # Récupérer le paiement
-    paiement = get_object_or_404(Paiement, id=payment_id, est_valide=False)
+    paiement = get_object_or_404(Paiement.objects.select_related('commande__table'), id=payment_id, est_valide=False)
     commande = paiement.commande
     
     if request.method == 'POST':
@@ -507,10 +594,78 @@ def mark_order_paid(request, order_id):
         'caisse': caisse
     })
 
+@role_required(['Rservent', 'Radmin', 'Rcaissier'])
+def settle_orders(request):
+    """Écran d'encaissement groupé des commandes servies"""
+    from apps.payments.models import Caisse, Paiement
+    from apps.payments.services import regler_commandes
+    
+    if request.method == 'POST':
+        try:
+            reglees, total = regler_commandes(
+                [int(commande_id) for commande_id in request.POST.getlist('commande_ids') if commande_id.isdigit()],
+                request.POST.get('mode_paiement', 'especes'),
+                request.user
+            )
+        except ValidationError as e:
+            messages.error(request, e.messages[0])
+            return redirect('orders:settle_orders')
+        
+        if reglees:
+            messages.success(request, f"{len(reglees)} commande(s) encaissée(s) pour un total de {total} GNF.")
+        else:
+            messages.warning(request, "Aucune commande à encaisser dans la sélection.")
+        return redirect('orders:settle_orders')
+    
+    commandes = Commande.objects.filter(
+        statut='servie',
+        paiement__isnull=True
+    ).select_related('table').order_by('date_commande')
+    
+    return render(request, 'orders/settle_orders.html', {
+        'commandes': commandes,
+        'caisse': Caisse.get_caisse_ouverte(),
+        'modes_paiement': Paiement.MODE_PAIEMENT_CHOICES,
+    })
+
+
+@require_POST
+@role_required(['Rservent', 'Radmin', 'Rcaissier'])
+def settle_orders_api(request):
+    """
+    Encaissement groupé en JSON: {"commande_ids": [...], "mode_paiement": "especes"}.
+    Répond avec les commandes réglées et le total encaissé.
+    """
+    from apps.payments.services import regler_commandes
+    
+    try:
+        data = json.loads(request.body)
+        commande_ids = [int(commande_id) for commande_id in data.get('commande_ids', [])]
+        mode_paiement = data.get('mode_paiement', 'especes')
+    except (ValueError, TypeError, AttributeError):
+        return JsonResponse({'success': False, 'message': 'Requête invalide'}, status=400)
+    
+    try:
+        reglees, total = regler_commandes(commande_ids, mode_paiement, request.user)
+    except ValidationError as e:
+        return JsonResponse({'success': False, 'message': e.messages[0]}, status=400)
+    
+    ids_reglees = {commande_id for commande_id, _, _ in reglees}
+    return JsonResponse({
+        'success': True,
+        'reglees': [
+            {'id': commande_id, 'numero': numero, 'montant': str(montant)}
+            for commande_id, numero, montant in reglees
+        ],
+        'ignorees': [commande_id for commande_id in commande_ids if commande_id not in ids_reglees],
+        'total': str(total),
+    })
+
+
 @role_required(['Rtable', 'Radmin'])
 def order_history(request):
     # Récupérer la table de l'utilisateur
-    table = request.user.tables.first()
+    table = request.table
     if not table:
         messages.error(request, "Aucune table n'est associée à votre compte.")
         return redirect('menu:list_dishes')
@@ -526,8 +681,6 @@ def order_history(request):
 @role_required(['Radmin', 'Rcaissier'])
 def sales_history(request):
     """Vue pour l'historique des ventes avec filtres par période"""
-    today = timezone.now().date()
-    
     # Gérer les filtres de période
     period = request.GET.get('period', 'today')
     date_debut = request.GET.get('date_debut')
@@ -538,38 +691,10 @@ def sales_history(request):
         'table', 'serveur', 'validateur', 'caissier'
     ).order_by('-date_paiement')
     
-    # Appliquer les filtres de période
-    if period == 'today':
-        queryset = queryset.filter(date_paiement__date=today)
-    elif period == 'yesterday':
-        yesterday = today - timedelta(days=1)
-        queryset = queryset.filter(date_paiement__date=yesterday)
-    elif period == 'before_yesterday':
-        before_yesterday = today - timedelta(days=2)
-        queryset = queryset.filter(date_paiement__date=before_yesterday)
-    elif period == 'week':
-        week_ago = today - timedelta(days=7)
-        queryset = queryset.filter(date_paiement__date__gte=week_ago)
-    elif period == 'month':
-        month_ago = today - timedelta(days=30)
-        queryset = queryset.filter(date_paiement__date__gte=month_ago)
-    elif period == 'last_month':
-        from datetime import datetime
-        first_day_this_month = today.replace(day=1)
-        last_day_last_month = first_day_this_month - timedelta(days=1)
-        first_day_last_month = last_day_last_month.replace(day=1)
-        queryset = queryset.filter(
-            date_paiement__date__gte=first_day_last_month,
-            date_paiement__date__lte=last_day_last_month
-        )
-    elif period == 'year':
-        year_ago = today - timedelta(days=365)
-        queryset = queryset.filter(date_paiement__date__gte=year_ago)
-    elif period == 'custom' and date_debut and date_fin:
-        queryset = queryset.filter(
-            date_paiement__date__gte=date_debut,
-            date_paiement__date__lte=date_fin
-        )
+    # Appliquer les filtres de période (intervalle semi-ouvert, utilisable par l'index)
+    intervalle = resoudre_periode(period, date_debut, date_fin)
+    if intervalle:
+        queryset = queryset.filter(date_paiement__gte=intervalle[0], date_paiement__lt=intervalle[1])
     
     # Calculer les statistiques
     total_ventes = queryset.aggregate(total=Sum('montant_total'))['total'] or Decimal('0.00')
@@ -609,12 +734,12 @@ def invoice_order(request, order_id):
 @role_required(['Rtable', 'Radmin'])
 def delete_order(request, order_id):
     """Supprimer une commande (uniquement si elle est en attente)"""
-    commande = get_object_or_404(Commande, id=order_id)
+    commande = get_object_or_404(Commande.objects.select_related('table'), id=order_id)
     
     # Vérifier les permissions
     if request.user.role == 'Rtable':
         # Les utilisateurs de table ne peuvent supprimer que leurs propres commandes
-        table = request.user.tables.first()
+        table = request.table
         if not table or commande.table != table:
             messages.error(request, "Vous n'avez pas la permission de supprimer cette commande.")
             return redirect('orders:list_orders')
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Caisse, Paiement, TypeDepense, SortieCaisse
+from .models import Caisse, Paiement, TypeDepense, SortieCaisse, MouvementCaisse, RapportZ
 
 
 @admin.register(Caisse)
@@ -53,3 +53,54 @@ class SortieCaisseAdmin(admin.ModelAdmin):
     )
     list_filter = ('type_depense', 'date_sortie')
     search_fields = ('motif', 'utilisateur__login')
+
+
+@admin.register(MouvementCaisse)
+class MouvementCaisseAdmin(admin.ModelAdmin):
+    list_display = (
+        'id',
+        'caisse',
+        'type_mouvement',
+        'montant',
+        'solde_apres',
+        'cumul_ventes',
+        'cumul_depenses',
+        'date',
+    )
+    list_filter = ('type_mouvement', 'date')
+    list_select_related = ('caisse',)
+
+    # Journal en ajout seul: consultation uniquement
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(RapportZ)
+class RapportZAdmin(admin.ModelAdmin):
+    list_display = (
+        'caisse',
+        'date_ouverture',
+        'date_fermeture',
+        'total_ventes',
+        'total_depenses',
+        'solde_theorique',
+        'solde_reel',
+        'difference',
+    )
+    list_filter = ('date_fermeture',)
+
+    # Instantané figé à la fermeture: consultation uniquement
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
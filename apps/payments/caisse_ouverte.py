@@ -0,0 +1,60 @@
+"""
+Pointeur mis en cache vers la caisse ouverte.
+
+La caisse ouverte est cherchée à chaque encaissement, dépense, affichage du
+tableau de bord et à chaque interrogation périodique du statut de la caisse.
+Son identifiant (0: aucune caisse ouverte) est gardé dans le cache sous une clé
+portant un numéro de version, incrémenté une fois la transaction validée quand
+une caisse est ouverte, fermée ou supprimée (voir Caisse.save()/delete()): une
+lecture concurrente de la base faite avant la validation ne peut écrire que
+sous l'ancienne version. La ligne de la caisse (dont le solde change à chaque
+paiement) est ensuite relue par sa clé primaire.
+
+L'absence de caisse ouverte n'est gardée que quelques secondes: avec un cache
+local à chaque processus (LocMem), l'invalidation ne touche que le processus
+qui a ouvert la caisse, et les autres refuseraient les encaissements tant que
+la valeur négative reste en cache.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+CLE_VERSION = 'caisse:ouverte:version'
+DUREE_POINTEUR = 60 * 60
+DUREE_AUCUNE = 5
+AUCUNE = 0
+
+
+def version_caisse_ouverte():
+    version = cache.get(CLE_VERSION)
+    if version is None:
+        # Valeur initiale unique: une version évincée du cache ne peut pas
+        # retomber sur un ancien pointeur encore présent
+        cache.add(CLE_VERSION, time.time_ns(), None)
+        version = cache.get(CLE_VERSION)
+    return version
+
+
+def _incrementer_version():
+    try:
+        cache.incr(CLE_VERSION)
+    except ValueError:
+        cache.add(CLE_VERSION, time.time_ns(), None)
+
+
+def invalider_caisse_ouverte():
+    """Invalide le pointeur une fois la transaction en cours validée"""
+    transaction.on_commit(_incrementer_version)
+
+
+def get_caisse_ouverte_id(rafraichir=False):
+    """Identifiant de la caisse ouverte, ou None si aucune caisse n'est ouverte"""
+    from apps.payments.models import Caisse
+
+    cle = f'caisse:ouverte:{version_caisse_ouverte()}'
+    caisse_id = None if rafraichir else cache.get(cle)
+    if caisse_id is None:
+        caisse_id = Caisse.objects.filter(est_ouverte=True).values_list('pk', flat=True).first() or AUCUNE
+        cache.set(cle, caisse_id, DUREE_POINTEUR if caisse_id else DUREE_AUCUNE)
+    return caisse_id or None
@@ -57,7 +57,7 @@ class PaiementForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         # Ne permettre que les commandes non payées
-        self.fields['commande'].queryset = Commande.objects.filter(paiement__isnull=True)
+        self.fields['commande'].queryset = Commande.objects.filter(paiement__isnull=True).select_related('table')
         
         # Si une commande est passée dans les données initiales, limiter à cette commande
         if 'commande' in self.initial:
@@ -200,16 +200,15 @@ class FilterSortieCaisseForm(FilterCaisseForm):
 
 
 class FermetureCaisseForm(forms.ModelForm):
+    """
+    Clôture d'une caisse: seules les notes de clôture sont saisies. Le solde
+    initial et le solde réel ne changent qu'à travers le journal de caisse
+    (ouverture, encaissements, dépenses, ajouts de fond).
+    """
     class Meta:
         model = Caisse
-        fields = ['solde_actuel', 'notes_fermeture']
+        fields = ['notes_fermeture']
         widgets = {
-            'solde_actuel': forms.NumberInput(attrs={
-                'class': 'w-full p-2 border border-gray-300 rounded-md',
-                'step': '0.01',
-                'min': '0',
-                'placeholder': 'Solde réel en caisse'
-            }),
             'notes_fermeture': forms.Textarea(attrs={
                 'class': 'w-full p-2 border border-gray-300 rounded-md',
                 'rows': 3,
@@ -217,20 +216,13 @@ class FermetureCaisseForm(forms.ModelForm):
             }),
         }
         labels = {
-            'solde_actuel': 'Solde réel en caisse',
             'notes_fermeture': 'Notes de clôture'
         }
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.fields['solde_actuel'].initial = self.instance.solde_theorique
-        self.fields['solde_actuel'].help_text = f"Solde théorique: {self.instance.solde_theorique} GNF"
-    
-    def clean_solde_actuel(self):
-        solde_actuel = self.cleaned_data.get('solde_actuel')
-        if solde_actuel < 0:
-            raise forms.ValidationError("Le solde ne peut pas être négatif.")
-        return solde_actuel
+        if self.instance.pk:
+            self.fields['notes_fermeture'].help_text = f"Solde théorique: {self.instance.solde_theorique} GNF"
 
 
 class AjoutFondCaisseForm(forms.Form):
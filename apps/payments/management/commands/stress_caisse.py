@@ -0,0 +1,165 @@
+import random
+import threading
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from apps.authentication.models import CustomUser
+from apps.orders.models import Commande, CommandeEvent
+from apps.payments.models import Caisse, Paiement
+from apps.tables.models import TableRestaurant
+
+MAX_TENTATIVES = 30
+
+
+class Command(BaseCommand):
+    help = (
+        'Test de charge du solde de caisse: des threads valident en parallèle des '
+        'milliers de paiements (chacun plusieurs fois) puis le solde est comparé au '
+        'total attendu. À lancer sur une base de test MySQL ou PostgreSQL (SQLite '
+        'sérialise les écritures); refuse de tourner si une caisse est ouverte.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--paiements',
+            type=int,
+            default=2000,
+            help='Nombre de paiements à valider (défaut: 2000)'
+        )
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=8,
+            help='Nombre de threads (défaut: 8)'
+        )
+        parser.add_argument(
+            '--repetitions',
+            type=int,
+            default=2,
+            help='Nombre de validations concurrentes de chaque paiement (défaut: 2)'
+        )
+        parser.add_argument(
+            '--conserver',
+            action='store_true',
+            help='Conserver les données générées (caisse, commandes, paiements)'
+        )
+
+    def preparer(self, nombre, suffixe):
+        utilisateur = CustomUser.objects.create_user(login=f'stress{suffixe}', role='Rcaissier')
+        table = TableRestaurant.objects.create(numero_table=f'STRESS-{suffixe}', nombre_places=4)
+        caisse = Caisse.objects.create(utilisateur_ouverture=utilisateur, solde_initial=Decimal('100000.00'))
+
+        montants = [Decimal(random.randrange(1000, 50000)) for _ in range(nombre)]
+        commandes = Commande.objects.bulk_create([
+            Commande(
+                table=table,
+                numero_commande=f'STRESS-{suffixe}-{i:06d}',
+                statut='servie',
+                montant_total=montant,
+            )
+            for i, montant in enumerate(montants)
+        ])
+        paiements = Paiement.objects.bulk_create([
+            Paiement(
+                commande=commande,
+                montant=commande.montant_total,
+                mode_paiement='especes',
+                caisse=caisse,
+                utilisateur=utilisateur,
+                date_paiement=timezone.now(),
+            )
+            for commande in commandes
+        ])
+        return utilisateur, table, caisse, [paiement.pk for paiement in paiements]
+
+    def valider(self, ids, resultats):
+        """Corps d'un thread: valide chaque paiement de `ids` (avec reprise sur interblocage)"""
+        validations = reprises = 0
+        try:
+            for pk in ids:
+                for tentative in range(1, MAX_TENTATIVES + 1):
+                    try:
+                        paiement = Paiement.objects.select_related('commande', 'caisse', 'utilisateur').get(pk=pk)
+                        paiement.est_valide = True
+                        paiement.save()
+                        validations += 1
+                        break
+                    except OperationalError:
+                        # Interblocage (ou base verrouillée sous SQLite): reprise après une pause
+                        reprises += 1
+                        time.sleep(random.uniform(0, 0.01 * tentative))
+        finally:
+            connection.close()
+            resultats.append((validations, reprises))
+
+    def nettoyer(self, utilisateur, table, caisse, ids):
+        commande_ids = list(Paiement.objects.filter(pk__in=ids).values_list('commande_id', flat=True))
+        # Suppressions en masse: les paiements de test ne sont pas reportés dans le rollup
+        Paiement.objects.filter(pk__in=ids).delete()
+        CommandeEvent.objects.filter(commande_id__in=commande_ids).delete()
+        Commande.objects.filter(pk__in=commande_ids).delete()
+        caisse.delete()
+        table.delete()
+        utilisateur.delete()
+
+    def handle(self, *args, **options):
+        if Caisse.objects.filter(est_ouverte=True).exists():
+            raise CommandError('Une caisse est ouverte: lancez ce test sur une base de test.')
+
+        nombre, nb_threads = options['paiements'], options['threads']
+        suffixe = timezone.now().strftime('%Y%m%d%H%M%S')
+        utilisateur, table, caisse, ids = self.preparer(nombre, suffixe)
+        self.stdout.write(
+            f'{nombre} paiements, {nb_threads} threads, '
+            f'{options["repetitions"]} validations concurrentes par paiement'
+        )
+
+        try:
+            taches = ids * options['repetitions']
+            random.shuffle(taches)
+            resultats = []
+            threads = [
+                threading.Thread(target=self.valider, args=(taches[i::nb_threads], resultats))
+                for i in range(nb_threads)
+            ]
+            debut = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            duree = time.perf_counter() - debut
+
+            validations = sum(v for v, _ in resultats)
+            reprises = sum(r for _, r in resultats)
+            self.stdout.write(
+                f'{validations} validations en {duree:.1f} s '
+                f'({validations / duree:.0f}/s), {reprises} reprise(s) après interblocage'
+            )
+
+            caisse.refresh_from_db()
+            totaux = Paiement.objects.filter(pk__in=ids).aggregate(montant=Sum('montant'), credite=Sum('montant_credite'))
+            attendu = caisse.solde_initial + (totaux['montant'] or Decimal('0'))
+            credite = caisse.solde_initial + (totaux['credite'] or Decimal('0'))
+            non_credites = Paiement.objects.filter(pk__in=ids).exclude(montant_credite=F('montant')).count()
+
+            erreurs = []
+            if caisse.solde_actuel != credite:
+                # Mise à jour perdue ou paiement crédité deux fois
+                erreurs.append(f'solde {caisse.solde_actuel} GNF au lieu de {credite} GNF crédités')
+            if non_credites:
+                erreurs.append(f'{non_credites} paiement(s) non crédité(s)')
+            if validations < len(taches):
+                self.stdout.write(self.style.WARNING(
+                    f'{len(taches) - validations} validation(s) abandonnée(s) après {MAX_TENTATIVES} tentatives'
+                ))
+            if erreurs:
+                raise CommandError('ÉCHEC: ' + '; '.join(erreurs))
+            self.stdout.write(self.style.SUCCESS(f'OK: solde {caisse.solde_actuel} GNF = attendu {attendu} GNF'))
+        finally:
+            if not options['conserver']:
+                self.nettoyer(utilisateur, table, caisse, ids)
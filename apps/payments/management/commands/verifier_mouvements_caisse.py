@@ -0,0 +1,112 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Sum
+
+from apps.payments.models import Caisse, MouvementCaisse, Paiement, SortieCaisse
+
+ZERO = Decimal('0.00')
+
+
+class Command(BaseCommand):
+    help = (
+        'Vérifie le journal de caisse (MouvementCaisse): chaque solde courant est '
+        'recalculé depuis la première écriture, et les cumuls de la dernière écriture '
+        'sont comparés aux totaux des paiements et des dépenses. Échoue en cas de dérive; '
+        'avec --corriger, ajoute une écriture de correction aux caisses en écart.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--caisse',
+            type=int,
+            help='Vérifier uniquement cette caisse (id)'
+        )
+        parser.add_argument(
+            '--corriger',
+            action='store_true',
+            help='Ajouter une écriture de correction aux caisses dont les totaux ont dérivé'
+        )
+
+    def handle(self, *args, **options):
+        caisses = Caisse.objects.order_by('id')
+        if options['caisse']:
+            caisses = caisses.filter(pk=options['caisse'])
+            if not caisses.exists():
+                raise CommandError(f"Caisse {options['caisse']} introuvable.")
+
+        ventes = dict(
+            Paiement.objects.order_by().values('caisse_id').annotate(total=Sum('montant')).values_list('caisse_id', 'total')
+        )
+        depenses = dict(
+            SortieCaisse.objects.order_by().values('caisse_id').annotate(total=Sum('montant')).values_list('caisse_id', 'total')
+        )
+
+        erreurs = 0
+        for caisse_id, solde_initial in caisses.values_list('id', 'solde_initial'):
+            ruptures = self.verifier_chainage(caisse_id)
+            attendu = (
+                solde_initial + ventes.get(caisse_id, ZERO) - depenses.get(caisse_id, ZERO),
+                ventes.get(caisse_id, ZERO),
+                depenses.get(caisse_id, ZERO),
+            )
+            dernier = MouvementCaisse.objects.filter(caisse_id=caisse_id).order_by('-id').values_list(
+                'solde_apres', 'cumul_ventes', 'cumul_depenses'
+            ).first()
+
+            if ruptures:
+                erreurs += 1
+                self.stdout.write(self.style.ERROR(
+                    f'Caisse {caisse_id}: {ruptures} écriture(s) dont le solde ne suit pas la précédente'
+                ))
+            if dernier != attendu:
+                erreurs += 1
+                self.stdout.write(self.style.ERROR(
+                    f'Caisse {caisse_id}: journal {dernier} (solde, ventes, dépenses), '
+                    f'attendu {attendu}'
+                ))
+                if options['corriger']:
+                    self.corriger(caisse_id)
+                    self.stdout.write(self.style.WARNING(f'Caisse {caisse_id}: écriture de correction ajoutée'))
+
+        if erreurs and not options['corriger']:
+            raise CommandError(f'{erreurs} écart(s) dans le journal de caisse.')
+        self.stdout.write(self.style.SUCCESS(
+            f'{caisses.count()} caisse(s) vérifiée(s), {erreurs} écart(s).'
+        ))
+
+    def verifier_chainage(self, caisse_id):
+        """Nombre d'écritures dont le solde et les cumuls ne découlent pas de l'écriture précédente"""
+        ruptures = 0
+        precedent = (ZERO, ZERO, ZERO)
+        mouvements = MouvementCaisse.objects.filter(caisse_id=caisse_id).order_by('id').values_list(
+            'type_mouvement', 'montant', 'solde_apres', 'cumul_ventes', 'cumul_depenses'
+        )
+        for type_mouvement, montant, *cumuls in mouvements.iterator(chunk_size=2000):
+            cumuls = tuple(cumuls)
+            if type_mouvement != MouvementCaisse.TYPE_CORRECTION:
+                if MouvementCaisse.calculer_cumuls(precedent, type_mouvement, montant) != cumuls:
+                    ruptures += 1
+            # Une correction repart des totaux recalculés
+            precedent = cumuls
+        return ruptures
+
+    def corriger(self, caisse_id):
+        """Ajoute une écriture ramenant le journal aux totaux des paiements et des dépenses"""
+        with transaction.atomic():
+            solde_initial = Caisse.objects.select_for_update().values_list('solde_initial', flat=True).get(pk=caisse_id)
+            ventes = Paiement.objects.filter(caisse_id=caisse_id).aggregate(total=Sum('montant'))['total'] or ZERO
+            depenses = SortieCaisse.objects.filter(caisse_id=caisse_id).aggregate(total=Sum('montant'))['total'] or ZERO
+            solde = solde_initial + ventes - depenses
+            dernier = MouvementCaisse.objects.filter(caisse_id=caisse_id).order_by('-id').values_list(
+                'solde_apres', flat=True
+            ).first() or ZERO
+            MouvementCaisse.objects.create(
+                caisse_id=caisse_id,
+                type_mouvement=MouvementCaisse.TYPE_CORRECTION,
+                montant=solde - dernier,
+                solde_apres=solde,
+                cumul_ventes=ventes,
+                cumul_depenses=depenses
+            )
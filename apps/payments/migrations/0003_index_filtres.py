@@ -0,0 +1,25 @@
+# Generated by Django 4.2.27 on 2026-10-18 09:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0002_paiement_est_valide'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='paiement',
+            index=models.Index(fields=['date_paiement'], name='paiements_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='paiement',
+            index=models.Index(fields=['caisse', 'mode_paiement'], name='paiements_caisse_mode_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sortiecaisse',
+            index=models.Index(fields=['date_sortie'], name='sorties_caisse_date_idx'),
+        ),
+    ]
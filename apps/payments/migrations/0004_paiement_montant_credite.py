@@ -0,0 +1,27 @@
+# Generated by Django 4.2.27 on 2026-10-18 10:09
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import F
+
+
+def marquer_paiements_credites(apps, schema_editor):
+    # Les paiements déjà validés ont été crédités en caisse par l'ancien Paiement.save()
+    Paiement = apps.get_model('payments', 'Paiement')
+    Paiement.objects.filter(est_valide=True).update(montant_credite=F('montant'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0003_index_filtres'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paiement',
+            name='montant_credite',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=10, verbose_name='Montant crédité en caisse'),
+        ),
+        migrations.RunPython(marquer_paiements_credites, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 4.2.27 on 2026-10-18 10:15
+
+import heapq
+from decimal import Decimal
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def construire_journal(apps, schema_editor):
+    # Journal des caisses existantes: ouverture au solde initial puis paiements
+    # et dépenses dans l'ordre chronologique (les ajouts de fond passés sont
+    # déjà inclus dans le solde initial)
+    Caisse = apps.get_model('payments', 'Caisse')
+    Paiement = apps.get_model('payments', 'Paiement')
+    SortieCaisse = apps.get_model('payments', 'SortieCaisse')
+    MouvementCaisse = apps.get_model('payments', 'MouvementCaisse')
+
+    for caisse_id, solde_initial, date_ouverture in Caisse.objects.order_by('id').values_list(
+        'id', 'solde_initial', 'date_ouverture'
+    ):
+        paiements = Paiement.objects.filter(caisse_id=caisse_id).order_by('date_paiement', 'id').values_list(
+            'date_paiement', 'id', 'montant'
+        )
+        sorties = SortieCaisse.objects.filter(caisse_id=caisse_id).order_by('date_sortie', 'id').values_list(
+            'date_sortie', 'id', 'montant'
+        )
+        operations = heapq.merge(
+            ((date, 'paiement', id_, montant) for date, id_, montant in paiements.iterator()),
+            ((date, 'depense', id_, montant) for date, id_, montant in sorties.iterator()),
+            key=lambda operation: operation[0]
+        )
+
+        solde, ventes, depenses = solde_initial, Decimal('0.00'), Decimal('0.00')
+        mouvements = [MouvementCaisse(
+            caisse_id=caisse_id, type_mouvement='ouverture', montant=solde_initial,
+            solde_apres=solde, cumul_ventes=ventes, cumul_depenses=depenses, date=date_ouverture
+        )]
+        for date, type_mouvement, id_, montant in operations:
+            if type_mouvement == 'paiement':
+                ventes += montant
+                solde += montant
+            else:
+                depenses += montant
+                solde -= montant
+                montant = -montant
+            mouvements.append(MouvementCaisse(
+                caisse_id=caisse_id, type_mouvement=type_mouvement, montant=montant,
+                paiement_id=id_ if type_mouvement == 'paiement' else None,
+                sortie_id=id_ if type_mouvement == 'depense' else None,
+                solde_apres=solde, cumul_ventes=ventes, cumul_depenses=depenses, date=date
+            ))
+        MouvementCaisse.objects.bulk_create(mouvements, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0004_paiement_montant_credite'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MouvementCaisse',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('type_mouvement', models.CharField(choices=[('ouverture', 'Ouverture'), ('paiement', 'Paiement'), ('depense', 'Dépense'), ('fond', 'Ajout de fond'), ('correction', 'Correction')], max_length=20, verbose_name='Type')),
+                ('montant', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Montant (signé)')),
+                ('solde_apres', models.DecimalField(decimal_places=2, max_digits=14, verbose_name='Solde théorique après')),
+                ('cumul_ventes', models.DecimalField(decimal_places=2, max_digits=14, verbose_name='Cumul des ventes')),
+                ('cumul_depenses', models.DecimalField(decimal_places=2, max_digits=14, verbose_name='Cumul des dépenses')),
+                ('date', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Date')),
+                ('caisse', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mouvements', to='payments.caisse', verbose_name='Caisse')),
+                ('paiement', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='payments.paiement', verbose_name='Paiement')),
+                ('sortie', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='payments.sortiecaisse', verbose_name='Sortie de caisse')),
+            ],
+            options={
+                'verbose_name': 'Mouvement de caisse',
+                'verbose_name_plural': 'Mouvements de caisse',
+                'db_table': 'mouvements_caisse',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.RunPython(construire_journal, migrations.RunPython.noop),
+    ]
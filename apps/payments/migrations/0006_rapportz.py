@@ -0,0 +1,96 @@
+# Generated by Django 4.2.27 on 2026-10-18 10:17
+
+import django.core.serializers.json
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+import django.db.models.deletion
+
+
+MODES_PAIEMENT = {
+    'especes': 'Espèces',
+    'carte': 'Carte bancaire',
+    'cheque': 'Chèque',
+    'autre': 'Autre',
+}
+
+
+def generer_rapports(apps, schema_editor):
+    # Rapports Z des caisses déjà fermées, calculés comme RapportZ.calculer()
+    Caisse = apps.get_model('payments', 'Caisse')
+    Paiement = apps.get_model('payments', 'Paiement')
+    SortieCaisse = apps.get_model('payments', 'SortieCaisse')
+    RapportZ = apps.get_model('payments', 'RapportZ')
+
+    for caisse in Caisse.objects.filter(est_ouverte=False).order_by('id').iterator():
+        ventes_par_mode = [
+            {
+                'mode': ligne['mode_paiement'],
+                'libelle': MODES_PAIEMENT.get(ligne['mode_paiement'], ligne['mode_paiement']),
+                'nombre': ligne['nombre'],
+                'total': ligne['total'],
+            }
+            for ligne in Paiement.objects.filter(caisse_id=caisse.id).order_by().values('mode_paiement').annotate(
+                nombre=Count('id'), total=Sum('montant')
+            ).order_by('-total')
+        ]
+        depenses_par_type = [
+            {'type': ligne['type_depense__nom'], 'nombre': ligne['nombre'], 'total': ligne['total']}
+            for ligne in SortieCaisse.objects.filter(caisse_id=caisse.id).order_by().values('type_depense__nom').annotate(
+                nombre=Count('id'), total=Sum('montant')
+            ).order_by('-total')
+        ]
+        total_ventes = sum((ligne['total'] for ligne in ventes_par_mode), Decimal('0.00'))
+        total_depenses = sum((ligne['total'] for ligne in depenses_par_type), Decimal('0.00'))
+        solde_theorique = caisse.solde_initial + total_ventes - total_depenses
+        RapportZ.objects.create(
+            caisse_id=caisse.id,
+            date_ouverture=caisse.date_ouverture,
+            date_fermeture=caisse.date_fermeture or caisse.date_ouverture,
+            solde_initial=caisse.solde_initial,
+            solde_theorique=solde_theorique,
+            solde_reel=caisse.solde_actuel,
+            difference=caisse.solde_actuel - solde_theorique,
+            total_ventes=total_ventes,
+            nombre_paiements=sum(ligne['nombre'] for ligne in ventes_par_mode),
+            total_depenses=total_depenses,
+            nombre_sorties=sum(ligne['nombre'] for ligne in depenses_par_type),
+            ventes_par_mode=ventes_par_mode,
+            depenses_par_type=depenses_par_type,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0005_mouvementcaisse'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RapportZ',
+            fields=[
+                ('caisse', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rapport_z', serialize=False, to='payments.caisse', verbose_name='Caisse')),
+                ('date_ouverture', models.DateTimeField(verbose_name='Ouverture')),
+                ('date_fermeture', models.DateTimeField(verbose_name='Fermeture')),
+                ('solde_initial', models.DecimalField(decimal_places=2, max_digits=14, verbose_name='Solde initial')),
+                ('solde_theorique', models.DecimalField(decimal_places=2, max_digits=14, verbose_name='Solde théorique')),
+                ('solde_reel', models.DecimalField(decimal_places=2, max_digits=14, verbose_name='Solde réel')),
+                ('difference', models.DecimalField(decimal_places=2, max_digits=14, verbose_name='Écart (réel - théorique)')),
+                ('total_ventes', models.DecimalField(decimal_places=2, max_digits=14, verbose_name='Total des ventes')),
+                ('nombre_paiements', models.PositiveIntegerField(verbose_name='Nombre de paiements')),
+                ('total_depenses', models.DecimalField(decimal_places=2, max_digits=14, verbose_name='Total des dépenses')),
+                ('nombre_sorties', models.PositiveIntegerField(verbose_name='Nombre de sorties')),
+                ('ventes_par_mode', models.JSONField(default=list, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Ventes par mode')),
+                ('depenses_par_type', models.JSONField(default=list, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Dépenses par type')),
+                ('date_creation', models.DateTimeField(auto_now_add=True, verbose_name='Date du rapport')),
+            ],
+            options={
+                'verbose_name': 'Rapport Z',
+                'verbose_name_plural': 'Rapports Z',
+                'db_table': 'rapports_z',
+            },
+        ),
+        migrations.RunPython(generer_rapports, migrations.RunPython.noop),
+    ]
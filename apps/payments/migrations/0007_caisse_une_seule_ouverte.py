@@ -0,0 +1,31 @@
+# Generated by Django 4.2.27 on 2026-10-18 10:19
+
+from django.db import migrations, models
+import django.db.models.lookups
+from django.utils import timezone
+
+
+def fermer_caisses_en_trop(apps, schema_editor):
+    # Comme l'ancien Caisse.save(): seule la dernière caisse ouverte le reste
+    Caisse = apps.get_model('payments', 'Caisse')
+    derniere = Caisse.objects.filter(est_ouverte=True).order_by('-date_ouverture', '-id').first()
+    if derniere:
+        Caisse.objects.filter(est_ouverte=True).exclude(pk=derniere.pk).update(
+            est_ouverte=False,
+            date_fermeture=timezone.now()
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0006_rapportz'),
+    ]
+
+    operations = [
+        migrations.RunPython(fermer_caisses_en_trop, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='caisse',
+            constraint=models.UniqueConstraint(models.Case(models.When(django.db.models.lookups.Exact(models.F('est_ouverte'), True), then=models.Value(1))), name='caisse_une_seule_ouverte'),
+        ),
+    ]
@@ -1,11 +1,15 @@
-from django.db import models
+from django.db import models, transaction
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinValueValidator
-from django.db.models import Sum
+from django.db.models import Case, Count, F, Sum, Value, When
+from django.db.models.lookups import Exact
 from django.utils import timezone
 from decimal import Decimal
 
 from apps.orders.models import Commande
 from apps.authentication.models import CustomUser
+from apps.dashboard.models import DailySalesRollup
+from apps.payments.caisse_ouverte import get_caisse_ouverte_id, invalider_caisse_ouverte
 
 
 class Caisse(models.Model):
@@ -66,58 +70,134 @@ class Caisse(models.Model):
             ('can_close_register', 'Peut fermer la caisse'),
             ('can_view_register', 'Peut voir les détails de la caisse'),
         ]
+        constraints = [
+            # Index unique sur une expression nulle pour les caisses fermées:
+            # au plus une caisse ouverte (MySQL n'a pas d'index partiel)
+            models.UniqueConstraint(
+                Case(When(Exact(F('est_ouverte'), True), then=Value(1))),
+                name='caisse_une_seule_ouverte'
+            ),
+        ]
 
     def __str__(self):
         return f'Caisse du {self.date_ouverture.strftime("%d/%m/%Y")} - {self.get_status_display()}'
 
     def save(self, *args, **kwargs):
-        # S'assurer qu'il n'y a qu'une seule instance de Caisse ouverte à la fois
-        if self.est_ouverte:
-            Caisse.objects.exclude(pk=self.pk).filter(est_ouverte=True).update(
-                est_ouverte=False,
-                date_fermeture=timezone.now()
-            )
+        # Une seule caisse ouverte à la fois: garanti par la contrainte caisse_une_seule_ouverte
         
         # Si c'est une nouvelle caisse, initialiser le solde_actuel
         if not self.pk and not self.solde_actuel:
             self.solde_actuel = self.solde_initial
         
-        super().save(*args, **kwargs)
+        # Fermeture: la caisse était ouverte au chargement et ne l'est plus
+        fermeture = not self._state.adding and getattr(self, '_etait_ouverte', False) and not self.est_ouverte
+        
+        if self._state.adding or fermeture:
+            with transaction.atomic():
+                if fermeture:
+                    # Verrou pris avant l'écriture, solde relu sous ce verrou:
+                    # aucun encaissement ne peut s'intercaler avant le rapport Z
+                    self.solde_actuel = Caisse.objects.select_for_update().values_list(
+                        'solde_actuel', flat=True
+                    ).get(pk=self.pk)
+                super().save(*args, **kwargs)
+                if fermeture:
+                    # Rapport Z figé au moment de la clôture
+                    RapportZ.generer(self)
+                else:
+                    # Première écriture du journal: le solde initial
+                    MouvementCaisse.enregistrer(self.pk, MouvementCaisse.TYPE_OUVERTURE, self.solde_initial)
+        else:
+            super().save(*args, **kwargs)
+        
+        if self.est_ouverte != getattr(self, '_etait_ouverte', False):
+            # Ouverture ou fermeture: le pointeur vers la caisse ouverte change
+            invalider_caisse_ouverte()
+        self._etait_ouverte = self.est_ouverte
+    
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        invalider_caisse_ouverte()
+        return result
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Mémoriser l'état chargé pour détecter la fermeture dans save()
+        if 'est_ouverte' in instance.__dict__:
+            instance._etait_ouverte = instance.est_ouverte
+        return instance
     
     def get_status_display(self):
         return 'Ouverte' if self.est_ouverte else 'Fermée'
     
+    @property
+    def dernier_mouvement(self):
+        """Dernière écriture du journal de caisse (une lecture indexée, porte les cumuls courants)"""
+        return self.mouvements.order_by('-id').first()
+    
     @property
     def total_ventes(self):
-        """Calcule le total des ventes pour cette caisse"""
-        return self.paiements.aggregate(
-            total=Sum('montant')
-        )['total'] or Decimal('0.00')
+        """Total des ventes pour cette caisse (cumul du journal)"""
+        mouvement = self.dernier_mouvement
+        if mouvement is None:
+            return self.paiements.aggregate(
+                total=Sum('montant')
+            )['total'] or Decimal('0.00')
+        return mouvement.cumul_ventes
     
     @property
     def total_depenses(self):
-        """Calcule le total des dépenses pour cette caisse"""
-        return self.sorties.aggregate(
-            total=Sum('montant')
-        )['total'] or Decimal('0.00')
+        """Total des dépenses pour cette caisse (cumul du journal)"""
+        mouvement = self.dernier_mouvement
+        if mouvement is None:
+            return self.sorties.aggregate(
+                total=Sum('montant')
+            )['total'] or Decimal('0.00')
+        return mouvement.cumul_depenses
     
     @property
     def solde_theorique(self):
-        """Calcule le solde théorique de la caisse"""
-        return self.solde_initial + self.total_ventes - self.total_depenses
+        """Solde théorique de la caisse (solde courant du journal)"""
+        mouvement = self.dernier_mouvement
+        if mouvement is None:
+            return self.solde_initial + self.total_ventes - self.total_depenses
+        return mouvement.solde_apres
     
     @property
     def difference(self):
         """Calcule la différence entre le solde théorique et le solde réel"""
         return self.solde_actuel - self.solde_theorique
     
+    @classmethod
+    def appliquer_mouvement(cls, caisse_id, montant, fond=False):
+        """
+        Ajoute `montant` (négatif pour un retrait) au solde actuel de la caisse,
+        et aussi au solde initial pour un ajout de fond, puis retourne le nouveau
+        solde actuel. La ligne est verrouillée (select_for_update) et la variation
+        appliquée en SQL avec F(): deux encaissements simultanés ne peuvent plus
+        s'écraser, et le reste de la ligne n'est pas réécrit.
+        """
+        deltas = {'solde_actuel': F('solde_actuel') + montant}
+        if fond:
+            deltas['solde_initial'] = F('solde_initial') + montant
+        with transaction.atomic(savepoint=False):
+            solde = cls.objects.select_for_update().values_list('solde_actuel', flat=True).get(pk=caisse_id)
+            cls.objects.filter(pk=caisse_id).update(**deltas)
+        return solde + montant
+    
     @classmethod
     def get_caisse_ouverte(cls):
         """Récupère la caisse ouverte ou None si aucune caisse n'est ouverte"""
-        try:
-            return cls.objects.get(est_ouverte=True)
-        except cls.DoesNotExist:
+        caisse_id = get_caisse_ouverte_id()
+        if caisse_id is None:
             return None
+        caisse = cls.objects.filter(pk=caisse_id, est_ouverte=True).first()
+        if caisse is None:
+            # Pointeur périmé (caisse fermée hors de save()): relire la base
+            caisse_id = get_caisse_ouverte_id(rafraichir=True)
+            caisse = cls.objects.filter(pk=caisse_id, est_ouverte=True).first() if caisse_id else None
+        return caisse
     
     @classmethod
     def get_derniere_caisse(cls):
@@ -183,12 +263,23 @@ class Paiement(models.Model):
         blank=True,
         verbose_name='Notes complémentaires'
     )
+    montant_credite = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        editable=False,
+        verbose_name='Montant crédité en caisse'
+    )
 
     class Meta:
         db_table = 'paiements'
         verbose_name = 'Paiement'
         verbose_name_plural = 'Paiements'
         ordering = ['-date_paiement']
+        indexes = [
+            models.Index(fields=['date_paiement'], name='paiements_date_idx'),
+            models.Index(fields=['caisse', 'mode_paiement'], name='paiements_caisse_mode_idx'),
+        ]
         permissions = [
             ('can_register_payment', 'Peut enregistrer un paiement'),
             ('can_view_payment', 'Peut voir les détails des paiements'),
@@ -197,6 +288,18 @@ class Paiement(models.Model):
     def __str__(self):
         return f'Paiement {self.id} - {self.commande.numero_commande} - {self.montant} GNF'
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Mémoriser la contribution au rollup journalier telle que chargée
+        if all(f in instance.__dict__ for f in ('date_paiement', 'mode_paiement', 'montant')):
+            instance._rollup_initial = instance.get_cle_rollup()
+        return instance
+
+    def get_cle_rollup(self):
+        """(jour, mode, montant) de ce paiement dans DailySalesRollup"""
+        return timezone.localtime(self.date_paiement).date(), self.mode_paiement, self.montant
+
     def save(self, *args, **kwargs):
         from django.core.exceptions import ValidationError
         
@@ -214,22 +317,73 @@ class Paiement(models.Model):
             if not hasattr(self, 'utilisateur') and hasattr(self, '_request'):
                 self.utilisateur = self._request.user
         
-        # Si le paiement est marqué comme valide, mettre à jour la commande et la caisse
-        if self.est_valide:
-            # Mettre à jour le statut de la commande
-            self.commande.statut = 'payee'
-            self.commande.caissier = self.utilisateur
-            self.commande.save()
-            
-            # Mettre à jour le solde de la caisse
-            self.caisse.solde_actuel += self.montant
-            self.caisse.save()
+        # Contribution actuelle au rollup journalier (avant changement de date)
+        ancien = None
+        if not self._state.adding:
+            ancien = getattr(self, '_rollup_initial', None)
+            if ancien is None:
+                ancien = Paiement.objects.get(pk=self.pk).get_cle_rollup()
         
         # Mettre à jour la date de paiement
         self.date_paiement = timezone.now()
         
-        # Appeler la méthode save() de la classe parente
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            # Montant déjà crédité en caisse, relu sous verrou: deux validations
+            # simultanées (ou répétées) du même paiement ne créditent qu'une fois
+            deja_credite = Decimal('0.00')
+            if not self._state.adding:
+                deja_credite = Paiement.objects.select_for_update().filter(pk=self.pk).values_list(
+                    'montant_credite', flat=True
+                ).first() or Decimal('0.00')
+            delta_caisse = (self.montant if self.est_valide else Decimal('0.00')) - deja_credite
+            self.montant_credite = deja_credite + delta_caisse
+            
+            # Si le paiement est marqué comme valide, mettre à jour la commande
+            if self.est_valide:
+                self.commande.statut = 'payee'
+                self.commande.caissier = self.utilisateur
+                self.commande.save()
+            
+            # Appeler la méthode save() de la classe parente
+            super().save(*args, **kwargs)
+            
+            # Mettre à jour le solde de la caisse (variation seulement)
+            if delta_caisse:
+                solde = Caisse.appliquer_mouvement(self.caisse_id, delta_caisse)
+                if Paiement.caisse.is_cached(self):
+                    self.caisse.solde_actuel = solde
+            
+            # Journal de caisse: le paiement (ou la correction de son montant)
+            delta_ventes = self.montant - (ancien[2] if ancien else Decimal('0.00'))
+            if delta_ventes:
+                MouvementCaisse.enregistrer(
+                    self.caisse_id, MouvementCaisse.TYPE_PAIEMENT, delta_ventes, paiement_id=self.pk
+                )
+            
+            # Reporter la variation dans le rollup journalier des ventes
+            nouveau = self.get_cle_rollup()
+            if nouveau != ancien:
+                if ancien:
+                    DailySalesRollup.enregistrer(ancien[0], ancien[1], -ancien[2], -1)
+                DailySalesRollup.enregistrer(nouveau[0], nouveau[1], nouveau[2], 1)
+        self._rollup_initial = nouveau
+
+    def delete(self, *args, **kwargs):
+        jour, mode, montant = getattr(self, '_rollup_initial', None) or self.get_cle_rollup()
+        pk = self.pk
+        with transaction.atomic():
+            deja_credite = Paiement.objects.select_for_update().filter(pk=self.pk).values_list(
+                'montant_credite', flat=True
+            ).first()
+            result = super().delete(*args, **kwargs)
+            # Retirer de la caisse ce que ce paiement y avait crédité
+            if deja_credite:
+                solde = Caisse.appliquer_mouvement(self.caisse_id, -deja_credite)
+                if Paiement.caisse.is_cached(self):
+                    self.caisse.solde_actuel = solde
+            MouvementCaisse.enregistrer(self.caisse_id, MouvementCaisse.TYPE_PAIEMENT, -montant, paiement_id=pk)
+            DailySalesRollup.enregistrer(jour, mode, -montant, -1)
+        return result
 
 
 class TypeDepense(models.Model):
@@ -301,6 +455,9 @@ class SortieCaisse(models.Model):
         verbose_name = 'Sortie de caisse'
         verbose_name_plural = 'Sorties de caisse'
         ordering = ['-date_sortie']
+        indexes = [
+            models.Index(fields=['date_sortie'], name='sorties_caisse_date_idx'),
+        ]
         permissions = [
             ('can_register_expense', 'Peut enregistrer une dépense'),
             ('can_view_expense', 'Peut voir les détails des dépenses'),
@@ -309,16 +466,319 @@ class SortieCaisse(models.Model):
     def __str__(self):
         return f'Sortie de caisse #{self.id} - {self.motif} - {self.montant} GNF'
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Mémoriser la contribution au rollup journalier telle que chargée
+        if all(f in instance.__dict__ for f in ('date_sortie', 'montant')):
+            instance._rollup_initial = instance.get_cle_rollup()
+        return instance
+
+    def get_cle_rollup(self):
+        """(jour, montant) de cette sortie dans DailySalesRollup"""
+        return timezone.localtime(self.date_sortie).date(), self.montant
+
     def save(self, *args, **kwargs):
-        # S'assurer qu'une caisse est ouverte
-        if not hasattr(self, 'caisse'):
-            caisse = Caisse.get_caisse_ouverte()
-            if not caisse:
-                raise ValueError('Aucune caisse n\'est ouverte. Veuillez ouvrir une caisse avant d\'enregistrer une sortie.')
-            self.caisse = caisse
+        # Caisse prise sur le pointeur en cache, vérifiée ouverte sous verrou plus bas
+        depuis_pointeur = not self.caisse_id
+        if depuis_pointeur:
+            self.caisse_id = get_caisse_ouverte_id()
         
         # Enregistrer l'utilisateur actuel
         if not hasattr(self, 'utilisateur') and hasattr(self, '_request'):
             self.utilisateur = self._request.user
         
+        ancien = None
+        if not self._state.adding:
+            ancien = getattr(self, '_rollup_initial', None)
+            if ancien is None:
+                ancien = SortieCaisse.objects.get(pk=self.pk).get_cle_rollup()
+        
+        with transaction.atomic():
+            if self._state.adding:
+                self.verrouiller_caisse_ouverte(rafraichir=depuis_pointeur)
+            super().save(*args, **kwargs)
+            
+            # Journal de caisse: la dépense (ou la correction de son montant)
+            delta_depenses = self.montant - (ancien[1] if ancien else Decimal('0.00'))
+            if delta_depenses:
+                MouvementCaisse.enregistrer(
+                    self.caisse_id, MouvementCaisse.TYPE_DEPENSE, -delta_depenses, sortie_id=self.pk
+                )
+            
+            # Reporter la variation dans le rollup journalier des dépenses
+            nouveau = self.get_cle_rollup()
+            if nouveau != ancien:
+                if ancien:
+                    DailySalesRollup.enregistrer(ancien[0], DailySalesRollup.MODE_DEPENSES, depenses=-ancien[1])
+                DailySalesRollup.enregistrer(nouveau[0], DailySalesRollup.MODE_DEPENSES, depenses=nouveau[1])
+        self._rollup_initial = nouveau
+
+    def verrouiller_caisse_ouverte(self, rafraichir=False):
+        """
+        Verrouille la caisse de la sortie en vérifiant qu'elle est toujours
+        ouverte: une fermeture concurrente attend la fin de la transaction ou
+        fait échouer l'enregistrement. Avec rafraichir, un pointeur en cache
+        périmé est relu une fois en base.
+        """
+        caisses = Caisse.objects.select_for_update().filter(est_ouverte=True)
+        if self.caisse_id and caisses.filter(pk=self.caisse_id).exists():
+            return
+        caisse_id = get_caisse_ouverte_id(rafraichir=True) if rafraichir else None
+        if not caisse_id or not caisses.filter(pk=caisse_id).exists():
+            raise ValueError('Aucune caisse n\'est ouverte. Veuillez ouvrir une caisse avant d\'enregistrer une sortie.')
+        self.caisse_id = caisse_id
+
+    def delete(self, *args, **kwargs):
+        jour, montant = getattr(self, '_rollup_initial', None) or self.get_cle_rollup()
+        pk = self.pk
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            MouvementCaisse.enregistrer(self.caisse_id, MouvementCaisse.TYPE_DEPENSE, montant, sortie_id=pk)
+            DailySalesRollup.enregistrer(jour, DailySalesRollup.MODE_DEPENSES, depenses=-montant)
+        return result
+
+
+class MouvementCaisse(models.Model):
+    """
+    Journal de caisse en ajout seul, avec solde courant.
+
+    Une écriture par ouverture, paiement, dépense ou ajout de fond (plus une
+    écriture de correction quand un montant est modifié ou supprimé), écrite
+    dans la même transaction que l'opération. Chaque écriture porte le solde
+    théorique et les cumuls de ventes et de dépenses après l'opération:
+    Caisse.solde_theorique, total_ventes et total_depenses se lisent sur la
+    dernière écriture au lieu de refaire les sommes. Les écritures d'une
+    caisse sont sérialisées par le verrou de sa ligne (select_for_update);
+    la commande verifier_mouvements_caisse recalcule les soldes pour
+    détecter une dérive.
+    """
+    TYPE_OUVERTURE = 'ouverture'
+    TYPE_PAIEMENT = 'paiement'
+    TYPE_DEPENSE = 'depense'
+    TYPE_FOND = 'fond'
+    TYPE_CORRECTION = 'correction'
+    TYPE_CHOICES = [
+        (TYPE_OUVERTURE, 'Ouverture'),
+        (TYPE_PAIEMENT, 'Paiement'),
+        (TYPE_DEPENSE, 'Dépense'),
+        (TYPE_FOND, 'Ajout de fond'),
+        (TYPE_CORRECTION, 'Correction'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    caisse = models.ForeignKey(
+        Caisse,
+        on_delete=models.CASCADE,
+        related_name='mouvements',
+        verbose_name='Caisse'
+    )
+    type_mouvement = models.CharField(max_length=20, choices=TYPE_CHOICES, verbose_name='Type')
+    # Références conservées même si le paiement ou la dépense est supprimé
+    paiement = models.ForeignKey(
+        Paiement,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Paiement'
+    )
+    sortie = models.ForeignKey(
+        SortieCaisse,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Sortie de caisse'
+    )
+    montant = models.DecimalField(max_digits=12, decimal_places=2, verbose_name='Montant (signé)')
+    solde_apres = models.DecimalField(max_digits=14, decimal_places=2, verbose_name='Solde théorique après')
+    cumul_ventes = models.DecimalField(max_digits=14, decimal_places=2, verbose_name='Cumul des ventes')
+    cumul_depenses = models.DecimalField(max_digits=14, decimal_places=2, verbose_name='Cumul des dépenses')
+    date = models.DateTimeField(default=timezone.now, verbose_name='Date')
+
+    class Meta:
+        db_table = 'mouvements_caisse'
+        verbose_name = 'Mouvement de caisse'
+        verbose_name_plural = 'Mouvements de caisse'
+        ordering = ['id']
+
+    def __str__(self):
+        return f"Caisse {self.caisse_id} - {self.get_type_mouvement_display()} {self.montant} GNF (solde {self.solde_apres})"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Le journal de caisse est en ajout seul.")
         super().save(*args, **kwargs)
+
+    @staticmethod
+    def calculer_cumuls(precedent, type_mouvement, montant):
+        """(solde, cumul ventes, cumul dépenses) après une écriture, à partir des cumuls précédents"""
+        solde, ventes, depenses = precedent
+        solde += montant
+        if type_mouvement == MouvementCaisse.TYPE_PAIEMENT:
+            ventes += montant
+        elif type_mouvement == MouvementCaisse.TYPE_DEPENSE:
+            depenses -= montant
+        return solde, ventes, depenses
+
+    @classmethod
+    def enregistrer(cls, caisse_id, type_mouvement, montant, paiement_id=None, sortie_id=None, date=None):
+        """
+        Ajoute une écriture (montant signé: négatif pour une dépense) et retourne
+        le nouveau solde théorique.
+        """
+        zero = Decimal('0.00')
+        with transaction.atomic(savepoint=False):
+            # Verrou de la caisse: une seule écriture à la fois par caisse
+            Caisse.objects.select_for_update().filter(pk=caisse_id).values_list('pk', flat=True).get()
+            precedent = cls.objects.filter(caisse_id=caisse_id).order_by('-id').values_list(
+                'solde_apres', 'cumul_ventes', 'cumul_depenses'
+            ).first() or (zero, zero, zero)
+            solde, ventes, depenses = cls.calculer_cumuls(precedent, type_mouvement, montant)
+            cls.objects.create(
+                caisse_id=caisse_id,
+                type_mouvement=type_mouvement,
+                paiement_id=paiement_id,
+                sortie_id=sortie_id,
+                montant=montant,
+                solde_apres=solde,
+                cumul_ventes=ventes,
+                cumul_depenses=depenses,
+                date=date or timezone.now()
+            )
+        return solde
+
+    @classmethod
+    def enregistrer_groupe(cls, caisse_id, type_mouvement, operations, date=None):
+        """
+        Ajoute une écriture par opération [(montant, paiement_id, sortie_id), ...]
+        avec un seul verrou et un seul bulk_create; retourne le nouveau solde théorique.
+        """
+        zero = Decimal('0.00')
+        date = date or timezone.now()
+        with transaction.atomic(savepoint=False):
+            Caisse.objects.select_for_update().filter(pk=caisse_id).values_list('pk', flat=True).get()
+            cumuls = cls.objects.filter(caisse_id=caisse_id).order_by('-id').values_list(
+                'solde_apres', 'cumul_ventes', 'cumul_depenses'
+            ).first() or (zero, zero, zero)
+            mouvements = []
+            for montant, paiement_id, sortie_id in operations:
+                cumuls = cls.calculer_cumuls(cumuls, type_mouvement, montant)
+                mouvements.append(cls(
+                    caisse_id=caisse_id,
+                    type_mouvement=type_mouvement,
+                    paiement_id=paiement_id,
+                    sortie_id=sortie_id,
+                    montant=montant,
+                    solde_apres=cumuls[0],
+                    cumul_ventes=cumuls[1],
+                    cumul_depenses=cumuls[2],
+                    date=date
+                ))
+            cls.objects.bulk_create(mouvements)
+        return cumuls[0]
+
+
+class RapportZ(models.Model):
+    """
+    Rapport Z d'une caisse: instantané figé à la fermeture.
+
+    Totaux et nombres de paiements par mode, de dépenses par type, soldes et
+    écart théorique/réel, durée de la session. Les pages de caisses fermées le
+    lisent par la clé primaire (celle de la caisse) au lieu de regrouper à
+    nouveau tous les paiements et dépenses. Généré par Caisse.save() lors de
+    la fermeture, jamais modifié ensuite.
+    """
+    caisse = models.OneToOneField(
+        Caisse,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='rapport_z',
+        verbose_name='Caisse'
+    )
+    date_ouverture = models.DateTimeField(verbose_name='Ouverture')
+    date_fermeture = models.DateTimeField(verbose_name='Fermeture')
+    solde_initial = models.DecimalField(max_digits=14, decimal_places=2, verbose_name='Solde initial')
+    solde_theorique = models.DecimalField(max_digits=14, decimal_places=2, verbose_name='Solde théorique')
+    solde_reel = models.DecimalField(max_digits=14, decimal_places=2, verbose_name='Solde réel')
+    difference = models.DecimalField(max_digits=14, decimal_places=2, verbose_name='Écart (réel - théorique)')
+    total_ventes = models.DecimalField(max_digits=14, decimal_places=2, verbose_name='Total des ventes')
+    nombre_paiements = models.PositiveIntegerField(verbose_name='Nombre de paiements')
+    total_depenses = models.DecimalField(max_digits=14, decimal_places=2, verbose_name='Total des dépenses')
+    nombre_sorties = models.PositiveIntegerField(verbose_name='Nombre de sorties')
+    # [{'mode', 'libelle', 'nombre', 'total'}, ...] et [{'type', 'nombre', 'total'}, ...], par total décroissant
+    ventes_par_mode = models.JSONField(default=list, encoder=DjangoJSONEncoder, verbose_name='Ventes par mode')
+    depenses_par_type = models.JSONField(default=list, encoder=DjangoJSONEncoder, verbose_name='Dépenses par type')
+    date_creation = models.DateTimeField(auto_now_add=True, verbose_name='Date du rapport')
+
+    class Meta:
+        db_table = 'rapports_z'
+        verbose_name = 'Rapport Z'
+        verbose_name_plural = 'Rapports Z'
+
+    def __str__(self):
+        return f"Rapport Z - {self.caisse_id} du {timezone.localtime(self.date_fermeture):%d/%m/%Y %H:%M}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Un rapport Z ne peut pas être modifié.")
+        super().save(*args, **kwargs)
+
+    @property
+    def duree(self):
+        """Durée de la session en secondes"""
+        return int((self.date_fermeture - self.date_ouverture).total_seconds())
+
+    @staticmethod
+    def calculer(caisse):
+        """Totaux de la caisse: ventes par mode, dépenses par type, soldes et écart"""
+        libelles = dict(Paiement.MODE_PAIEMENT_CHOICES)
+        ventes_par_mode = [
+            {
+                'mode': ligne['mode_paiement'],
+                'libelle': libelles.get(ligne['mode_paiement'], ligne['mode_paiement']),
+                'nombre': ligne['nombre'],
+                'total': ligne['total'],
+            }
+            for ligne in caisse.paiements.order_by().values('mode_paiement').annotate(
+                nombre=Count('id'), total=Sum('montant')
+            ).order_by('-total')
+        ]
+        depenses_par_type = [
+            {'type': ligne['type_depense__nom'], 'nombre': ligne['nombre'], 'total': ligne['total']}
+            for ligne in caisse.sorties.order_by().values('type_depense__nom').annotate(
+                nombre=Count('id'), total=Sum('montant')
+            ).order_by('-total')
+        ]
+        solde_theorique = caisse.solde_theorique
+        return {
+            'date_ouverture': caisse.date_ouverture,
+            'date_fermeture': caisse.date_fermeture or timezone.now(),
+            'solde_initial': caisse.solde_initial,
+            'solde_theorique': solde_theorique,
+            'solde_reel': caisse.solde_actuel,
+            'difference': caisse.solde_actuel - solde_theorique,
+            'total_ventes': sum((ligne['total'] for ligne in ventes_par_mode), Decimal('0.00')),
+            'nombre_paiements': sum(ligne['nombre'] for ligne in ventes_par_mode),
+            'total_depenses': sum((ligne['total'] for ligne in depenses_par_type), Decimal('0.00')),
+            'nombre_sorties': sum(ligne['nombre'] for ligne in depenses_par_type),
+            'ventes_par_mode': ventes_par_mode,
+            'depenses_par_type': depenses_par_type,
+        }
+
+    @classmethod
+    def generer(cls, caisse):
+        """
+        Crée le rapport Z de la caisse (une seule fois, sous le verrou de la
+        caisse). Soldes et cumuls sont relus en base sous ce verrou, pas pris
+        sur l'instance passée qui peut être périmée.
+        """
+        with transaction.atomic(savepoint=False):
+            caisse = Caisse.objects.select_for_update().get(pk=caisse.pk)
+            rapport = cls.objects.filter(caisse_id=caisse.pk).first()
+            if rapport is None:
+                rapport = cls.objects.create(caisse=caisse, **cls.calculer(caisse))
+        return rapport
@@ -0,0 +1,112 @@
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from apps.dashboard.models import DailySalesRollup
+from apps.orders.models import Commande, CommandeEvent
+from apps.tables.models import TableRestaurant
+
+from .caisse_ouverte import get_caisse_ouverte_id
+from .models import Caisse, MouvementCaisse, Paiement
+
+
+def regler_commandes(commande_ids, mode_paiement, utilisateur):
+    """
+    Encaisse en une fois plusieurs commandes servies, avec un paiement validé
+    par commande au montant de la commande.
+
+    Tout le lot tient dans une transaction et un nombre constant de requêtes:
+    verrou et lecture des commandes, un bulk_create des paiements, un seul
+    update() des commandes, une transition groupée des tables, une variation
+    du solde de caisse, les écritures du journal de caisse et des événements
+    de commandes, et une mise à jour du rollup journalier. Les commandes déjà
+    payées, non servies ou introuvables sont ignorées, y compris une commande
+    réglée par un paiement unitaire concurrent entre la lecture et l'insertion.
+
+    Retourne (commandes réglées [(id, numéro, montant), ...], total encaissé).
+    """
+    if not isinstance(mode_paiement, str) or mode_paiement not in dict(Paiement.MODE_PAIEMENT_CHOICES):
+        raise ValidationError("Mode de paiement invalide.")
+
+    now = timezone.now()
+    with transaction.atomic():
+        caisses = Caisse.objects.select_for_update().filter(est_ouverte=True)
+        caisse_id = get_caisse_ouverte_id()
+        if not caisse_id or not caisses.filter(pk=caisse_id).exists():
+            # Pointeur en cache périmé (caisse ouverte ou fermée par un autre processus)
+            caisse_id = get_caisse_ouverte_id(rafraichir=True)
+            if not caisse_id or not caisses.filter(pk=caisse_id).exists():
+                raise ValidationError("Aucune caisse n'est ouverte. Veuillez ouvrir une caisse avant d'enregistrer un paiement.")
+
+        commandes = list(
+            Commande.objects.select_for_update().filter(id__in=commande_ids, statut='servie').order_by('id').values_list(
+                'id', 'numero_commande', 'table_id', 'montant_total'
+            )
+        )
+        deja_payees = set(
+            Paiement.objects.filter(commande_id__in=[commande[0] for commande in commandes]).values_list('commande_id', flat=True)
+        )
+        for tentative in range(2):
+            commandes = [commande for commande in commandes if commande[0] not in deja_payees]
+            if not commandes:
+                return [], Decimal('0.00')
+            try:
+                with transaction.atomic():
+                    Paiement.objects.bulk_create([
+                        Paiement(
+                            commande_id=commande_id,
+                            caisse_id=caisse_id,
+                            montant=montant,
+                            montant_credite=montant,
+                            mode_paiement=mode_paiement,
+                            date_paiement=now,
+                            utilisateur=utilisateur,
+                            est_valide=True
+                        )
+                        for commande_id, _, _, montant in commandes
+                    ])
+                break
+            except IntegrityError:
+                # Paiement unitaire inséré entre-temps (un seul paiement par
+                # commande): relu par une lecture verrouillante, qui voit les
+                # lignes validées, et retiré du lot
+                if tentative:
+                    raise ValidationError(
+                        "Un paiement est en cours sur ces commandes. Veuillez réessayer."
+                    )
+                deja_payees = set(
+                    Paiement.objects.select_for_update().filter(
+                        commande_id__in=[commande[0] for commande in commandes]
+                    ).values_list('commande_id', flat=True)
+                )
+
+        ids = [commande_id for commande_id, _, _, _ in commandes]
+        total = sum((montant for _, _, _, montant in commandes), Decimal('0.00'))
+
+        # Identifiants relus: MySQL ne les renvoie pas après un bulk_create
+        paiement_ids = dict(Paiement.objects.filter(commande_id__in=ids).values_list('commande_id', 'id'))
+
+        Commande.objects.filter(id__in=ids).update(
+            statut='payee',
+            date_paiement=now,
+            caissier=utilisateur,
+            updated_at=now
+        )
+        TableRestaurant.transition_commande({table_id for _, _, table_id, _ in commandes}, 'payee')
+        CommandeEvent.enregistrer_groupe(
+            [(commande_id, table_id) for commande_id, _, table_id, _ in commandes], 'servie', 'payee', date=now
+        )
+
+        Caisse.appliquer_mouvement(caisse_id, total)
+        MouvementCaisse.enregistrer_groupe(
+            caisse_id,
+            MouvementCaisse.TYPE_PAIEMENT,
+            [(montant, paiement_ids[commande_id], None) for commande_id, _, _, montant in commandes],
+            date=now
+        )
+
+        DailySalesRollup.enregistrer(timezone.localtime(now).date(), mode_paiement, total, len(commandes))
+
+    return [(commande_id, numero, montant) for commande_id, numero, _, montant in commandes], total
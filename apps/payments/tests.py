@@ -0,0 +1,217 @@
+import random
+import threading
+import time
+from decimal import Decimal
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, close_old_connections, connection
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.authentication.models import CustomUser
+from apps.orders.models import Commande
+from apps.tables.models import TableRestaurant
+
+from .caisse_ouverte import get_caisse_ouverte_id
+from .models import Caisse, MouvementCaisse, Paiement, RapportZ, SortieCaisse, TypeDepense
+
+
+class FermetureCaisseTests(TestCase):
+    """Rapport Z figé à la fermeture de la caisse"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(login='caissier', password='secret', role='Rcaissier')
+        self.caisse = Caisse.objects.create(solde_initial=Decimal('100'), utilisateur_ouverture=self.user)
+
+    def test_fermeture_depuis_une_instance_perimee(self):
+        perimee = Caisse.objects.get(pk=self.caisse.pk)
+        # Encaissement validé après la lecture de l'instance
+        Caisse.appliquer_mouvement(self.caisse.pk, Decimal('500'))
+        MouvementCaisse.enregistrer(self.caisse.pk, MouvementCaisse.TYPE_PAIEMENT, Decimal('500'))
+
+        perimee.est_ouverte = False
+        perimee.date_fermeture = timezone.now()
+        perimee.utilisateur_fermeture = self.user
+        perimee.save()
+
+        self.caisse.refresh_from_db()
+        self.assertEqual(self.caisse.solde_actuel, Decimal('600'))
+        rapport = RapportZ.objects.get(caisse=self.caisse)
+        self.assertEqual(rapport.solde_reel, Decimal('600'))
+        self.assertEqual(rapport.solde_theorique, Decimal('600'))
+        self.assertEqual(rapport.difference, Decimal('0'))
+
+    def test_fermeture_ne_modifie_pas_le_solde_initial(self):
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse('payments:fermer_caisse', args=[self.caisse.pk]),
+            {'solde_initial': '900', 'notes_fermeture': 'RAS'}
+        )
+        self.assertEqual(response.status_code, 302)
+
+        self.caisse.refresh_from_db()
+        self.assertFalse(self.caisse.est_ouverte)
+        self.assertEqual(self.caisse.solde_initial, Decimal('100'))
+        self.assertEqual(self.caisse.notes_fermeture, 'RAS')
+        rapport = RapportZ.objects.get(caisse=self.caisse)
+        self.assertEqual(rapport.solde_theorique, Decimal('100'))
+        self.assertEqual(rapport.difference, Decimal('0'))
+        # Journal et soldes de la caisse toujours concordants
+        call_command('verifier_mouvements_caisse', caisse=self.caisse.pk, stdout=StringIO())
+
+
+class CaisseOuverteTests(TestCase):
+    """Pointeur en cache vers la caisse ouverte"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(login='caissier', password='secret', role='Rcaissier')
+        self.type_depense = TypeDepense.objects.create(nom='Achats')
+
+    def sortie(self, **kwargs):
+        return SortieCaisse(
+            type_depense=self.type_depense, montant=Decimal('20'), motif='Gaz', utilisateur=self.user, **kwargs
+        )
+
+    def test_sortie_avec_pointeur_aucune_caisse_perime(self):
+        self.assertIsNone(get_caisse_ouverte_id())
+        # Ouverture non propagée au cache (invalidation jamais exécutée ici,
+        # comme dans un autre processus avec un cache local)
+        caisse = Caisse.objects.create(solde_initial=Decimal('100'), utilisateur_ouverture=self.user)
+
+        sortie = self.sortie()
+        sortie.save()
+        self.assertEqual(sortie.caisse_id, caisse.pk)
+
+    def test_sortie_sur_une_caisse_fermee(self):
+        caisse = Caisse.objects.create(solde_initial=Decimal('100'), utilisateur_ouverture=self.user)
+        self.assertEqual(get_caisse_ouverte_id(), caisse.pk)
+        Caisse.objects.filter(pk=caisse.pk).update(est_ouverte=False)
+
+        with self.assertRaises(ValueError):
+            self.sortie().save()
+        with self.assertRaises(ValueError):
+            self.sortie(caisse=caisse).save()
+        self.assertFalse(SortieCaisse.objects.exists())
+
+
+class SoldeCaisseTests(TestCase):
+    """Solde de caisse crédité une seule fois par paiement validé"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(login='caissier', password='secret', role='Rcaissier')
+        self.caisse = Caisse.objects.create(solde_initial=Decimal('100'), utilisateur_ouverture=self.user)
+        self.table = TableRestaurant.objects.create(numero_table='T1', nombre_places=4)
+
+    def test_nouvel_enregistrement_d_un_paiement_valide(self):
+        commande = Commande.objects.create(table=self.table, montant_total=Decimal('500'))
+        paiement = Paiement.objects.create(
+            commande=commande, montant=Decimal('500'), mode_paiement='especes',
+            caisse=self.caisse, utilisateur=self.user, est_valide=True
+        )
+        for _ in range(2):
+            paiement.save()
+            Paiement.objects.get(pk=paiement.pk).save()
+
+        self.caisse.refresh_from_db()
+        self.assertEqual(self.caisse.solde_actuel, Decimal('600'))
+        self.assertEqual(Paiement.objects.get(pk=paiement.pk).montant_credite, Decimal('500'))
+        self.assertEqual(self.caisse.solde_theorique, Decimal('600'))
+        self.assertEqual(self.caisse.mouvements.filter(type_mouvement=MouvementCaisse.TYPE_PAIEMENT).count(), 1)
+
+
+class CaisseConcurrenceTests(TransactionTestCase):
+    """Validations et dépenses simultanées sur une même caisse"""
+
+    THREADS = 4
+    OPERATIONS = 10
+    MAX_TENTATIVES = 50
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(login='caissier', password='secret', role='Rcaissier')
+        self.caisse = Caisse.objects.create(solde_initial=Decimal('1000'), utilisateur_ouverture=self.user)
+
+    def executer(self, taches, erreurs, depart):
+        """Corps d'un thread: exécute chaque tâche, reprise si la base est verrouillée"""
+        try:
+            depart.wait()
+            for tache in taches:
+                for tentative in range(1, self.MAX_TENTATIVES + 1):
+                    try:
+                        tache()
+                        break
+                    except OperationalError:
+                        if tentative == self.MAX_TENTATIVES:
+                            raise
+                        time.sleep(random.uniform(0, 0.01 * tentative))
+        except Exception as e:
+            erreurs.append(e)
+        finally:
+            close_old_connections()
+            connection.close()
+
+    def en_parallele(self, taches):
+        erreurs = []
+        depart = threading.Barrier(self.THREADS)
+        threads = [
+            threading.Thread(target=self.executer, args=(taches[i::self.THREADS], erreurs, depart))
+            for i in range(self.THREADS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(erreurs, [])
+
+    def assertJournalCoherent(self):
+        call_command('verifier_mouvements_caisse', caisse=self.caisse.pk, stdout=StringIO())
+
+    def test_validations_concurrentes(self):
+        table = TableRestaurant.objects.create(numero_table='T1', nombre_places=4)
+        paiements = [
+            Paiement.objects.create(
+                commande=Commande.objects.create(table=table, montant_total=Decimal(100 + i)),
+                montant=Decimal(100 + i), mode_paiement='especes', caisse=self.caisse, utilisateur=self.user
+            )
+            for i in range(self.OPERATIONS)
+        ]
+
+        # Deux instances chargées avant les threads par paiement: chaque
+        # validation part d'une lecture où rien n'est encore crédité
+        taches = []
+        for paiement in paiements * 2:
+            instance = Paiement.objects.select_related('commande', 'caisse', 'utilisateur').get(pk=paiement.pk)
+            instance.est_valide = True
+            taches.append(instance.save)
+        random.shuffle(taches)
+        self.en_parallele(taches)
+
+        total = sum(paiement.montant for paiement in paiements)
+        self.caisse.refresh_from_db()
+        self.assertEqual(self.caisse.solde_actuel, Decimal('1000') + total)
+        self.assertEqual(self.caisse.solde_theorique, Decimal('1000') + total)
+        # Chaque paiement crédité exactement une fois
+        self.assertFalse(Paiement.objects.exclude(montant_credite=F('montant')).exists())
+        self.assertJournalCoherent()
+
+    def test_depenses_concurrentes(self):
+        type_depense = TypeDepense.objects.create(nom='Achats')
+
+        def depenser(montant):
+            SortieCaisse.objects.create(
+                caisse=self.caisse, type_depense=type_depense, montant=montant, motif='Gaz', utilisateur=self.user
+            )
+
+        montants = [Decimal(10 + i) for i in range(self.OPERATIONS)]
+        self.en_parallele([lambda montant=montant: depenser(montant) for montant in montants])
+
+        self.caisse.refresh_from_db()
+        self.assertEqual(SortieCaisse.objects.filter(caisse=self.caisse).count(), self.OPERATIONS)
+        self.assertEqual(self.caisse.total_depenses, sum(montants))
+        self.assertEqual(self.caisse.solde_theorique, Decimal('1000') - sum(montants))
+        self.assertJournalCoherent()
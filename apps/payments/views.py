@@ -1,6 +1,6 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
-from django.db import transaction
+from django.db import IntegrityError, transaction
 from django.utils import timezone
 from django.db.models import Sum, Q, F, Count
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
@@ -12,14 +12,17 @@ from django.views.decorators.csrf import csrf_protect
 from django.views.decorators.http import require_http_methods
 from django.utils.decorators import method_decorator
 from django.core.exceptions import ValidationError
+from datetime import timedelta
 from decimal import Decimal
 
 from apps.authentication.decorators import role_required
+from apps.core.periodes import debut_jour, lire_date
 from apps.orders.models import Commande
-from .models import Caisse, Paiement, TypeDepense, SortieCaisse
+from .models import Caisse, Paiement, TypeDepense, SortieCaisse, MouvementCaisse, RapportZ
 from .forms import (
     CaisseForm, PaiementForm, TypeDepenseForm, 
-    SortieCaisseForm, FilterCaisseForm, FilterPaiementForm, FilterSortieCaisseForm
+    SortieCaisseForm, FilterCaisseForm, FilterPaiementForm, FilterSortieCaisseForm,
+    FermetureCaisseForm
 )
 
 
@@ -68,13 +71,22 @@ class CaisseCreateView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
         form.instance.utilisateur_ouverture = self.request.user
         form.instance.est_ouverte = True
         
-        # Vérifier qu'aucune caisse n'est déjà ouverte
+        # Vérifier qu'aucune caisse n'est déjà ouverte (la contrainte
+        # caisse_une_seule_ouverte refuse aussi deux ouvertures simultanées)
+        erreur = 'Une caisse est déjà ouverte. Veuillez d\'abord la fermer.'
         if Caisse.objects.filter(est_ouverte=True).exists():
-            form.add_error(None, 'Une caisse est déjà ouverte. Veuillez d\'abord la fermer.')
+            form.add_error(None, erreur)
+            return self.form_invalid(form)
+        
+        try:
+            with transaction.atomic():
+                response = super().form_valid(form)
+        except IntegrityError:
+            form.add_error(None, erreur)
             return self.form_invalid(form)
         
         messages.success(self.request, 'La caisse a été ouverte avec succès.')
-        return super().form_valid(form)
+        return response
     
     def get_success_url(self):
         return reverse('payments:dashboard_caisse')
@@ -84,7 +96,7 @@ def fermer_caisse(request, pk):
     if hasattr(request.user, 'role') and request.user.role == 'Rcomptable':
         messages.error(request, "🚫 Accès refusé : Vous n'êtes pas autorisé à effectuer cette action en tant que comptable.")
         return render(request, 'payments/fermer_caisse.html', {
-            'form': CaisseForm(),
+            'form': FermetureCaisseForm(),
             'caisse': None,
             'error': "Action non autorisée pour les comptables"
         })
@@ -94,26 +106,36 @@ def fermer_caisse(request, pk):
     except Caisse.DoesNotExist:
         messages.error(request, "❌ Caisse introuvable ou déjà fermée.")
         return render(request, 'payments/fermer_caisse.html', {
-            'form': CaisseForm(),
+            'form': FermetureCaisseForm(),
             'caisse': None,
             'error': "Caisse introuvable ou déjà fermée"
         })
     
     if request.method == 'POST':
-        form = CaisseForm(request.POST, instance=caisse)
-        if form.is_valid():
-            with transaction.atomic():
+        with transaction.atomic():
+            # Ligne verrouillée et relue: aucun encaissement ne peut modifier le
+            # solde entre la lecture et la fermeture
+            caisse = Caisse.objects.select_for_update().filter(pk=pk, est_ouverte=True).first()
+            if caisse is None:
+                messages.error(request, "❌ Caisse introuvable ou déjà fermée.")
+                return redirect('payments:dashboard_caisse')
+            form = FermetureCaisseForm(request.POST, instance=caisse)
+            if form.is_valid():
                 caisse = form.save(commit=False)
                 caisse.est_ouverte = False
                 caisse.date_fermeture = timezone.now()
                 caisse.utilisateur_fermeture = request.user
-                caisse.save()
+                # Ni solde_actuel ni solde_initial ne sont réécrits: ils ne changent
+                # qu'avec une écriture du journal, sinon solde_theorique et le
+                # rapport Z divergeraient
+                caisse.save(update_fields=[
+                    'notes_fermeture', 'est_ouverte', 'date_fermeture', 'utilisateur_fermeture'
+                ])
                 messages.success(request, "✅ Caisse fermée avec succès !")
                 return redirect('payments:dashboard_caisse')
-        else:
-            messages.error(request, "❌ Erreur lors de la fermeture de la caisse. Vérifiez les données saisies.")
+        messages.error(request, "❌ Erreur lors de la fermeture de la caisse. Vérifiez les données saisies.")
     else:
-        form = CaisseForm(instance=caisse)
+        form = FermetureCaisseForm(instance=caisse)
     
     return render(request, 'payments/fermer_caisse.html', {
         'form': form,
@@ -126,27 +148,21 @@ class CaisseDetailView(LoginRequiredMixin, DetailView):
     template_name = 'payments/caisse_detail.html'
     context_object_name = 'caisse'
     
+    def get_queryset(self):
+        return super().get_queryset().select_related('rapport_z')
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        caisse = self.get_object()
-        
-        # Statistiques des paiements par mode de paiement
-        paiements_par_mode = (
-            caisse.paiements.values('mode_paiement')
-            .annotate(total=Sum('montant'))
-            .order_by('-total')
-        )
+        caisse = self.object
         
-        # Dépenses par type
-        depenses_par_type = (
-            caisse.sorties.values('type_depense__nom')
-            .annotate(total=Sum('montant'))
-            .order_by('-total')
-        )
+        # Caisse fermée: rapport Z figé à la clôture; caisse ouverte: totaux en cours
+        try:
+            rapport = caisse.rapport_z
+        except RapportZ.DoesNotExist:
+            rapport = RapportZ(caisse=caisse, **RapportZ.calculer(caisse))
         
         context.update({
-            'paiements_par_mode': paiements_par_mode,
-            'depenses_par_type': depenses_par_type,
+            'rapport': rapport,
             'paiements': caisse.paiements.select_related('commande', 'utilisateur').order_by('-date_paiement'),
             'sorties': caisse.sorties.select_related('type_depense', 'utilisateur').order_by('-date_sortie'),
         })
@@ -161,23 +177,23 @@ class CaisseListView(LoginRequiredMixin, ListView):
     
     def get_queryset(self):
         queryset = super().get_queryset().select_related(
-            'utilisateur_ouverture', 'utilisateur_fermeture'
+            'utilisateur_ouverture', 'utilisateur_fermeture', 'rapport_z'
         ).order_by('-date_ouverture')
         
         # Filtrage par date
-        date_debut = self.request.GET.get('date_debut')
-        date_fin = self.request.GET.get('date_fin')
+        date_debut = lire_date(self.request.GET.get('date_debut'))
+        date_fin = lire_date(self.request.GET.get('date_fin'))
         
         if date_debut:
-            queryset = queryset.filter(date_ouverture__date__gte=date_debut)
+            queryset = queryset.filter(date_ouverture__gte=debut_jour(date_debut))
         if date_fin:
-            queryset = queryset.filter(date_ouverture__date__lte=date_fin)
+            queryset = queryset.filter(date_ouverture__lt=debut_jour(date_fin + timedelta(days=1)))
             
         return queryset
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['filter_form'] = FilterCaisseForm(self.request.GET or None)
+        context['filter_form'] = FilterFermetureCaisseForm(self.request.GET or None)
         return context
 
 
@@ -257,14 +273,14 @@ class PaiementListView(LoginRequiredMixin, ListView):
         ).order_by('-date_paiement')
         
         # Filtrage par date
-        date_debut = self.request.GET.get('date_debut')
-        date_fin = self.request.GET.get('date_fin')
+        date_debut = lire_date(self.request.GET.get('date_debut'))
+        date_fin = lire_date(self.request.GET.get('date_fin'))
         mode_paiement = self.request.GET.get('mode_paiement')
         
         if date_debut:
-            queryset = queryset.filter(date_paiement__date__gte=date_debut)
+            queryset = queryset.filter(date_paiement__gte=debut_jour(date_debut))
         if date_fin:
-            queryset = queryset.filter(date_paiement__date__lte=date_fin)
+            queryset = queryset.filter(date_paiement__lt=debut_jour(date_fin + timedelta(days=1)))
         if mode_paiement:
             queryset = queryset.filter(mode_paiement=mode_paiement)
             
@@ -384,8 +400,14 @@ class SortieCaisseCreateView(LoginRequiredMixin, CreateView):
         form.instance.caisse = caisse
         form.instance.utilisateur = self.request.user
         
+        try:
+            response = super().form_valid(form)
+        except ValueError as e:
+            # Caisse fermée entre la vérification et l'enregistrement
+            form.add_error(None, str(e))
+            return self.form_invalid(form)
         messages.success(self.request, 'La sortie de caisse a été enregistrée avec succès.')
-        return super().form_valid(form)
+        return response
     
     def get_success_url(self):
         return reverse('payments:detail_sortie', kwargs={'pk': self.object.pk})
@@ -432,15 +454,15 @@ class SortieCaisseListView(LoginRequiredMixin, ListView):
         
         # Filtrage
         type_depense = self.request.GET.get('type_depense')
-        date_debut = self.request.GET.get('date_debut')
-        date_fin = self.request.GET.get('date_fin')
+        date_debut = lire_date(self.request.GET.get('date_debut'))
+        date_fin = lire_date(self.request.GET.get('date_fin'))
         
         if type_depense:
             queryset = queryset.filter(type_depense_id=type_depense)
         if date_debut:
-            queryset = queryset.filter(date_sortie__date__gte=date_debut)
+            queryset = queryset.filter(date_sortie__gte=debut_jour(date_debut))
         if date_fin:
-            queryset = queryset.filter(date_sortie__date__lte=date_fin)
+            queryset = queryset.filter(date_sortie__lt=debut_jour(date_fin + timedelta(days=1)))
             
         return queryset
     
@@ -463,7 +485,7 @@ class SortieCaisseListView(LoginRequiredMixin, ListView):
             'total_sorties': total_sorties,
             'stats_depenses': stats_depenses,
             'types_depense': TypeDepense.objects.all(),
-            'filter_form': FilterSortieCaisseForm(self.request.GET or None),
+            'filter_form': FilterSortieFermetureCaisseForm(self.request.GET or None),
         })
         return context
 
@@ -493,23 +515,23 @@ def ajouter_fond_caisse(request):
         
         caisse = Caisse.get_caisse_ouverte()
         if caisse:
-            caisse.solde_initial += montant
-            caisse.solde_actuel += montant
-            caisse.save()
-            
-            # Enregistrer une sortie de caisse pour le fond de caisse
-            type_fond, _ = TypeDepense.objects.get_or_create(
-                nom='Fond de caisse',
-                defaults={'description': 'Fond de caisse initial et ajouts'}
-            )
-            
-            SortieCaisse.objects.create(
-                caisse=caisse,
-                type_depense=type_fond,
-                montant=montant,
-                motif=f'Ajout de fonds par {request.user.get_full_name()}',
-                utilisateur=request.user
-            )
+            with transaction.atomic():
+                caisse.solde_actuel = Caisse.appliquer_mouvement(caisse.pk, montant, fond=True)
+                MouvementCaisse.enregistrer(caisse.pk, MouvementCaisse.TYPE_FOND, montant)
+                
+                # Enregistrer une sortie de caisse pour le fond de caisse
+                type_fond, _ = TypeDepense.objects.get_or_create(
+                    nom='Fond de caisse',
+                    defaults={'description': 'Fond de caisse initial et ajouts'}
+                )
+                
+                SortieCaisse.objects.create(
+                    caisse=caisse,
+                    type_depense=type_fond,
+                    montant=montant,
+                    motif=f'Ajout de fonds par {request.user.login}',
+                    utilisateur=request.user
+                )
             
             return JsonResponse({
                 'success': True,
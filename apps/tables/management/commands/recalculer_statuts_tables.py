@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from apps.tables.models import TableRestaurant
+
+
+class Command(BaseCommand):
+    help = 'Recalcule le statut de chaque table à partir de ses commandes (réparation)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'table_ids',
+            nargs='*',
+            type=int,
+            help='Identifiants des tables à recalculer (toutes par défaut)'
+        )
+
+    def handle(self, *args, **options):
+        tables = TableRestaurant.objects.all()
+        if options['table_ids']:
+            tables = tables.filter(pk__in=options['table_ids'])
+
+        # Même expression que TableRestaurant.transition_commande()
+        statut_calcule = TableRestaurant.valeurs_depuis_commandes()['current_status']
+        corriges = 0
+        for numero, ancien_statut, nouveau_statut in tables.annotate(statut_calcule=statut_calcule).values_list(
+            'numero_table', 'current_status', 'statut_calcule'
+        ):
+            if nouveau_statut != ancien_statut:
+                corriges += 1
+                self.stdout.write(f'Table {numero}: {ancien_statut} -> {nouveau_statut}')
+        total = TableRestaurant.recalculer_statuts(tables)
+
+        self.stdout.write(self.style.SUCCESS(f'{corriges} table(s) corrigée(s) sur {total}'))
@@ -118,22 +118,80 @@ class TableRestaurant(models.Model):
     def get_last_order(self):
         return self.commandes.first()
 
+    @classmethod
+    def transition_commande(cls, table_ids, statut_commande):
+        """
+        Fait évoluer current_status à partir de la transition d'une commande,
+        sans relire les commandes de la table ni réécrire toute la ligne.
+
+        statut_commande est le nouveau statut de la commande, ou None si la
+        commande a été supprimée.
+        """
+        from apps.orders.models import Commande
+
+        if isinstance(table_ids, int):
+            table_ids = [table_ids]
+        tables = cls.objects.filter(pk__in=table_ids)
+        now = timezone.now()
+
+        if statut_commande == 'en_attente':
+            # Nouvelle commande: c'est la plus récente de la table
+            return tables.update(current_status='commande_en_attente', updated_at=now)
+
+        if statut_commande == 'servie':
+            # La table reste 'en attente' tant qu'une autre commande attend
+            en_attente = Commande.objects.filter(table=models.OuterRef('pk'), statut='en_attente')
+            return tables.filter(~models.Exists(en_attente)).update(
+                current_status='commande_servie',
+                updated_at=now
+            )
+
+        # Commande payée ou supprimée: le statut suit les commandes restantes
+        return tables.update(**cls.valeurs_depuis_commandes(), updated_at=now)
+
+    @staticmethod
+    def valeurs_depuis_commandes():
+        """
+        Expressions de current_status et nombre_clients_actuels calculées depuis
+        les commandes de la table: 'en attente' d'abord, puis 'servie', puis
+        'payée' s'il ne reste que des commandes payées, sinon 'libre'. Le nombre
+        de clients n'est réinitialisé que si plus aucune commande n'est active.
+        """
+        from apps.orders.models import Commande
+
+        commandes = Commande.objects.filter(table=models.OuterRef('pk'))
+        return {
+            'current_status': models.Case(
+                models.When(
+                    models.Exists(commandes.filter(statut='en_attente')),
+                    then=models.Value('commande_en_attente')
+                ),
+                models.When(
+                    models.Exists(commandes.filter(statut='servie')),
+                    then=models.Value('commande_servie')
+                ),
+                models.When(models.Exists(commandes), then=models.Value('commande_payee')),
+                default=models.Value('libre')
+            ),
+            'nombre_clients_actuels': models.Case(
+                models.When(
+                    models.Exists(commandes.exclude(statut='payee')),
+                    then=models.F('nombre_clients_actuels')
+                ),
+                default=models.Value(0)
+            ),
+        }
+
+    @classmethod
+    def recalculer_statuts(cls, tables):
+        """
+        Recalcule entièrement le statut des tables (queryset) depuis leurs
+        commandes, avec les mêmes règles que transition_commande(). Réservé à
+        la réparation (commande recalculer_statuts_tables).
+        """
+        return tables.update(**cls.valeurs_depuis_commandes(), updated_at=timezone.now())
+
     def update_status(self):
-        active_order = self.get_active_order()
-        if active_order:
-            if active_order.statut == 'en_attente':
-                self.current_status = 'commande_en_attente'
-            elif active_order.statut == 'servie':
-                self.current_status = 'commande_servie'
-            else:
-                self.current_status = 'libre'
-        else:
-            last_order = self.get_last_order()
-            if last_order and last_order.statut == 'payee':
-                self.current_status = 'commande_payee'
-            else:
-                self.current_status = 'libre'
-
-            # Si aucune commande active: la table est considérée libre -> réinitialiser le nombre de clients
-            self.nombre_clients_actuels = 0
-        self.save()
\ No newline at end of file
+        """Recalcule le statut de cette table depuis ses commandes (réparation)"""
+        TableRestaurant.recalculer_statuts(TableRestaurant.objects.filter(pk=self.pk))
+        self.refresh_from_db(fields=['current_status', 'nombre_clients_actuels', 'updated_at'])
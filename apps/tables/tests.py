@@ -0,0 +1,118 @@
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.test import TestCase
+from django.urls import reverse
+
+from apps.authentication.models import CustomUser
+from apps.orders.models import Commande, Panier
+
+from .models import TableRestaurant
+
+
+class TransitionCommandeTests(TestCase):
+    """Statut de la table maintenu par TableRestaurant.transition_commande()"""
+
+    def setUp(self):
+        self.table = TableRestaurant.objects.create(numero_table='T1', nombre_places=4, nombre_clients_actuels=3)
+
+    def commander(self, statut='en_attente'):
+        commande = Commande.objects.create(table=self.table, montant_total=Decimal('1000'))
+        if statut != 'en_attente':
+            commande.statut = statut
+            commande.save()
+        return commande
+
+    def assertStatut(self, statut, nombre_clients):
+        self.table.refresh_from_db()
+        self.assertEqual(self.table.current_status, statut)
+        self.assertEqual(self.table.nombre_clients_actuels, nombre_clients)
+
+    def test_suppression_avec_commande_servie_restante(self):
+        en_attente = self.commander()
+        self.commander('servie')
+        # La table reste 'en attente' tant qu'une commande attend
+        self.assertStatut('commande_en_attente', 3)
+
+        en_attente.delete()
+        self.assertStatut('commande_servie', 3)
+
+    def test_suppression_de_la_derniere_commande(self):
+        self.commander().delete()
+        self.assertStatut('libre', 0)
+
+    def test_suppression_apres_commande_payee(self):
+        self.commander('payee')
+        self.commander().delete()
+        self.assertStatut('commande_payee', 0)
+
+    def test_paiement_avec_commande_servie_restante(self):
+        en_attente = self.commander()
+        self.commander('servie')
+
+        en_attente.statut = 'payee'
+        en_attente.save()
+        self.assertStatut('commande_servie', 3)
+
+    def test_paiement_avec_commande_en_attente_restante(self):
+        servie = self.commander('servie')
+        self.commander()
+
+        servie.statut = 'payee'
+        servie.save()
+        self.assertStatut('commande_en_attente', 3)
+
+    def test_paiement_de_la_derniere_commande(self):
+        commande = self.commander('servie')
+        commande.statut = 'payee'
+        commande.save()
+        self.assertStatut('commande_payee', 0)
+
+    def test_reparation_selon_les_memes_regles(self):
+        self.commander()
+        # Commande servie plus récente: la commande en attente reste prioritaire
+        self.commander('servie')
+        TableRestaurant.objects.filter(pk=self.table.pk).update(current_status='libre')
+
+        sortie = StringIO()
+        call_command('recalculer_statuts_tables', stdout=sortie)
+        self.assertIn('Table T1: libre -> commande_en_attente', sortie.getvalue())
+        self.assertStatut('commande_en_attente', 3)
+
+    def test_reparation_table_sans_commande_active(self):
+        self.commander('payee')
+        TableRestaurant.objects.filter(pk=self.table.pk).update(current_status='commande_servie')
+
+        self.table.update_status()
+        self.assertEqual(self.table.current_status, 'commande_payee')
+        self.assertStatut('commande_payee', 0)
+
+
+class TableDetailTests(TestCase):
+    """Panier actif de la table ouvert par le serveur"""
+
+    def setUp(self):
+        self.table = TableRestaurant.objects.create(numero_table='T1', nombre_places=4)
+        self.user = CustomUser.objects.create_user(login='serveur', password='secret', role='Rservent')
+        self.client.force_login(self.user)
+        self.url = reverse('tables:table_detail', args=[self.table.id])
+
+    def test_panier_cree_a_la_premiere_visite(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        panier = Panier.objects.get(table=self.table)
+        self.assertTrue(panier.is_active)
+        self.assertEqual(panier.created_by, self.user)
+
+    def test_premiere_visite_concurrente(self):
+        # Panier créé par l'autre requête entre la lecture et l'insertion
+        panier = Panier.objects.create(table=self.table, created_by=self.user)
+        with mock.patch.object(Panier.objects, 'get_or_create', side_effect=IntegrityError):
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['panier'], panier)
+        self.assertEqual(Panier.objects.filter(table=self.table).count(), 1)
@@ -1,10 +1,14 @@
+from decimal import Decimal
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
-from django.db import transaction
-from django.db.models import Q
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
 from apps.authentication.decorators import role_required
-from apps.menu.models import Plat, CategoriePlat
-from apps.orders.models import Panier, PanierItem, Commande, CommandeItem
+from apps.menu.catalogue import get_catalogue, filtrer_plats
+from apps.menu.models import Plat
+from apps.orders.models import Panier, PanierItem
+from apps.orders.services import checkout_panier
 from .models import TableRestaurant
 from .forms import TableRestaurantForm
 
@@ -12,10 +16,6 @@ from .forms import TableRestaurantForm
 @role_required(['Rservent', 'Radmin', 'Rcaissier'])
 def list_tables(request):
     tables = TableRestaurant.objects.all().select_related('user')
-    
-    for table in tables:
-        table.update_status()
-    
     return render(request, 'tables/list_tables.html', {'tables': tables})
 
 
@@ -83,26 +83,23 @@ def delete_table(request, table_id):
 @transaction.atomic
 def table_detail(request, table_id):
     table = get_object_or_404(TableRestaurant, id=table_id)
-    table.update_status()
 
     def _redirect_back():
         return redirect(request.META.get('HTTP_REFERER') or 'tables:table_detail', table_id=table.id)
 
-    # Gestion des paniers actifs multiples
-    paniers_actifs = Panier.objects.filter(table=table, is_active=True).order_by('-created_at')
-    if paniers_actifs.count() > 1:
-        # Garder uniquement le plus récent actif
-        panier = paniers_actifs.first()
-        paniers_actifs.exclude(id=panier.id).update(is_active=False)
-    elif paniers_actifs.exists():
-        panier = paniers_actifs.first()
-    else:
-        # Créer un nouveau panier si aucun n'existe
-        panier = Panier.objects.create(
+    # Un seul panier actif par table (contrainte paniers_un_actif_par_table)
+    try:
+        panier, _ = Panier.objects.get_or_create(
             table=table,
-            created_by=request.user,
-            is_active=True
+            is_active=True,
+            defaults={'created_by': request.user}
         )
+    except IntegrityError:
+        # Panier créé par une première visite concurrente: relu par une
+        # lecture verrouillante, qui voit la ligne validée par l'autre requête
+        panier = Panier.objects.select_for_update().get(table=table, is_active=True)
+    # Table déjà chargée: évite sa relecture par checkout_panier()
+    panier.table = table
     
     # Action: ajouter un plat au panier
     if request.method == 'POST' and 'add_plat' in request.POST:
@@ -158,6 +155,8 @@ def table_detail(request, table_id):
     if request.method == 'POST' and 'annuler_panier' in request.POST:
         panier.items.all().delete()
         panier.is_active = False
+        panier.total = Decimal('0.00')
+        panier.item_count = 0
         panier.save()
         Panier.objects.create(
             table=table,
@@ -172,50 +171,25 @@ def table_detail(request, table_id):
     
     # Gérer la soumission du formulaire de commande
     if request.method == 'POST' and 'commander' in request.POST:
-        if panier_items.exists():
-            with transaction.atomic():
-                # Créer la commande
-                commande = Commande.objects.create(
-                    table=table,
-                    montant_total=panier.total,
-                    statut='en_attente',
-                    serveur=request.user
-                )
-                
-                # Ajouter les articles à la commande
-                for item in panier_items:
-                    CommandeItem.objects.create(
-                        commande=commande,
-                        plat=item.plat,
-                        quantite=item.quantite,
-                        prix_unitaire=item.prix_unitaire,
-                        notes=item.notes
-                    )
-                
-                # Désactiver le panier actuel
-                panier.is_active = False
-                panier.save()
-                
-                messages.success(request, 'Commande passée avec succès!')
-                return redirect('orders:view_order', order_id=commande.id)
+        try:
+            commande = checkout_panier(panier, request.user)
+        except ValidationError as e:
+            messages.warning(request, e.messages[0])
         else:
-            messages.warning(request, 'Le panier est vide!')
+            messages.success(request, 'Commande passée avec succès!')
+            return redirect('orders:view_order', order_id=commande.id)
     
     # Récupérer les commandes récentes
     commandes = table.commandes.all().order_by('-date_commande')[:5]
     
-    # Récupérer les plats disponibles (filtre catégorie + recherche)
-    categories = list(CategoriePlat.objects.order_by('ordre', 'nom').values_list('nom', flat=True))
+    # Plats disponibles (catalogue en cache, filtre catégorie + recherche en mémoire)
+    catalogue = get_catalogue()
+    categories = catalogue['categories']
     if not categories:
         categories = ['Poulet', 'Jus', 'Viande', 'Poisson', 'Chawarma']
     cat = (request.GET.get('cat') or '').strip()
     q = (request.GET.get('q') or '').strip()
-    plats = Plat.objects.filter(disponible=True)
-    if cat and cat in categories:
-        plats = plats.filter(categorie=cat)
-    if q:
-        plats = plats.filter(Q(nom__icontains=q) | Q(description__icontains=q))
-    plats = plats.order_by('nom')
+    plats = filtrer_plats(catalogue, cat=cat if cat in categories else None, q=q)
     
     return render(request, 'tables/table_detail.html', {
         'table': table,
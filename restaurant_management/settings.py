@@ -105,6 +105,12 @@ else:
     MEDIA_URL = '/media/'
     print("⚠️ Stockage local activé (développement uniquement)")
 
+# ===== EXPORTS EN ARRIÈRE-PLAN =====
+# Dossier privé (hors MEDIA_ROOT) partagé par le site et le worker traiter_exports
+EXPORTS_ROOT = config('EXPORTS_ROOT', default=str(BASE_DIR / 'exports'))
+# Durée de conservation des fichiers générés (secondes)
+EXPORTS_DUREE_CONSERVATION = config('EXPORTS_DUREE_CONSERVATION', default=24 * 60 * 60, cast=int)
+
 # ===== STATIC FILES =====
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
@@ -200,6 +206,10 @@ if DATABASE_URL:
     )
     DATABASES['default'].setdefault('OPTIONS', {})
     DATABASES['default']['OPTIONS'].pop('sslmode', None)
+    if DATABASES['default']['ENGINE'].endswith('sqlite3'):
+        # Base de test sur disque: les tests de concurrence ouvrent une
+        # connexion par thread, ce que la base SQLite en mémoire ne supporte pas
+        DATABASES['default']['TEST'] = {'NAME': os.path.join(BASE_DIR, 'test_db.sqlite3')}
 
 SESSION_ENGINE = 'django.contrib.sessions.backends.signed_cookies' if DEBUG else 'django.contrib.sessions.backends.cached_db'
 SESSION_CACHE_ALIAS = 'default'